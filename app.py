@@ -1,13 +1,45 @@
 # -*- coding: utf-8 -*-
 
 import os
+import re
+import sys
 import zipfile
 import io
-from flask import Flask, request, render_template, jsonify, send_from_directory, send_file
+import csv
+import codecs
+import functools
+import gzip
+import mmap
+from flask import Flask, Response, request, render_template, jsonify, send_from_directory, send_file, abort
+from werkzeug.utils import safe_join
 import pandas as pd
+import numpy as np
+
+try:
+    import pyarrow as pa
+    import pyarrow.compute as pc
+    import pyarrow.csv as pa_csv
+    import pyarrow.parquet as pq
+except ImportError:  # pyarrow es opcional: sin él se usa el motor 'c' y no se generan sidecars
+    pa = pc = pa_csv = pq = None
+
+# Las columnas se leen siempre como texto; con pyarrow, respaldado por Arrow en lugar de objetos de Python
+CSV_STRING_DTYPE = pd.StringDtype('pyarrow') if pa is not None else str
 
 import threading
+import queue
+from concurrent.futures import ProcessPoolExecutor
 import uuid
+import json
+import time
+import sqlite3
+import hashlib
+import heapq
+import pickle
+import shutil
+import tempfile
+from collections import deque
+from contextlib import closing, contextmanager, nullcontext
 from datetime import datetime
 
 app = Flask(__name__)
@@ -15,13 +47,509 @@ app = Flask(__name__)
 # --- Configuración ---
 app.config['UPLOAD_FOLDER'] = 'uploads/'
 app.config['DOWNLOAD_FOLDER'] = 'downloads/'
+# Separador por defecto: se usa si el muestreo del archivo no detecta otro (ver `get_csv_dialect`)
 app.config['CSV_SEPARATOR'] = ';'
+# Detección de encoding y separador: cantidad de bloques repartidos por el archivo (con 1, solo el principio) y tamaño de cada uno
+app.config['SNIFF_SAMPLE_BLOCKS'] = 16
+app.config['SNIFF_BLOCK_SIZE'] = 64 * 1024
 app.config['CHUNK_SIZE'] = 10000
 app.config['REQUIRED_COLUMNS'] = ['email', 'docnum']
+# Motor de lectura de CSV: 'c' (parser de pandas) o 'pyarrow' (multihilo; si no está instalado se usa 'c')
+app.config['CSV_ENGINE'] = 'c'
+# Tamaño en bytes de cada bloque que parsea el motor pyarrow
+app.config['CSV_BLOCK_SIZE'] = 8 * 1024 * 1024
+# Procesos para limpiar chunks en paralelo en "Limpiar Base" (0 = modo secuencial)
+app.config['CLEAN_WORKERS'] = 0
+# Procesos para extraer los emails del CRM en paralelo, por rangos de bytes del archivo (0 = modo secuencial).
+# Solo en archivos subidos cuya cantidad de filas ya confirmó una lectura completa (ej: desde el segundo proceso)
+app.config['CRM_WORKERS'] = 0
+# Compresión de los CSV generados (limpio, emails del CRM e inválidos): None, 'gzip' o 'zstd' (requiere pyarrow).
+# Se guardan comprimidos y /downloads los envía con Content-Encoding para que el navegador los descomprima
+app.config['OUTPUT_COMPRESSION'] = None
+# Compresión del ZIP de la exportación múltiple: 0 = solo almacenar (más rápido), 1-9 = deflate
+app.config['ZIP_COMPRESSION_LEVEL'] = 6
+# Armar durante el escaneo inicial un índice invertido (entidad -> filas) para generar el ZIP sin releer el CSV
+app.config['MULTI_EXPORT_INDEX'] = True
+# Agregar a los catálogos de entidades conocidas (config/*.txt) las entidades nuevas que encuentra el escaneo inicial.
+# Desactivado: cualquier archivo subido podría sumar entidades mal escritas a los catálogos de todos; se actualizan
+# a propósito con `python -m batch catalogos <archivos>` (o editándolos a mano)
+app.config['ENTITY_CATALOG_AUTO_UPDATE'] = False
+# Cola de tareas: base SQLite persistente, hilos de trabajo y límite de tareas simultáneas por tipo.
+# Los hilos y los límites son por proceso: con N workers de gunicorn, cada límite se multiplica por N
+app.config['JOBS_DATABASE'] = 'jobs.db'
+app.config['JOB_WORKERS'] = 4
+app.config['JOB_TYPE_LIMITS'] = {'clean': 2, 'multi_export_scan': 2, 'multi_export': 1, 'crm': 2, 'sidecar': 1}
+# Cada cuántos segundos un proceso con tareas marca que sigue vivo. Las tareas sin terminar de un proceso
+# que no lo marca hace más de 3 intervalos (se reinició o se cayó el servidor) pasan a 'error'
+app.config['JOB_HEARTBEAT_SECONDS'] = 10
+# Tiempo (en segundos) que se conservan las tareas finalizadas antes de eliminarlas
+app.config['JOB_TTL_SECONDS'] = 6 * 60 * 60
+# Streaming de progreso (SSE): espera máxima entre lecturas del estado y cada cuánto enviar un keepalive
+app.config['PROGRESS_STREAM_INTERVAL'] = 1.0
+app.config['PROGRESS_STREAM_KEEPALIVE'] = 15
+# Deduplicación del CRM: memoria máxima (MB) para las claves en RAM antes de pasar a archivos en disco
+app.config['DEDUP_MEMORY_LIMIT_MB'] = 512
+app.config['DEDUP_SPILL_PARTITIONS'] = 64
+# Caché de archivos subidos (uploads/<hash>/): tamaño máximo en MB y tiempo (en segundos) durante el
+# que una entrada usada recientemente no se elimina, porque puede estar siendo procesada
+app.config['UPLOAD_CACHE_MAX_MB'] = 4096
+app.config['UPLOAD_CACHE_PROTECT_SECONDS'] = 60 * 60
+# Subida por partes: tamaño de cada parte (después de la primera) y tiempo (en segundos) sin recibir
+# datos tras el cual la subida se descarta
+app.config['UPLOAD_PART_SIZE'] = 8 * 1024 * 1024
+app.config['UPLOAD_SESSION_TIMEOUT_SECONDS'] = 10 * 60
+# Convertir cada archivo subido a Parquet en segundo plano para que las siguientes acciones
+# lean solo las columnas que necesitan (requiere pyarrow). Desactivado por defecto: la conversión
+# lee el archivo completo y compite con la primera acción sobre ese mismo archivo; conviene
+# cuando los mismos archivos se procesan varias veces
+app.config['COLUMNAR_SIDECAR'] = False
+# Índice de filas: se guarda la posición en bytes de una de cada ROW_OFFSET_STRIDE filas para contar
+# filas, leer el final o filas al azar y dividir el archivo en rangos sin recorrerlo de nuevo
+app.config['ROW_OFFSET_STRIDE'] = 256
+# Tamaño máximo de la muestra de la previsualización
+app.config['PREVIEW_MAX_ROWS'] = 1000
+
+
+# --- Gestión de Tareas (Cola Persistente) ---
+
+class JobStore:
+    """
+    Tabla de tareas en SQLite. El estado de cada tarea se guarda como el mismo JSON
+    que devuelve `/api/progress/<task_id>`, por lo que sobrevive a reinicios del
+    servidor y es visible desde todos los procesos (ej: varios workers de gunicorn).
+
+    Cada tarea registra el proceso que la ejecuta (`owner`), y cada proceso con tareas
+    actualiza su latido en `job_owners` cada `heartbeat_seconds`. Una tarea sin terminar
+    cuyo proceso dejó de latir (se reinició o se cayó el servidor) pasa a 'error'.
+    """
+
+    ORPHANED_ERROR = "El servidor se reinició mientras se procesaba la tarea. Por favor, iniciá el proceso de nuevo."
+
+    def __init__(self, database_path, ttl_seconds, heartbeat_seconds=10):
+        self.database_path = database_path
+        self.ttl_seconds = ttl_seconds
+        self.heartbeat_seconds = heartbeat_seconds
+        self._initialized = False
+        self._changed = threading.Condition()
+        self._owner = None
+        self._owner_pid = None
+        self._owner_lock = threading.Lock()
+
+    def _connect(self):
+        connection = sqlite3.connect(self.database_path, timeout=30)
+        if not self._initialized:
+            connection.execute('PRAGMA journal_mode=WAL')
+            connection.execute(
+                'CREATE TABLE IF NOT EXISTS jobs ('
+                ' task_id TEXT PRIMARY KEY,'
+                ' job_type TEXT NOT NULL,'
+                ' state TEXT NOT NULL,'
+                ' created_at REAL NOT NULL,'
+                ' finished_at REAL,'
+                ' owner TEXT)'
+            )
+            columns = [row[1] for row in connection.execute('PRAGMA table_info(jobs)')]
+            if 'owner' not in columns:
+                # Base creada por una versión anterior: sus tareas sin terminar quedan sin dueño
+                connection.execute('ALTER TABLE jobs ADD COLUMN owner TEXT')
+            connection.execute('CREATE INDEX IF NOT EXISTS jobs_finished_at ON jobs (finished_at)')
+            connection.execute(
+                'CREATE TABLE IF NOT EXISTS job_owners ('
+                ' owner TEXT PRIMARY KEY,'
+                ' heartbeat_at REAL NOT NULL)'
+            )
+            connection.commit()
+            self._initialized = True
+            self._recover_orphaned(connection)
+        return connection
+
+    def _current_owner(self):
+        """
+        Id de este proceso como dueño de tareas. Se genera de nuevo después de un fork (ej: gunicorn
+        con --preload), y junto con él arranca el hilo que actualiza el latido.
+        """
+        with self._owner_lock:
+            if self._owner_pid != os.getpid():
+                self._owner = f"{os.getpid()}-{uuid.uuid4().hex}"
+                self._owner_pid = os.getpid()
+                self._beat(self._owner)
+                threading.Thread(target=self._heartbeat_loop, args=(self._owner,), daemon=True).start()
+            return self._owner
+
+    def _beat(self, owner):
+        with closing(self._connect()) as connection, connection:
+            connection.execute('INSERT OR REPLACE INTO job_owners (owner, heartbeat_at) VALUES (?, ?)', (owner, time.time()))
+
+    def _heartbeat_loop(self, owner):
+        while self._owner == owner:
+            time.sleep(self.heartbeat_seconds)
+            try:
+                self._beat(owner)
+            except sqlite3.Error:
+                pass  # Se reintenta en el próximo latido
+
+    def _orphan_condition(self):
+        """Condición SQL (y parámetros) de las tareas sin terminar cuyo proceso dejó de latir."""
+        return (
+            'finished_at IS NULL AND (owner IS NULL OR owner NOT IN '
+            '(SELECT owner FROM job_owners WHERE heartbeat_at >= ?))',
+            (time.time() - 3 * self.heartbeat_seconds,)
+        )
+
+    def _recover_orphaned(self, connection):
+        """Pasa a 'error' las tareas sin terminar de procesos que ya no existen."""
+        condition, params = self._orphan_condition()
+        with connection:
+            connection.execute('BEGIN IMMEDIATE')
+            rows = connection.execute(f'SELECT task_id, state FROM jobs WHERE {condition}', params).fetchall()
+            finished_at = time.time()
+            for task_id, state in rows:
+                state = json.loads(state)
+                state.update(status='error', error=self.ORPHANED_ERROR)
+                connection.execute('UPDATE jobs SET state = ?, finished_at = ? WHERE task_id = ?',
+                                   (json.dumps(state), finished_at, task_id))
+            connection.execute('DELETE FROM job_owners WHERE heartbeat_at < ?', params)
+        if rows:
+            with self._changed:
+                self._changed.notify_all()
+
+    def create(self, job_type):
+        """Registra una nueva tarea en estado 'processing' y devuelve su id."""
+        task_id = str(uuid.uuid4())
+        state = {'status': 'processing', 'progress': 0}
+        owner = self._current_owner()
+        with closing(self._connect()) as connection, connection:
+            connection.execute(
+                'INSERT INTO jobs (task_id, job_type, state, created_at, owner) VALUES (?, ?, ?, ?, ?)',
+                (task_id, job_type, json.dumps(state), time.time(), owner)
+            )
+        self.evict_expired()
+        return task_id
+
+    def update(self, task_id, **fields):
+        """Actualiza los campos indicados del estado de una tarea en una sola transacción."""
+        with closing(self._connect()) as connection, connection:
+            connection.execute('BEGIN IMMEDIATE')
+            row = connection.execute('SELECT state FROM jobs WHERE task_id = ?', (task_id,)).fetchone()
+            if row is None:
+                return
+            state = json.loads(row[0])
+            state.update(fields)
+            finished_at = time.time() if state['status'] in ('complete', 'error') else None
+            connection.execute(
+                'UPDATE jobs SET state = ?, finished_at = ? WHERE task_id = ?',
+                (json.dumps(state), finished_at, task_id)
+            )
+        with self._changed:
+            self._changed.notify_all()
+
+    def wait_for_change(self, timeout):
+        """
+        Espera hasta que alguna tarea de este proceso se actualice o pase `timeout`.
+        Las tareas de otros procesos se detectan al vencer el timeout.
+        """
+        with self._changed:
+            self._changed.wait(timeout)
+
+    def get(self, task_id):
+        """
+        Devuelve el estado de una tarea o None si no existe (o ya fue eliminada).
+        Si la tarea quedó sin terminar en un proceso que ya no existe, la pasa a 'error'.
+        """
+        condition, params = self._orphan_condition()
+        with closing(self._connect()) as connection:
+            row = connection.execute(f'SELECT state, {condition} FROM jobs WHERE task_id = ?', (*params, task_id)).fetchone()
+            if row is not None and row[1]:
+                self._recover_orphaned(connection)
+                row = connection.execute('SELECT state FROM jobs WHERE task_id = ?', (task_id,)).fetchone()
+        return json.loads(row[0]) if row else None
+
+    def evict_expired(self):
+        """Elimina las tareas finalizadas hace más de `ttl_seconds` y cierra las que quedaron huérfanas."""
+        with closing(self._connect()) as connection:
+            self._recover_orphaned(connection)
+            with connection:
+                connection.execute('DELETE FROM jobs WHERE finished_at < ?', (time.time() - self.ttl_seconds,))
+
+
+class JobQueue:
+    """
+    Pool fijo de hilos que ejecuta las tareas en orden de llegada (FIFO). Una tarea
+    cuyo tipo ya alcanzó su límite de concurrencia espera sin bloquear a las de otros tipos.
+
+    La cola y los límites (`type_limits`) son de cada proceso: con varios workers de gunicorn,
+    cada uno ejecuta hasta `workers` tareas y el límite de cada tipo se multiplica por la
+    cantidad de workers. Para un límite global hay que usar un solo worker (con hilos).
+    """
 
+    def __init__(self, workers, type_limits):
+        self.workers = workers
+        self.type_limits = type_limits
+        self._pending = deque()
+        self._running = {}
+        self._condition = threading.Condition()
+        self._threads = []
+
+    def submit(self, task_id, job_type, target, *args):
+        with self._condition:
+            if not self._threads:
+                for _ in range(self.workers):
+                    thread = threading.Thread(target=self._work, daemon=True)
+                    thread.start()
+                    self._threads.append(thread)
+            self._pending.append((task_id, job_type, target, args))
+            self._condition.notify_all()
+
+    def _next_job(self):
+        """Devuelve (y saca de la cola) la primera tarea cuyo tipo tiene lugar disponible."""
+        for job in self._pending:
+            job_type = job[1]
+            if self._running.get(job_type, 0) < self.type_limits.get(job_type, self.workers):
+                self._pending.remove(job)
+                return job
+        return None
+
+    def _work(self):
+        while True:
+            with self._condition:
+                job = self._next_job()
+                while job is None:
+                    self._condition.wait()
+                    job = self._next_job()
+                task_id, job_type, target, args = job
+                self._running[job_type] = self._running.get(job_type, 0) + 1
 
-# --- Gestión de Tareas en Memoria ---
-tasks = {}
+            try:
+                target(task_id, *args)
+            except Exception as e:
+                update_task(task_id, status='error', error=f"Ocurrió un error inesperado: {e}")
+            finally:
+                with self._condition:
+                    self._running[job_type] -= 1
+                    self._condition.notify_all()
+
+
+job_store = JobStore(app.config['JOBS_DATABASE'], app.config['JOB_TTL_SECONDS'], app.config['JOB_HEARTBEAT_SECONDS'])
+job_queue = JobQueue(app.config['JOB_WORKERS'], app.config['JOB_TYPE_LIMITS'])
+
+def start_task(job_type, target, *args):
+    """Crea una tarea, la encola y devuelve su id. `target` recibe (task_id, *args)."""
+    task_id = job_store.create(job_type)
+    job_queue.submit(task_id, job_type, target, *args)
+    return task_id
+
+def update_task(task_id, **fields):
+    """Actualiza el estado de una tarea (progreso, estado, resultado, error, etc.)."""
+    job_store.update(task_id, **fields)
+
+# --- Archivos Comprimidos (gzip / zstd) ---
+
+# Extensión de cada compresión soportada para los archivos subidos y los generados. zstd se lee
+# y escribe con pyarrow, así que sin él solo se acepta gzip
+COMPRESSION_EXTENSIONS = {'gzip': '.gz'}
+if pa is not None and pa.Codec.is_available('zstd'):
+    COMPRESSION_EXTENSIONS['zstd'] = '.zst'
+# Nivel de gzip de los archivos generados (el mismo que usa zlib por defecto)
+GZIP_COMPRESSION_LEVEL = 6
+# Bytes descomprimidos por lectura (en un archivo cortado se pierde como mucho la última)
+DECOMPRESS_READ_SIZE = 64 * 1024
+
+def get_compression(filepath):
+    """Devuelve la compresión de un archivo según su extensión ('gzip' o 'zstd'), o None."""
+    extension = os.path.splitext(filepath)[1].lower()
+    return next((name for name, suffix in COMPRESSION_EXTENSIONS.items() if suffix == extension), None)
+
+def is_csv_filename(filename):
+    """Acepta .csv y, comprimidos, .csv.gz y .csv.zst."""
+    name = filename.lower()
+    return name.endswith('.csv') or any(name.endswith(f'.csv{suffix}') for suffix in COMPRESSION_EXTENSIONS.values())
+
+def get_csv_basename(filepath):
+    """Nombre de un CSV sin sus extensiones (ej: 'base.csv.gz' -> 'base')."""
+    name = os.path.basename(filepath)
+    if get_compression(name):
+        name = os.path.splitext(name)[0]
+    return os.path.splitext(name)[0]
+
+def get_output_filename(filepath, suffix):
+    """Nombre del CSV generado a partir de un archivo subido, con la extensión de OUTPUT_COMPRESSION."""
+    compression = app.config['OUTPUT_COMPRESSION']
+    return f"{get_csv_basename(filepath)}{suffix}.csv{COMPRESSION_EXTENSIONS[compression] if compression else ''}"
+
+class NonClosingReader(io.RawIOBase):
+    """Vista de solo lectura de `raw` que se puede cerrar sin cerrar `raw` (pyarrow cierra los archivos que lee)."""
+
+    def __init__(self, raw):
+        super().__init__()
+        self.raw = raw
+
+    def readable(self):
+        return True
+
+    def readinto(self, buffer):
+        return self.raw.readinto(buffer)
+
+class DecompressedReader(io.RawIOBase):
+    """
+    Lee un archivo comprimido descomprimiéndolo en streaming, sin guardar el resultado. Se puede
+    volver atrás con `seek` (se descomprime de nuevo desde el principio). Al cerrarse cierra `raw`.
+    Con `partial`, un archivo cortado (ej: una subida por partes sin terminar) se lee hasta donde llega.
+    """
+
+    def __init__(self, raw, compression, partial=False):
+        super().__init__()
+        self.raw = raw
+        self.compression = compression
+        self.partial = partial
+        self._stream = None
+        self._position = 0
+        self.seek(0)
+
+    def readable(self):
+        return True
+
+    def seekable(self):
+        return True
+
+    def tell(self):
+        return self._position
+
+    def seek(self, offset, whence=io.SEEK_SET):
+        if whence == io.SEEK_CUR:
+            offset += self._position
+        elif whence != io.SEEK_SET:
+            raise io.UnsupportedOperation("Solo se puede buscar desde el principio o la posición actual.")
+        if self._stream is None or offset < self._position:
+            self.raw.seek(0)
+            if self.compression == 'gzip':
+                self._stream = gzip.GzipFile(fileobj=self.raw, mode='rb')
+            else:
+                self._stream = pa.input_stream(pa.PythonFile(NonClosingReader(self.raw), mode='r'), compression=self.compression)
+            self._position = 0
+        while self._position < offset:
+            skipped = len(self._stream.read(min(offset - self._position, UPLOAD_BLOCK_SIZE)))
+            if not skipped:
+                break
+            self._position += skipped
+        return self._position
+
+    def readinto(self, buffer):
+        try:
+            data = self._stream.read(min(len(buffer), DECOMPRESS_READ_SIZE))
+        except (EOFError, OSError):
+            # gzip y zstd fallan al llegar al final de un archivo cortado
+            if not self.partial:
+                raise
+            data = b''
+        buffer[:len(data)] = data
+        self._position += len(data)
+        return len(data)
+
+    def close(self):
+        if not self.closed:
+            self.raw.close()
+        super().close()
+
+def open_decompressed(raw, compression, partial=False):
+    """Envuelve un archivo binario abierto para leerlo descomprimido (o lo deja igual si `compression` es None)."""
+    return io.BufferedReader(DecompressedReader(raw, compression, partial)) if compression else nullcontext(raw)
+
+@contextmanager
+def open_csv_file(filepath, partial=False):
+    """
+    Abre un CSV para leerlo como binario, descomprimiéndolo en streaming si es .gz o .zst.
+    `partial` es para leer solo el principio de un archivo que puede estar incompleto.
+    """
+    with open(filepath, 'rb') as raw, open_decompressed(raw, get_compression(filepath), partial) as handle:
+        yield handle
+
+def open_output_file(path):
+    """
+    Abre un archivo generado para escribir en binario, con un buffer de CSV_WRITE_BUFFER_SIZE,
+    comprimiendo en streaming si su nombre termina en .gz o .zst.
+    """
+    compression = get_compression(path)
+    if compression == 'gzip':
+        return io.BufferedWriter(gzip.open(path, 'wb', compresslevel=GZIP_COMPRESSION_LEVEL), CSV_WRITE_BUFFER_SIZE)
+    if compression:
+        return pa.output_stream(path, compression=compression, buffer_size=CSV_WRITE_BUFFER_SIZE)
+    return open(path, 'wb', buffering=CSV_WRITE_BUFFER_SIZE)
+
+# --- Escritura de CSV ---
+
+# Buffer de los archivos generados y filas por lote al escribir un CSV de una columna
+CSV_WRITE_BUFFER_SIZE = 4 * 1024 * 1024
+CSV_WRITE_BATCH_ROWS = 100000
+
+def get_csv_quote_chars():
+    """Caracteres que hacen que `csv.writer` (y por lo tanto `DataFrame.to_csv`) ponga un campo entre comillas."""
+    quoted = []
+    for char in ',"\r\n':
+        line = io.StringIO()
+        csv.writer(line, lineterminator=os.linesep).writerow([f'a{char}', 'b'])
+        if line.getvalue().startswith('"'):
+            quoted.append(char)
+    return ''.join(quoted)
+
+# Se detecta una vez porque depende de la versión de Python (ej: si '\r' va entre comillas)
+CSV_QUOTE_PATTERN = f"[{re.escape(get_csv_quote_chars())}]"
+CSV_QUOTE_REGEX = re.compile(CSV_QUOTE_PATTERN)
+
+def format_csv_header(columns):
+    """Línea de cabecera de un CSV, en bytes UTF-8."""
+    line = io.StringIO()
+    csv.writer(line, lineterminator=os.linesep).writerow(columns)
+    return line.getvalue().encode('utf-8')
+
+def format_csv_column(values):
+    """
+    Filas de un CSV de una columna con los textos `values`, en bytes UTF-8 y con el mismo formato
+    que `csv.writer`: comillas mínimas y "" para los vacíos (para que no queden líneas en blanco).
+    """
+    if not values:
+        return b''
+    if '' in values or CSV_QUOTE_REGEX.search(''.join(values)):
+        values = ['"' + value.replace('"', '""') + '"' if not value or CSV_QUOTE_REGEX.search(value) else value
+                  for value in values]
+    return (os.linesep.join(values) + os.linesep).encode('utf-8')
+
+def write_csv_column(output, values):
+    """Escribe `values` como filas de un CSV de una columna, por lotes de CSV_WRITE_BATCH_ROWS."""
+    for start in range(0, len(values), CSV_WRITE_BATCH_ROWS):
+        output.write(format_csv_column(values[start:start + CSV_WRITE_BATCH_ROWS]))
+
+def format_csv_frame(frame, header=True):
+    """
+    Igual que `frame.to_csv(index=False, header=header)`, en bytes UTF-8. Con pyarrow y columnas
+    de texto, las comillas y la unión de los campos y las filas se hacen con pyarrow.compute y
+    el resultado sale directo del buffer de Arrow, sin pasar por el formateador de pandas.
+    """
+    if pc is None or frame.columns.empty:
+        return frame.to_csv(index=False, header=header).encode('utf-8')
+    try:
+        fields = [pc.fill_null(pa.array(frame[column], type=pa.string(), from_pandas=True), '') for column in frame.columns]
+    except (pa.ArrowInvalid, pa.ArrowTypeError):
+        # Columnas que no son de texto (números, fechas): se usa el formateador de pandas
+        return frame.to_csv(index=False, header=header).encode('utf-8')
+
+    for position, values in enumerate(fields):
+        needs_quotes = pc.match_substring_regex(values, CSV_QUOTE_PATTERN)
+        if len(fields) == 1:
+            needs_quotes = pc.or_(needs_quotes, pc.equal(pc.binary_length(values), 0))
+        if pc.any(needs_quotes).as_py():
+            quoted = pc.binary_join_element_wise('"', pc.replace_substring(values, '"', '""'), '"', '')
+            fields[position] = pc.if_else(needs_quotes, quoted, values)
+    rows = fields[0] if len(fields) == 1 else pc.binary_join_element_wise(*fields, ',')
+    # Cada fila termina en el fin de línea: los datos del array son el CSV completo
+    rows = pc.binary_join_element_wise(rows, '', os.linesep)
+    if isinstance(rows, pa.ChunkedArray):
+        rows = rows.combine_chunks()
+
+    data = format_csv_header(frame.columns) if header else b''
+    if len(rows):
+        offsets = np.frombuffer(rows.buffers()[1], dtype=np.int32, count=len(rows) + 1, offset=rows.offset * 4)
+        data += rows.buffers()[2][int(offsets[0]):int(offsets[-1])].to_pybytes()
+    return data
 
 # --- Funciones Auxiliares de Lógica de Negocio ---
 
@@ -31,35 +559,218 @@ def clean_email(email):
         return email.split('>', 1)[-1]
     return email
 
-def get_csv_encoding(filepath):
-    """Detecta la codificación de un archivo CSV (utf-8 o latin-1) de forma eficiente."""
+# Separadores que se prueban al detectar el formato de un CSV (además de CSV_SEPARATOR)
+SEPARATOR_CANDIDATES = [';', ',', '\t', '|']
+
+def get_csv_dialect(filepath):
+    """
+    Devuelve (encoding, separador) de un CSV. Se guarda en la metadata de la caché de uploads
+    y, para el resto de los archivos, en memoria mientras el archivo no cambie.
+    """
+    metadata = get_upload_metadata(filepath)
+    if 'separator' in metadata:
+        return metadata['encoding'], metadata['separator']
+
+    stat = os.stat(filepath)
+    encoding, separator = sniff_csv_dialect(os.path.abspath(filepath), stat.st_size, stat.st_mtime_ns)
+    update_upload_metadata(filepath, encoding=encoding, separator=separator)
+    return encoding, separator
+
+@functools.lru_cache(maxsize=256)
+def sniff_csv_dialect(filepath, size, mtime_ns):
+    """
+    Detecta el encoding (utf-8 o latin-1) y el separador de un CSV leyendo SNIFF_SAMPLE_BLOCKS
+    bloques repartidos entre el inicio y el final del archivo (o el archivo completo si es chico).
+    En los archivos comprimidos se leen los primeros SNIFF_SAMPLE_BLOCKS bloques descomprimidos.
+    `size` y `mtime_ns` forman parte de la clave de la caché.
+    """
+    block_size = app.config['SNIFF_BLOCK_SIZE']
+    block_count = max(app.config['SNIFF_SAMPLE_BLOCKS'], 1)
+    if get_compression(filepath):
+        # De un archivo comprimido solo se lee el principio, para no descomprimirlo entero
+        with open_csv_file(filepath, partial=True) as handle:
+            sample = handle.read(block_size * block_count)
+        blocks = [(0, sample)]
+        # Si el archivo sigue después de la muestra, su última línea está cortada
+        size = len(sample) + (len(sample) == block_size * block_count)
+    else:
+        if size <= block_size * block_count:
+            offsets, block_size = [0], size
+        elif block_count == 1:
+            # Un solo bloque: el principio del archivo, que tiene la cabecera
+            offsets = [0]
+        else:
+            offsets = [round(i * (size - block_size) / (block_count - 1)) for i in range(block_count)]
+
+        with open(filepath, 'rb') as handle:
+            blocks = []
+            for offset in offsets:
+                handle.seek(offset)
+                blocks.append((offset, handle.read(block_size)))
+
+    encoding = 'utf-8' if all(is_utf8_block(block, offset == 0, offset + len(block) >= size) for offset, block in blocks) else 'latin-1'
+
+    # Líneas completas de cada bloque (se descartan las cortadas en los bordes)
+    header, lines = None, []
+    for offset, block in blocks:
+        block_lines = block.decode(encoding, errors='replace').splitlines()
+        if offset > 0:
+            block_lines = block_lines[1:]
+        if offset + len(block) < size:
+            block_lines = block_lines[:-1]
+        if header is None and block_lines:
+            header, block_lines = block_lines[0], block_lines[1:]
+        lines.extend(line for line in block_lines if line)
+
+    return encoding, choose_csv_separator(header or '', lines)
+
+def is_utf8_block(block, at_start, at_end):
+    """Indica si un bloque es UTF-8 válido, tolerando caracteres cortados en sus bordes."""
+    if not at_start:
+        # Bytes de continuación de un carácter que empezó antes del bloque
+        skip = 0
+        while skip < 3 and skip < len(block) and block[skip] & 0xC0 == 0x80:
+            skip += 1
+        block = block[skip:]
     try:
-        with open(filepath, 'r', encoding='utf-8') as f:
-            f.read(1024)
-        return 'utf-8'
+        codecs.getincrementaldecoder('utf-8')().decode(block, final=at_end)
+        return True
     except UnicodeDecodeError:
-        return 'latin-1'
+        return False
+
+def choose_csv_separator(header, lines):
+    """
+    Elige el separador con el que más líneas tienen la misma cantidad de campos que la cabecera.
+    En caso de empate (o si ninguno aparece en la cabecera) se usa CSV_SEPARATOR.
+    """
+    configured = app.config['CSV_SEPARATOR']
+    best, best_score = configured, -1
+    for candidate in [configured] + [c for c in SEPARATOR_CANDIDATES if c != configured]:
+        expected = header.count(candidate)
+        if not expected:
+            continue
+        score = sum(line.count(candidate) == expected for line in lines) / max(len(lines), 1)
+        if score > best_score:
+            best, best_score = candidate, score
+    return best
+
+def read_csv_in_chunks(filepath, usecols=None):
+    """
+    Lee un CSV por chunks, con todas las columnas como texto, sin necesidad de contar sus filas
+    de antemano. Usa el motor configurado en `CSV_ENGINE` y el formato de `get_csv_dialect`.
+    Devuelve tuplas (chunk, progreso), donde el progreso (0-100) se calcula a partir
+    de la posición en bytes del archivo respecto de su tamaño total.
+    """
+    encoding, separator = get_csv_dialect(filepath)
+    with open(filepath, 'rb') as raw, open_decompressed(raw, get_compression(filepath)) as handle:
+        # En los archivos comprimidos el progreso es la posición dentro del archivo comprimido
+        yield from read_csv_handle_in_chunks(handle, encoding, separator, usecols, os.path.getsize(filepath), raw.tell)
+
+def read_csv_handle_in_chunks(handle, encoding, separator, usecols, total_bytes, position=None):
+    """
+    Igual que `read_csv_in_chunks`, sobre un archivo binario ya abierto de `total_bytes` bytes.
+    `position` devuelve cuántos de esos bytes se leyeron (por defecto, `handle.tell`).
+    """
+    total_bytes = total_bytes or 1
+    position = position or handle.tell
+    if app.config['CSV_ENGINE'] == 'pyarrow' and pa is not None:
+        chunks = read_csv_chunks_pyarrow(handle, encoding, separator, usecols)
+    else:
+        chunks = pd.read_csv(handle, chunksize=app.config['CHUNK_SIZE'], encoding=encoding, sep=separator,
+                             usecols=usecols, dtype=CSV_STRING_DTYPE)
+    for chunk in chunks:
+        yield chunk, round(min(position() / total_bytes, 1) * 100)
+
+def arrow_to_pandas(batch, start):
+    """Convierte un RecordBatch (o Table) a DataFrame con columnas de texto e índice continuo desde `start`."""
+    chunk = batch.to_pandas(types_mapper={pa.string(): CSV_STRING_DTYPE}.get)
+    chunk.index = pd.RangeIndex(start, start + len(chunk))
+    return chunk
+
+def arrow_batches_to_chunks(batches, chunk_size):
+    """
+    Reagrupa RecordBatches de cualquier tamaño en DataFrames de exactamente `chunk_size` filas
+    (menos el último), como los chunks del motor 'c'. El CRM escribe los emails columna por columna
+    dentro de cada chunk, así que los límites de los chunks definen el orden de su salida.
+    """
+    buffered = None
+    start = 0
+    for batch in batches:
+        if not len(batch):
+            continue
+        table = pa.Table.from_batches([batch])
+        buffered = table if buffered is None else pa.concat_tables([buffered, table])
+        while buffered.num_rows >= chunk_size:
+            yield arrow_to_pandas(buffered.slice(0, chunk_size), start)
+            start += chunk_size
+            buffered = buffered.slice(chunk_size)
+    if buffered is not None and buffered.num_rows:
+        yield arrow_to_pandas(buffered, start)
+
+def read_csv_chunks_pyarrow(handle, encoding, separator, usecols):
+    """
+    Motor 'pyarrow' de `read_csv_in_chunks`: parsea bloques de `CSV_BLOCK_SIZE` bytes en varios hilos
+    y los devuelve en chunks de `CHUNK_SIZE` filas. Las columnas, los valores nulos, los límites de
+    los chunks y los errores son los mismos que con el motor 'c'.
+    """
+    # Se usan los nombres de columna de pandas (las repetidas quedan como 'col.1', 'col.2', ...)
+    columns = pd.read_csv(handle, nrows=0, encoding=encoding, sep=separator).columns.tolist()
+    handle.seek(0)
+    if usecols is not None:
+        missing = [column for column in usecols if column not in columns]
+        if missing:
+            raise ValueError(f"Usecols do not match columns, columns expected but not found: {missing}")
+        columns_to_read = [column for column in columns if column in usecols]
+    else:
+        columns_to_read = columns
+
+    def arrow_errors(read):
+        try:
+            return read()
+        except pa.ArrowInvalid as e:
+            if 'invalid UTF8' in str(e):
+                raise UnicodeDecodeError(encoding, b'', 0, 1, str(e)) from e
+            raise pd.errors.ParserError(str(e)) from e
+
+    reader = arrow_errors(lambda: pa_csv.open_csv(
+        handle,
+        read_options=pa_csv.ReadOptions(use_threads=True, block_size=app.config['CSV_BLOCK_SIZE'],
+                                        skip_rows=1, column_names=columns, encoding=encoding),
+        # Los campos entre comillas pueden tener saltos de línea, como en el motor 'c'
+        parse_options=pa_csv.ParseOptions(delimiter=separator, newlines_in_values=True),
+        convert_options=pa_csv.ConvertOptions(column_types={column: pa.string() for column in columns},
+                                              include_columns=columns_to_read, strings_can_be_null=True),
+    ))
+
+    def batches():
+        while True:
+            try:
+                yield arrow_errors(reader.read_next_batch)
+            except StopIteration:
+                return
+
+    yield from arrow_batches_to_chunks(batches(), app.config['CHUNK_SIZE'])
 
 def validate_and_get_columns(filepath):
     """
-    Valida un archivo CSV y devuelve sus columnas y estado.
-    Devuelve: (columnas, error_mensaje, needs_docnum_generation)
+    Valida un archivo CSV y devuelve sus columnas, estado y formato detectado.
+    Devuelve: (columnas, error_mensaje, needs_docnum_generation, formato {'encoding', 'separator'})
     """
     try:
-        encoding = get_csv_encoding(filepath)
-        df_header = pd.read_csv(filepath, nrows=0, encoding=encoding, sep=app.config['CSV_SEPARATOR'])
+        encoding, separator = get_csv_dialect(filepath)
+        columns = read_upload_header(filepath)
     except (pd.errors.ParserError, pd.errors.EmptyDataError):
-        return None, f"Hubo un problema al leer el archivo CSV. Verificá que esté bien formado, no esté vacío y que el separador de columnas sea un '{app.config['CSV_SEPARATOR']}'.", False
+        return None, "Hubo un problema al leer el archivo CSV. Verificá que esté bien formado, no esté vacío y que el separador de columnas sea ';', ',', tabulación o '|'.", False, None
 
-    columns = df_header.columns.tolist()
+    dialect = {'encoding': encoding, 'separator': separator}
     columns_lower = [c.lower() for c in columns]
 
     if 'email' not in columns_lower:
-        return None, "El archivo CSV debe contener la columna 'email'.", False
+        return None, "El archivo CSV debe contener la columna 'email'.", False, dialect
 
     needs_docnum_generation = 'docnum' not in columns_lower
 
-    return columns, None, needs_docnum_generation
+    return columns, None, needs_docnum_generation, dialect
 
 def process_dataframe_logic(df, needs_docnum_generation):
     """
@@ -82,19 +793,18 @@ def process_dataframe_logic(df, needs_docnum_generation):
     
     return df
 
-def generate_preview_data(filepath, selected_columns, needs_docnum_generation):
+def generate_preview_data(filepath, selected_columns, needs_docnum_generation, mode='head', nrows=10, seed=0):
     """
-    Genera una previsualización de datos de un archivo CSV.
+    Genera una previsualización de datos de un archivo CSV con `nrows` filas tomadas según
+    `mode` ('head', 'tail' o 'random'; ver `read_upload_sample`).
     Devuelve: (preview_data, columnas_actualizadas, error_mensaje)
     """
     try:
-        encoding = get_csv_encoding(filepath)
-        
         cols_to_read = selected_columns.copy()
         if needs_docnum_generation and 'docnum' in cols_to_read:
             cols_to_read.remove('docnum')
 
-        df_preview = pd.read_csv(filepath, usecols=cols_to_read, nrows=10, encoding=encoding, sep=app.config['CSV_SEPARATOR'])
+        df_preview = read_upload_sample(filepath, nrows, usecols=cols_to_read, mode=mode, seed=seed)
 
         df_preview = process_dataframe_logic(df_preview, needs_docnum_generation)
 
@@ -135,56 +845,955 @@ def reorder_chunk_columns(chunk, selected_columns):
             
     return chunk[ordered_cols]
 
+def clean_chunk(chunk, selected_columns, needs_docnum_generation):
+    """Aplica la limpieza completa de la opción "Limpiar Base" a un chunk."""
+    chunk = process_dataframe_logic(chunk, needs_docnum_generation)
+    chunk.columns = [col.lower() for col in chunk.columns]
+    return reorder_chunk_columns(chunk, selected_columns)
+
+def clean_chunk_to_csv(chunk, selected_columns, needs_docnum_generation, header):
+    """
+    Worker del modo paralelo: limpia un chunk en otro proceso y lo devuelve ya
+    serializado como CSV. Devuelve: (filas, bytes del CSV)
+    """
+    chunk = clean_chunk(chunk, selected_columns, needs_docnum_generation)
+    return len(chunk), format_csv_frame(chunk, header)
+
+def process_csv_chunks_parallel(chunks, selected_columns, needs_docnum_generation, output_path, workers, on_progress):
+    """
+    Limpia los chunks en un ProcessPoolExecutor y los escribe en orden.
+
+    El hilo que llama parsea el CSV y envía cada chunk al pool; como mucho hay
+    `workers * 2` chunks en vuelo. Un hilo escritor toma los resultados en el orden
+    original y los agrega al archivo de salida. `on_progress(progreso, filas escritas)` se
+    llama después de cada chunk. Devuelve la cantidad de filas escritas.
+    """
+    pending = queue.Queue(maxsize=workers * 2)
+    outcome = {'rows': 0, 'error': None, 'done': False}
+
+    def write_results(output):
+        while True:
+            item = pending.get()
+            if item is None:
+                outcome['done'] = True
+                return
+            future, progress = item
+            rows, data = future.result()
+            output.write(data)
+            outcome['rows'] += rows
+            on_progress(progress, outcome['rows'])
+
+    def writer():
+        try:
+            with open_output_file(output_path) as output:
+                write_results(output)
+        except Exception as e:
+            outcome['error'] = e
+        # Ante cualquier error (del pool, al abrir, escribir o cerrar la salida) se siguen
+        # consumiendo los pendientes hasta el final para no bloquear al parser
+        while not outcome['done']:
+            outcome['done'] = pending.get() is None
+
+    writer_thread = threading.Thread(target=writer)
+    writer_thread.start()
+    try:
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            first_chunk = True
+            for chunk, progress in chunks:
+                if outcome['error']:
+                    break
+                future = executor.submit(clean_chunk_to_csv, chunk, selected_columns, needs_docnum_generation, first_chunk)
+                pending.put((future, progress))
+                first_chunk = False
+    finally:
+        pending.put(None)
+        writer_thread.join()
+
+    if outcome['error']:
+        raise outcome['error']
+    return outcome['rows']
+
 # --- Tarea en Segundo Plano para Procesamiento de CSV ---
 
 def process_csv_task(task_id, filepath, selected_columns, needs_docnum_generation, output_path):
     """La función que se ejecuta en segundo plano para procesar el CSV."""
     try:
-        encoding = get_csv_encoding(filepath)
-        total_rows = sum(1 for _ in open(filepath, 'r', encoding=encoding)) - 1
-
         rows_processed = 0
-        chunk_size = app.config['CHUNK_SIZE']
         first_chunk = True
 
         cols_to_read = selected_columns.copy()
         if needs_docnum_generation and 'docnum' in cols_to_read:
             cols_to_read.remove('docnum')
 
-        for chunk in pd.read_csv(filepath, usecols=cols_to_read, chunksize=chunk_size, encoding=encoding, sep=app.config['CSV_SEPARATOR']):
-            
-            chunk = process_dataframe_logic(chunk, needs_docnum_generation)
-
-            chunk.columns = [col.lower() for col in chunk.columns]
-
-            chunk = reorder_chunk_columns(chunk, selected_columns)
-            
-            if first_chunk:
-                chunk.to_csv(output_path, index=False, mode='w')
-                first_chunk = False
-            else:
-                chunk.to_csv(output_path, index=False, mode='a', header=False)
-            
-            rows_processed += len(chunk)
-            progress = (rows_processed / total_rows) * 100
-            tasks[task_id]['progress'] = round(progress)
-
-        tasks[task_id]['status'] = 'complete'
-        tasks[task_id]['result'] = f'/downloads/{os.path.basename(output_path)}'
-        tasks[task_id]['processed_rows'] = rows_processed
+        # Cantidad de filas si ya se conoce (sin recorrer el archivo); si no, el progreso es por bytes
+        total_rows = count_csv_rows(filepath)
+        chunks = read_upload_in_chunks(filepath, usecols=cols_to_read)
+        workers = app.config['CLEAN_WORKERS']
+
+        if workers:
+            def on_progress(progress, rows):
+                update_task(task_id, progress=progress, processed_rows=rows, total_rows=total_rows)
+
+            rows_processed = process_csv_chunks_parallel(chunks, selected_columns, needs_docnum_generation, output_path, workers, on_progress)
+        else:
+            with open_output_file(output_path) as output:
+                for chunk, progress in chunks:
+                    chunk = clean_chunk(chunk, selected_columns, needs_docnum_generation)
+                    output.write(format_csv_frame(chunk, header=first_chunk))
+                    first_chunk = False
+
+                    rows_processed += len(chunk)
+                    update_task(task_id, progress=progress, processed_rows=rows_processed, total_rows=total_rows)
+
+        update_upload_metadata(filepath, row_count=rows_processed)
+        update_task(
+            task_id,
+            status='complete',
+            result=f'/downloads/{os.path.basename(output_path)}',
+            processed_rows=rows_processed,
+        )
 
     except FileNotFoundError:
-        tasks[task_id]['status'] = 'error'
-        tasks[task_id]['error'] = "El archivo original fue eliminado o movido durante el procesamiento. Por favor, iniciá el proceso de nuevo."
+        update_task(task_id, status='error', error="El archivo original fue eliminado o movido durante el procesamiento. Por favor, iniciá el proceso de nuevo.")
     except KeyError:
-        tasks[task_id]['status'] = 'error'
-        tasks[task_id]['error'] = "Una de las columnas seleccionadas no se encontró en el archivo. Esto puede ocurrir si el CSV tiene una estructura inconsistente."
+        update_task(task_id, status='error', error="Una de las columnas seleccionadas no se encontró en el archivo. Esto puede ocurrir si el CSV tiene una estructura inconsistente.")
     except MemoryError:
-        tasks[task_id]['status'] = 'error'
-        tasks[task_id]['error'] = "El archivo es demasiado grande para ser procesado. Por favor, intentá con un archivo más pequeño."
+        update_task(task_id, status='error', error="El archivo es demasiado grande para ser procesado. Por favor, intentá con un archivo más pequeño.")
     except Exception as e:
-        tasks[task_id]['status'] = 'error'
-        tasks[task_id]['error'] = "Ocurrió un error inesperado durante la limpieza del archivo. Por favor, intentá de nuevo."
+        update_task(task_id, status='error', error="Ocurrió un error inesperado durante la limpieza del archivo. Por favor, intentá de nuevo.")
+
+# --- Caché de Archivos Subidos ---
+
+# Cada archivo se guarda en uploads/<sha256 del contenido>/<nombre original>, junto a un JSON con
+# la información ya calculada (encoding, separador, columnas, cantidad de filas, escaneo de la exportación múltiple)
+UPLOAD_METADATA_FILE = 'metadata.json'
+UPLOAD_HASH_PATTERN = re.compile(r'[0-9a-f]{64}')
+UPLOAD_BLOCK_SIZE = 1024 * 1024
+upload_metadata_lock = threading.Lock()
+
+def save_upload(file):
+    """
+    Guarda un archivo subido calculando su hash mientras se escribe a disco.
+    Si ya existía un archivo con el mismo contenido se reutiliza junto con su metadata.
+    Devuelve: (ruta del archivo, metadata cacheada)
+    """
+    upload_folder = app.config['UPLOAD_FOLDER']
+    os.makedirs(upload_folder, exist_ok=True)
+    digest = hashlib.sha256()
+    handle, temp_path = tempfile.mkstemp(prefix='.upload_', suffix='.tmp', dir=upload_folder)
+    try:
+        with os.fdopen(handle, 'wb') as output:
+            for block in iter(lambda: file.stream.read(UPLOAD_BLOCK_SIZE), b''):
+                digest.update(block)
+                output.write(block)
+
+        filepath = store_upload(temp_path, digest.hexdigest(), file.filename)
+    finally:
+        if os.path.exists(temp_path):
+            os.remove(temp_path)
+
+    return filepath, get_upload_metadata(filepath)
+
+def cache_local_file(path):
+    """
+    Agrega un archivo local a la caché de uploads, como si se hubiera subido: se enlaza (o se copia)
+    sin modificar el original, y las tareas guardan su metadata e índices en la caché.
+    Devuelve la ruta del archivo en la caché.
+    """
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(UPLOAD_BLOCK_SIZE), b''):
+            digest.update(block)
+    os.makedirs(app.config['UPLOAD_FOLDER'], exist_ok=True)
+    return store_upload(path, digest.hexdigest(), os.path.basename(path), move=False)
+
+def store_upload(temp_path, content_hash, filename, move=True):
+    """
+    Guarda en la caché de uploads un archivo ya escrito en `temp_path` con el hash de su contenido.
+    Con `move=False` el archivo temporal no se mueve (se enlaza o se copia), porque otra tarea lo
+    sigue leyendo. Devuelve la ruta del archivo en la caché.
+    """
+    entry_dir = os.path.join(app.config['UPLOAD_FOLDER'], content_hash)
+    os.makedirs(entry_dir, exist_ok=True)
+    filepath = os.path.join(entry_dir, os.path.basename(filename))
+    if not os.path.exists(filepath):
+        # El mismo contenido subido con otro nombre comparte el archivo ya guardado
+        existing = [name for name in os.listdir(entry_dir) if name != UPLOAD_METADATA_FILE]
+        source = os.path.join(entry_dir, existing[0]) if existing else temp_path
+        try:
+            if existing or not move:
+                os.link(source, filepath)
+            else:
+                os.replace(temp_path, filepath)
+        except OSError:
+            if move:
+                os.replace(temp_path, filepath)
+            else:
+                shutil.copyfile(temp_path, filepath)
+
+    os.utime(entry_dir)
+    evict_upload_cache(keep=entry_dir)
+    return filepath
+
+def is_cached_upload(filepath):
+    entry_dir = os.path.dirname(os.path.abspath(filepath))
+    return (UPLOAD_HASH_PATTERN.fullmatch(os.path.basename(entry_dir)) is not None
+            and os.path.dirname(entry_dir) == os.path.abspath(app.config['UPLOAD_FOLDER']))
+
+def get_upload_metadata(filepath):
+    """Devuelve la metadata cacheada de un archivo subido ({} si no hay)."""
+    if not is_cached_upload(filepath):
+        return {}
+    try:
+        with open(os.path.join(os.path.dirname(filepath), UPLOAD_METADATA_FILE), encoding='utf-8') as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+def update_upload_metadata(filepath, **fields):
+    """Agrega campos a la metadata cacheada de un archivo subido."""
+    entry_dir = os.path.dirname(filepath)
+    if not is_cached_upload(filepath) or not os.path.isdir(entry_dir):
+        return
+    metadata_path = os.path.join(entry_dir, UPLOAD_METADATA_FILE)
+    with upload_metadata_lock:
+        metadata = get_upload_metadata(filepath)
+        metadata.update(fields)
+        try:
+            with open(metadata_path + '.tmp', 'w', encoding='utf-8') as f:
+                json.dump(metadata, f)
+            os.replace(metadata_path + '.tmp', metadata_path)
+        except OSError:
+            # La entrada fue eliminada mientras tanto: la metadata se vuelve a calcular en la próxima subida
+            pass
+
+def discard_upload(filepath):
+    """Elimina un archivo subido que no es válido (y su entrada de la caché)."""
+    if is_cached_upload(filepath):
+        shutil.rmtree(os.path.dirname(filepath), ignore_errors=True)
+    elif os.path.exists(filepath):
+        os.remove(filepath)
+
+def evict_upload_cache(keep=None):
+    """
+    Elimina las entradas usadas hace más tiempo hasta que uploads/ no supere UPLOAD_CACHE_MAX_MB.
+    Las usadas en los últimos UPLOAD_CACHE_PROTECT_SECONDS se conservan.
+    """
+    entries = []
+    for entry in os.scandir(app.config['UPLOAD_FOLDER']):
+        if not entry.is_dir() or not UPLOAD_HASH_PATTERN.fullmatch(entry.name):
+            continue
+        # Los nombres alternativos son enlaces al mismo archivo: se cuenta cada inodo una sola vez
+        sizes = {item.inode(): item.stat().st_size for item in os.scandir(entry.path) if item.is_file()}
+        entries.append((entry.stat().st_mtime, sum(sizes.values()), entry.path))
+
+    total_bytes = sum(size for _, size, _ in entries)
+    max_bytes = app.config['UPLOAD_CACHE_MAX_MB'] * 1024 * 1024
+    protected_since = time.time() - app.config['UPLOAD_CACHE_PROTECT_SECONDS']
+    for last_used, size, path in sorted(entries):
+        if total_bytes <= max_bytes:
+            break
+        if last_used > protected_since or os.path.abspath(path) == os.path.abspath(keep or ''):
+            continue
+        shutil.rmtree(path, ignore_errors=True)
+        total_bytes -= size
+
+def read_upload_header(filepath):
+    """Devuelve las columnas de un CSV, usando la metadata cacheada si existe."""
+    metadata = get_upload_metadata(filepath)
+    if 'columns' in metadata and 'separator' in metadata:
+        return metadata['columns']
+
+    encoding, separator = get_csv_dialect(filepath)
+    with open_csv_file(filepath, partial=True) as handle:
+        columns = pd.read_csv(handle, nrows=0, encoding=encoding, sep=separator).columns.tolist()
+    update_upload_metadata(filepath, columns=columns)
+    return columns
+
+# --- Sidecar Columnar (Parquet) ---
+
+# Copia en Parquet del CSV subido, con todas las columnas como texto. Las tareas leen de ahí
+# solo las columnas que necesitan y, mientras la conversión no terminó, leen el CSV.
+UPLOAD_SIDECAR_FILE = 'columns.parquet'
+
+def get_sidecar_path(filepath):
+    if is_cached_upload(filepath):
+        return os.path.join(os.path.dirname(filepath), UPLOAD_SIDECAR_FILE)
+    return os.path.splitext(filepath)[0] + '.parquet'
+
+def schedule_columnar_sidecar(filepath):
+    """Encola la conversión a Parquet de un archivo subido, si está habilitada y todavía no existe."""
+    if pq is None or not app.config['COLUMNAR_SIDECAR'] or os.path.exists(get_sidecar_path(filepath)):
+        return None
+    return start_task('sidecar', build_columnar_sidecar, filepath)
+
+def build_columnar_sidecar(task_id, filepath):
+    """Tarea en segundo plano que escribe el sidecar Parquet de un CSV."""
+    sidecar_path = get_sidecar_path(filepath)
+    temp_path = f"{sidecar_path}.{task_id}.tmp"
+    columns = read_upload_header(filepath)
+    schema = pa.schema([(column, pa.string()) for column in columns])
+
+    try:
+        with pq.ParquetWriter(temp_path, schema) as writer:
+            for chunk, progress in read_csv_in_chunks(filepath):
+                writer.write_table(pa.Table.from_pandas(chunk, schema=schema, preserve_index=False))
+                update_task(task_id, progress=progress)
+        os.replace(temp_path, sidecar_path)
+    finally:
+        if os.path.exists(temp_path):
+            os.remove(temp_path)
+
+    update_task(task_id, status='complete', result=os.path.basename(sidecar_path))
+
+def open_columnar_sidecar(filepath, usecols):
+    """
+    Devuelve (ParquetFile, columnas a leer en el orden del archivo) si el sidecar está listo
+    y tiene todas las columnas pedidas, o None para leer el CSV.
+    """
+    if pq is None or not app.config['COLUMNAR_SIDECAR']:
+        return None
+    sidecar_path = get_sidecar_path(filepath)
+    try:
+        if os.path.getmtime(sidecar_path) < os.path.getmtime(filepath):
+            return None
+        parquet = pq.ParquetFile(sidecar_path)
+    except (OSError, pa.ArrowException):
+        return None
+
+    names = parquet.schema_arrow.names
+    if usecols is None:
+        return parquet, names
+    if not set(usecols).issubset(names):
+        return None
+    return parquet, [name for name in names if name in usecols]
+
+def read_upload_in_chunks(filepath, usecols=None):
+    """Igual que `read_csv_in_chunks`, pero lee del sidecar Parquet cuando está listo."""
+    sidecar = open_columnar_sidecar(filepath, usecols)
+    if sidecar is None:
+        yield from read_csv_in_chunks(filepath, usecols=usecols)
+        return
+
+    parquet, columns = sidecar
+    total_rows = parquet.metadata.num_rows or 1
+    start = 0
+    # Los lotes no cruzan los row groups del Parquet: se reagrupan para que los chunks sean los del CSV
+    batches = parquet.iter_batches(batch_size=app.config['CHUNK_SIZE'], columns=columns)
+    for chunk in arrow_batches_to_chunks(batches, app.config['CHUNK_SIZE']):
+        start += len(chunk)
+        yield chunk, round(min(start / total_rows, 1) * 100)
+
+def read_upload_head(filepath, nrows, usecols=None):
+    """Lee las primeras `nrows` filas de un CSV como texto (del sidecar si está listo)."""
+    sidecar = open_columnar_sidecar(filepath, usecols)
+    if sidecar is None:
+        encoding, separator = get_csv_dialect(filepath)
+        with open_csv_file(filepath) as handle:
+            return pd.read_csv(handle, usecols=usecols, nrows=nrows, encoding=encoding, sep=separator, dtype=CSV_STRING_DTYPE)
+
+    parquet, columns = sidecar
+    batch = next(parquet.iter_batches(batch_size=nrows, columns=columns), None)
+    if batch is None:
+        return pd.DataFrame(columns=columns, dtype=CSV_STRING_DTYPE)
+    return arrow_to_pandas(batch, 0)
+
+
+# --- Subida por Partes ---
+
+# Una subida por partes se guarda en uploads/.upload_<id>/: `data` (las partes recibidas, en orden),
+# `session.json` (nombre y tamaño total) y, al terminar, `result.json` (ruta en la caché de uploads)
+UPLOAD_SESSION_PREFIX = '.upload_'
+UPLOAD_SESSION_FILE = 'session.json'
+UPLOAD_SESSION_RESULT_FILE = 'result.json'
+UPLOAD_SESSION_ID_PATTERN = re.compile(r'[0-9a-f]{32}')
+UPLOAD_STREAM_POLL_SECONDS = 0.05
+# Hash de las partes ya recibidas por este proceso: (bytes, hashlib), para no releer el archivo al terminar
+upload_digests = {}
+upload_digests_lock = threading.Lock()
+
+class UploadSession:
+    """
+    Subida por partes (`/api/upload-part`). La primera parte llega con la petición que pide las
+    columnas o inicia el escaneo, que responde sin esperar el resto del archivo; las demás se agregan
+    en orden a `data`, que se puede leer mientras se sigue subiendo (`open_reader`). Al llegar la
+    última parte, el archivo pasa a la caché de uploads igual que con `save_upload`.
+
+    El estado está en disco para que las partes puedan llegar a cualquier proceso del servidor.
+    Con `scanned`, una tarea está leyendo el archivo y es la que elimina la sesión al terminar.
+    """
+
+    def __init__(self, upload_id):
+        self.upload_id = upload_id
+        self.path = os.path.join(app.config['UPLOAD_FOLDER'], f"{UPLOAD_SESSION_PREFIX}{upload_id}")
+        with open(os.path.join(self.path, UPLOAD_SESSION_FILE), encoding='utf-8') as f:
+            info = json.load(f)
+        self.filename = info['filename']
+        self.total_size = info['total_size']
+        self.scanned = info['scanned']
+        self.compression = get_compression(self.filename)
+        # `data` conserva la extensión de compresión del archivo para leerlo descomprimido
+        self.data_path = os.path.join(self.path, 'data' + (COMPRESSION_EXTENSIONS[self.compression] if self.compression else ''))
+
+    @classmethod
+    def create(cls, filename, total_size, scanned=False):
+        expire_upload_sessions()
+        upload_id = uuid.uuid4().hex
+        path = os.path.join(app.config['UPLOAD_FOLDER'], f"{UPLOAD_SESSION_PREFIX}{upload_id}")
+        os.makedirs(path)
+        with open(os.path.join(path, UPLOAD_SESSION_FILE), 'w', encoding='utf-8') as f:
+            json.dump({'filename': os.path.basename(filename), 'total_size': total_size, 'scanned': scanned}, f)
+        session = cls(upload_id)
+        open(session.data_path, 'wb').close()
+        return session
+
+    @classmethod
+    def find(cls, upload_id):
+        """Devuelve la sesión, o None si no existe (o ya expiró)."""
+        if not UPLOAD_SESSION_ID_PATTERN.fullmatch(upload_id or ''):
+            return None
+        try:
+            return cls(upload_id)
+        except (OSError, ValueError, KeyError):
+            return None
+
+    @property
+    def received(self):
+        return os.path.getsize(self.data_path)
+
+    def append(self, offset, stream):
+        """Agrega una parte que empieza en el byte `offset`. Devuelve la cantidad de bytes recibidos."""
+        with open(self.data_path, 'ab') as output:
+            received = output.tell()
+            if offset != received:
+                raise ValueError(f"Se esperaba la parte que empieza en el byte {received}.")
+            with upload_digests_lock:
+                hashed, digest = upload_digests.pop(self.upload_id, (0, None))
+            if hashed != received:
+                digest = None
+            elif digest is None:
+                digest = hashlib.sha256()
+
+            for block in iter(lambda: stream.read(UPLOAD_BLOCK_SIZE), b''):
+                if received + len(block) > self.total_size:
+                    raise ValueError("La subida supera el tamaño declarado del archivo.")
+                output.write(block)
+                # Se escribe enseguida para que un escaneo en curso pueda leer el bloque
+                output.flush()
+                if digest is not None:
+                    digest.update(block)
+                received += len(block)
+
+        if digest is not None:
+            with upload_digests_lock:
+                upload_digests[self.upload_id] = (received, digest)
+        return received
+
+    def finish(self):
+        """Pasa el archivo completo a la caché de uploads y devuelve su ruta."""
+        with upload_digests_lock:
+            hashed, digest = upload_digests.pop(self.upload_id, (0, None))
+        if digest is None or hashed != self.total_size:
+            # Las partes llegaron a distintos procesos: se calcula el hash leyendo el archivo
+            digest = hashlib.sha256()
+            with open(self.data_path, 'rb') as f:
+                for block in iter(lambda: f.read(UPLOAD_BLOCK_SIZE), b''):
+                    digest.update(block)
+
+        filepath = store_upload(self.data_path, digest.hexdigest(), self.filename, move=not self.scanned)
+        result_path = os.path.join(self.path, UPLOAD_SESSION_RESULT_FILE)
+        with open(result_path + '.tmp', 'w', encoding='utf-8') as f:
+            json.dump({'filepath': filepath}, f)
+        os.replace(result_path + '.tmp', result_path)
+        if not self.scanned:
+            self.discard()
+        return filepath
+
+    def wait(self):
+        """Espera a que llegue la última parte (por otra petición) y devuelve la ruta del archivo en la caché."""
+        result_path = os.path.join(self.path, UPLOAD_SESSION_RESULT_FILE)
+        timeout = app.config['UPLOAD_SESSION_TIMEOUT_SECONDS']
+        received, deadline = -1, 0
+        while True:
+            try:
+                with open(result_path, encoding='utf-8') as f:
+                    return json.load(f)['filepath']
+            except (OSError, ValueError, KeyError):
+                pass
+            size = self.received
+            if size != received:
+                received, deadline = size, time.monotonic() + timeout
+            elif time.monotonic() > deadline:
+                raise OSError("La subida del archivo se interrumpió.")
+            time.sleep(UPLOAD_STREAM_POLL_SECONDS)
+
+    def open_reader(self):
+        return UploadStreamReader(self)
+
+    def discard(self):
+        with upload_digests_lock:
+            upload_digests.pop(self.upload_id, None)
+        shutil.rmtree(self.path, ignore_errors=True)
+
+def expire_upload_sessions():
+    """
+    Elimina las subidas por partes que no reciben datos hace más de UPLOAD_SESSION_TIMEOUT_SECONDS.
+    Las ya completas que esperan su escaneo en la cola se conservan mientras duran las tareas (JOB_TTL_SECONDS).
+    """
+    upload_folder = app.config['UPLOAD_FOLDER']
+    if not os.path.isdir(upload_folder):
+        return
+    now = time.time()
+    for entry in os.scandir(upload_folder):
+        if not entry.is_dir() or not entry.name.startswith(UPLOAD_SESSION_PREFIX):
+            continue
+        try:
+            last_used = max(item.stat().st_mtime for item in os.scandir(entry.path) if item.name.startswith('data'))
+        except (OSError, ValueError):
+            last_used = entry.stat().st_mtime
+        complete = os.path.exists(os.path.join(entry.path, UPLOAD_SESSION_RESULT_FILE))
+        timeout = app.config['JOB_TTL_SECONDS'] if complete else app.config['UPLOAD_SESSION_TIMEOUT_SECONDS']
+        if last_used < now - timeout:
+            shutil.rmtree(entry.path, ignore_errors=True)
+
+class UploadStreamReader(io.RawIOBase):
+    """
+    Archivo de solo lectura sobre una subida por partes en curso: cuando la lectura alcanza los
+    bytes recibidos, espera a que lleguen más, hasta completar el tamaño total del archivo.
+    """
+
+    def __init__(self, session):
+        super().__init__()
+        self.session = session
+        self._file = open(session.data_path, 'rb')
+        self._position = 0
+
+    def readable(self):
+        return True
+
+    def seekable(self):
+        return True
+
+    def tell(self):
+        return self._position
+
+    def seek(self, offset, whence=io.SEEK_SET):
+        base = {io.SEEK_SET: 0, io.SEEK_CUR: self._position, io.SEEK_END: self.session.total_size}[whence]
+        self._position = base + offset
+        return self._position
+
+    def readinto(self, buffer):
+        wanted = min(len(buffer), self.session.total_size - self._position)
+        if wanted <= 0:
+            return 0
+        available = self._wait_for_data()
+        self._file.seek(self._position)
+        count = self._file.readinto(memoryview(buffer)[:min(wanted, available - self._position)])
+        self._position += count
+        return count
+
+    def _wait_for_data(self):
+        """Devuelve el tamaño recibido cuando hay bytes nuevos para leer."""
+        timeout = app.config['UPLOAD_SESSION_TIMEOUT_SECONDS']
+        received, deadline = -1, 0
+        while True:
+            size = os.fstat(self._file.fileno()).st_size
+            if size > self._position:
+                return size
+            if size != received:
+                received, deadline = size, time.monotonic() + timeout
+            elif time.monotonic() > deadline:
+                raise OSError("La subida del archivo se interrumpió.")
+            time.sleep(UPLOAD_STREAM_POLL_SECONDS)
+
+    def close(self):
+        if not self.closed:
+            self._file.close()
+        super().close()
+
+def receive_upload(file, scanned=False):
+    """
+    Recibe el archivo de una petición. Si el formulario trae `total_size`, `file` es solo la primera
+    parte de una subida por partes: se abre una `UploadSession` y el resto llega por `/api/upload-part`.
+    Devuelve: (ruta del archivo en la caché o None, sesión o None si el archivo ya está completo)
+    """
+    total_size = request.form.get('total_size')
+    if total_size is None:
+        filepath, _ = save_upload(file)
+        return filepath, None
+
+    session = UploadSession.create(file.filename, int(total_size), scanned=scanned)
+    try:
+        received = session.append(0, file.stream)
+        if received == session.total_size:
+            filepath = session.finish()
+            session.discard()
+            return filepath, None
+        with open_csv_file(session.data_path, partial=True) as f:
+            if b'\n' not in f.read(received):
+                raise ValueError("La primera parte de la subida no contiene la cabecera completa del archivo.")
+    except Exception:
+        session.discard()
+        raise
+    return None, session
+
+def upload_session_fields(session):
+    """Campos de la respuesta para que el cliente siga subiendo el resto del archivo."""
+    if session is None:
+        return {}
+    return {'upload_id': session.upload_id, 'received': session.received, 'part_size': app.config['UPLOAD_PART_SIZE']}
+
+def discard_received_upload(filepath, session):
+    if session is not None:
+        session.discard()
+    elif filepath:
+        discard_upload(filepath)
+
+
+# --- Límites de Registros (mmap) ---
+
+# Posición en bytes de una de cada ROW_OFFSET_STRIDE filas de un archivo subido (uploads/<hash>/row_offsets.npz)
+UPLOAD_ROW_OFFSETS_FILE = 'row_offsets.npz'
+ROW_SCAN_BLOCK_SIZE = 8 * 1024 * 1024
+
+def get_upload_key(filepath):
+    """Identifica el contenido de un archivo: el hash de la caché de uploads, o ruta, tamaño y fecha."""
+    if is_cached_upload(filepath):
+        return os.path.basename(os.path.dirname(filepath))
+    stat = os.stat(filepath)
+    return (os.path.abspath(filepath), stat.st_size, stat.st_mtime_ns)
+
+class CsvRecordReader:
+    """
+    Encuentra los límites de los registros de un CSV sobre los bytes crudos, mapeando el archivo
+    en memoria (`mmap`), sin decodificarlo ni copiarlo.
+
+    Un salto de línea termina un registro solo si antes hay una cantidad par de comillas (no está
+    dentro de un campo entre comillas). Las líneas vacías no cuentan, igual que en pandas, y el
+    primer registro es la cabecera. Sirve para todos los encodings soportados (utf-8 y latin-1),
+    donde el salto de línea y las comillas ocupan un solo byte.
+    """
+
+    def __init__(self, filepath):
+        self.filepath = filepath
+        self._file = open(filepath, 'rb')
+        self.size = os.fstat(self._file.fileno()).st_size
+        # mmap no admite archivos vacíos
+        self._mmap = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ) if self.size else None
+
+    def close(self):
+        if self._mmap is not None:
+            self._mmap.close()
+        self._file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def _record_starts(self, position, count, quote_parity, record_start, previous_byte):
+        """
+        Busca los registros que terminan en los bytes [position, position + count), siguiendo
+        el estado del bloque anterior (paridad de comillas, inicio del registro abierto y último byte).
+        Devuelve (inicios de los registros no vacíos, nuevo estado...).
+        """
+        if count <= 0:
+            # Rango vacío (ej: fin de archivo o `skip_records` con end == start): el estado no cambia
+            return np.empty(0, dtype=np.int64), quote_parity, record_start, previous_byte
+        data = np.frombuffer(self._mmap, dtype=np.uint8, count=count, offset=position)
+        newlines = np.flatnonzero(data == ord('\n'))
+        quotes = np.flatnonzero(data == ord('"'))
+        if len(quotes):
+            # Comillas antes de cada salto de línea: si es impar, el salto está dentro de un campo
+            outside = ((np.searchsorted(quotes, newlines) + quote_parity) & 1) == 0
+            newlines = newlines[outside]
+            quote_parity = (quote_parity + len(quotes)) & 1
+        elif quote_parity:
+            newlines = newlines[:0]
+        before_end = np.where(newlines > 0, data[np.maximum(newlines - 1, 0)], previous_byte)
+        ends = newlines + position
+        starts = np.concatenate(([record_start], ends[:-1] + 1))
+        lengths = ends - starts
+        non_empty = starts[(lengths > 1) | ((lengths == 1) & (before_end != ord('\r')))]
+        if len(ends):
+            record_start = int(ends[-1]) + 1
+        previous_byte = int(data[-1])
+        # El array apunta al mmap: se libera antes de seguir para poder cerrarlo
+        del data
+        return non_empty, quote_parity, record_start, previous_byte
+
+    def scan_row_offsets(self, stride):
+        """
+        Devuelve (posición de cada `stride`-ésima fila de datos, cantidad de filas de datos),
+        o None si las comillas del archivo no cierran.
+        """
+        offsets = []
+        rows = -1  # la cabecera no cuenta
+        quote_parity = 0
+        record_start = 0
+        previous_byte = 0
+        for position in range(0, self.size, ROW_SCAN_BLOCK_SIZE):
+            count = min(ROW_SCAN_BLOCK_SIZE, self.size - position)
+            non_empty, quote_parity, record_start, previous_byte = self._record_starts(
+                position, count, quote_parity, record_start, previous_byte)
+
+            # Filas de datos de este bloque cuyo número es múltiplo de `stride`
+            numbers = np.arange(rows, rows + len(non_empty))
+            offsets.append(non_empty[(numbers >= 0) & (numbers % stride == 0)])
+            rows += len(non_empty)
+
+        if quote_parity:
+            return None
+        # Último registro sin salto de línea final
+        tail_length = self.size - record_start
+        if tail_length > 1 or (tail_length == 1 and previous_byte != ord('\r')):
+            if rows >= 0 and rows % stride == 0:
+                offsets.append(np.array([record_start]))
+            rows += 1
+        offsets = np.concatenate(offsets).astype(np.int64) if offsets else np.empty(0, dtype=np.int64)
+        return offsets, max(rows, 0)
+
+    def skip_records(self, start, end, count):
+        """
+        Posición del registro que está `count` registros después del que empieza en `start`,
+        buscando solo hasta `end` (ej: la siguiente posición del índice de filas).
+        """
+        if not count:
+            return start
+        non_empty, _, record_start, _ = self._record_starts(start, end - start, 0, start, 0)
+        # El último registro del archivo puede no tener salto de línea final
+        return int(non_empty[count]) if count < len(non_empty) else record_start
+
+class FileRangeReader(io.RawIOBase):
+    """
+    Vista de solo lectura de los bytes [start, end) de un archivo abierto, para que pandas lea un
+    rango por partes (con `chunksize`) sin cargarlo entero en memoria.
+    """
+
+    def __init__(self, f, start, end):
+        f.seek(start)
+        self._file = f
+        self._remaining = end - start
+
+    def readable(self):
+        return True
+
+    def readinto(self, buffer):
+        size = min(len(buffer), self._remaining)
+        if size <= 0:
+            return 0
+        with memoryview(buffer) as view:
+            read = self._file.readinto(view[:size])
+        self._remaining -= read
+        return read
+
+def get_row_offsets_path(filepath):
+    """Ruta del índice de filas guardado junto a un archivo de la caché de uploads, o None."""
+    return os.path.join(os.path.dirname(filepath), UPLOAD_ROW_OFFSETS_FILE) if is_cached_upload(filepath) else None
+
+@functools.lru_cache(maxsize=64)
+def load_row_offsets(filepath, upload_key, stride, known_rows=None):
+    """
+    Devuelve (posiciones, cantidad de filas) del índice de filas de un archivo, o None si no
+    se puede armar. En la caché de uploads se guarda junto al archivo (`row_offsets.npz`).
+
+    La cantidad de filas del índice sale de contar registros por la paridad de las comillas, y
+    puede no coincidir con lo que parsea pandas (ej: comillas sueltas que se compensan). Por eso no
+    se guarda en la metadata: `known_rows` es la cantidad confirmada por una lectura completa
+    (`row_count` de la metadata), y si el índice no coincide con ella no se usa.
+    `upload_key` y `known_rows` forman parte de la clave de la caché.
+    """
+    if get_compression(filepath):
+        # Las posiciones en bytes no sirven en un archivo comprimido: se usa la lectura secuencial
+        return None
+    offsets_path = get_row_offsets_path(filepath)
+    if offsets_path and os.path.exists(offsets_path):
+        try:
+            with np.load(offsets_path) as saved:
+                if int(saved['stride']) == stride:
+                    offsets, rows = saved['offsets'], int(saved['rows'])
+                    # El índice guardado es el mismo que se obtendría recorriendo el archivo de nuevo
+                    return (offsets, rows) if known_rows is None or known_rows == rows else None
+        except (OSError, ValueError, KeyError):
+            pass
+
+    with CsvRecordReader(filepath) as reader:
+        scanned = reader.scan_row_offsets(stride)
+    if scanned is None:
+        return None
+    offsets, rows = scanned
+    if offsets_path:
+        temp_path = f"{offsets_path}.{uuid.uuid4().hex}.tmp.npz"
+        try:
+            np.savez(temp_path, offsets=offsets, rows=rows, stride=stride)
+            os.replace(temp_path, offsets_path)
+        except OSError:
+            if os.path.exists(temp_path):
+                os.remove(temp_path)
+    if known_rows is not None and known_rows != rows:
+        # El archivo tiene comillas o líneas que pandas interpreta distinto: no se usa el índice
+        return None
+    return offsets, rows
+
+def get_row_offsets(filepath, build=True):
+    """
+    Índice de filas de un archivo: (posición de una de cada ROW_OFFSET_STRIDE filas, cantidad de filas), o None.
+    Con `build=False` solo se usa un índice ya guardado en la caché de uploads, sin recorrer el archivo.
+    """
+    try:
+        if not build:
+            offsets_path = get_row_offsets_path(filepath)
+            if offsets_path is None or not os.path.exists(offsets_path):
+                return None
+        known_rows = get_upload_metadata(filepath).get('row_count')
+        return load_row_offsets(filepath, get_upload_key(filepath), app.config['ROW_OFFSET_STRIDE'], known_rows)
+    except OSError:
+        return None
+
+def count_csv_rows(filepath):
+    """
+    Cantidad de filas de datos de un CSV, si ya se conoce: de la metadata o de un índice de filas
+    ya armado. No recorre el archivo; si devuelve None, el progreso de la tarea es por bytes leídos.
+    """
+    row_count = get_upload_metadata(filepath).get('row_count')
+    if row_count is not None:
+        return row_count
+    row_offsets = get_row_offsets(filepath, build=False)
+    return row_offsets[1] if row_offsets is not None else None
+
+def split_csv_byte_ranges(filepath, parts, align_rows=1):
+    """
+    Divide las filas de datos de un CSV en hasta `parts` rangos de bytes que empiezan y terminan
+    en límites de registros (nunca dentro de un campo entre comillas). Cada rango empieza en una
+    fila múltiplo de `align_rows` (ej: CHUNK_SIZE, para respetar los chunks de una lectura completa).
+    Devuelve una lista de (inicio, fin, número de la primera fila), o None si no hay índice de filas.
+
+    Solo se usa el índice cuando una lectura completa con pandas ya confirmó la cantidad de filas
+    (`row_count` de la metadata) y coincide con ella: si no, los rangos podrían no caer en los
+    mismos límites de chunk que la lectura secuencial y cambiaría el orden de la salida.
+    """
+    if get_upload_metadata(filepath).get('row_count') is None:
+        return None
+    row_offsets = get_row_offsets(filepath)
+    if row_offsets is None:
+        return None
+    offsets, rows = row_offsets
+    if not rows:
+        return []
+    stride = app.config['ROW_OFFSET_STRIDE']
+    candidates = np.arange(0, rows, align_rows)
+    first_rows = candidates[np.linspace(0, len(candidates), min(parts, len(candidates)) + 1).astype(int)[:-1]].tolist()
+    size = os.path.getsize(filepath)
+    starts = []
+    with CsvRecordReader(filepath) as reader:
+        for row in first_rows:
+            # Desde la fila del índice más cercana se avanza registro por registro hasta la fila pedida
+            indexed = row // stride
+            end = int(offsets[indexed + 1]) if indexed + 1 < len(offsets) else size
+            starts.append(reader.skip_records(int(offsets[indexed]), end, row % stride))
+    return [
+        (start, end, row)
+        for start, end, row in zip(starts, starts[1:] + [size], first_rows)
+    ]
+
+
+# --- Previsualización por Muestreo ---
+
+PREVIEW_MODES = ('head', 'tail', 'random')
+
+def choose_preview_rows(mode, size, total_rows, seed):
+    """Posiciones (ordenadas) de las filas a mostrar para cada modo de previsualización."""
+    size = min(size, total_rows)
+    if mode == 'tail':
+        return np.arange(total_rows - size, total_rows)
+    if mode == 'random':
+        return np.sort(np.random.default_rng(seed).choice(total_rows, size, replace=False))
+    return np.arange(size)
+
+def read_rows_at_offsets(filepath, rows, offsets, total_rows, stride):
+    """
+    Lee solo las filas pedidas: para cada bloque de `stride` filas que contiene alguna, se salta
+    con `seek` a su posición y se parsean sus bytes. Devuelve None si el parseo no coincide con el índice.
+    """
+    encoding, separator = get_csv_dialect(filepath)
+    columns = read_upload_header(filepath)
+    blocks = np.unique(rows // stride)
+    parts, block_base, base = [], {}, 0
+    with open(filepath, 'rb') as f:
+        for block in blocks.tolist():
+            f.seek(int(offsets[block]))
+            if block + 1 < len(offsets):
+                data = f.read(int(offsets[block + 1] - offsets[block]))
+            else:
+                data = f.read()
+                if not data.endswith(b'\n'):
+                    data += b'\n'
+            parts.append(data)
+            block_base[block] = base
+            base += min(stride, total_rows - block * stride)
+
+    frame = pd.read_csv(io.BytesIO(b''.join(parts)), header=None, names=columns, encoding=encoding, sep=separator,
+                        dtype=CSV_STRING_DTYPE)
+    if len(frame) != base:
+        return None
+    positions = [block_base[row // stride] + row % stride for row in rows.tolist()]
+    frame = frame.iloc[positions]
+    frame.index = pd.RangeIndex(len(frame))
+    return frame
+
+def read_rows_by_scanning(filepath, mode, size, seed):
+    """Alternativa sin índice de filas: recorre el archivo por chunks (dos veces si no se conoce la cantidad de filas)."""
+    total_rows = get_upload_metadata(filepath).get('row_count')
+    if total_rows is None:
+        total_rows = sum(len(chunk) for chunk, _ in read_upload_in_chunks(filepath, usecols=read_upload_header(filepath)[:1]))
+    wanted = choose_preview_rows(mode, size, total_rows, seed)
+    selected, start = [], 0
+    for chunk, _ in read_upload_in_chunks(filepath):
+        in_chunk = wanted[(wanted >= start) & (wanted < start + len(chunk))]
+        if len(in_chunk):
+            selected.append(chunk.iloc[in_chunk - start])
+        start += len(chunk)
+    if not selected:
+        return pd.DataFrame(columns=read_upload_header(filepath), dtype=CSV_STRING_DTYPE)
+    return pd.concat(selected, ignore_index=True)
+
+@functools.lru_cache(maxsize=64)
+def load_preview_sample(filepath, upload_key, mode, size, seed):
+    """
+    Muestra de filas (todas las columnas) para la previsualización. Se guarda en memoria por
+    (contenido del archivo, modo, tamaño, semilla), así que cambiar las columnas elegidas no vuelve a leer el archivo.
+    """
+    if mode == 'head':
+        return read_upload_head(filepath, size)
+
+    stride = app.config['ROW_OFFSET_STRIDE']
+    row_offsets = get_row_offsets(filepath)
+    if row_offsets is not None:
+        offsets, total_rows = row_offsets
+        rows = choose_preview_rows(mode, size, total_rows, seed)
+        if not len(rows):
+            return pd.DataFrame(columns=read_upload_header(filepath), dtype=CSV_STRING_DTYPE)
+        frame = read_rows_at_offsets(filepath, rows, offsets, total_rows, stride)
+        if frame is not None:
+            return frame
+    return read_rows_by_scanning(filepath, mode, size, seed)
+
+def read_upload_sample(filepath, nrows, usecols=None, mode='head', seed=0):
+    """
+    Lee `nrows` filas de un archivo subido como texto: las primeras ('head'), las últimas ('tail')
+    o al azar ('random', reproducible con `seed`), en el orden en que aparecen en el archivo.
+    """
+    if mode not in PREVIEW_MODES:
+        raise ValueError(f"Modo de previsualización no válido: {mode}")
+    sample = load_preview_sample(filepath, get_upload_key(filepath), mode, nrows, seed)
+    if usecols is None:
+        return sample.copy()
+    missing = [column for column in usecols if column not in sample.columns]
+    if missing:
+        raise KeyError(missing[0])
+    return sample[[column for column in sample.columns if column in usecols]].copy()
+
 
 # --- Rutas de la Aplicación ---
 
@@ -204,30 +1813,87 @@ def get_columns():
     if file.filename == '':
         return jsonify({"error": "No has seleccionado ningún archivo. Por favor, hacé clic en 'Seleccionar archivo' para elegir uno."}), 400
 
-    if not file.filename.endswith('.csv'):
-        return jsonify({"error": "El formato del archivo no es válido. La herramienta solo acepta archivos .csv."}), 400
+    if not is_csv_filename(file.filename):
+        return jsonify({"error": "El formato del archivo no es válido. La herramienta solo acepta archivos .csv (o comprimidos: .csv.gz, .csv.zst)."}), 400
 
-    filepath = os.path.join(app.config['UPLOAD_FOLDER'], file.filename)
+    filepath = None
+    session = None
     try:
-        file.save(filepath)
+        # En una subida por partes las columnas salen de la primera parte, sin esperar el resto
+        filepath, session = receive_upload(file)
         
-        columns, error_message, needs_docnum_generation = validate_and_get_columns(filepath)
+        columns, error_message, needs_docnum_generation, dialect = validate_and_get_columns(filepath or session.data_path)
 
         if error_message:
-            os.remove(filepath)
+            discard_received_upload(filepath, session)
             return jsonify({"error": error_message}), 400
 
+        if filepath:
+            schedule_columnar_sidecar(filepath)
+
         return jsonify({
             "columns": columns, 
             "filepath": filepath,
-            "needs_docnum_generation": needs_docnum_generation
+            "needs_docnum_generation": needs_docnum_generation,
+            "dialect": dialect,
+            **upload_session_fields(session)
         })
 
     except Exception as e:
-        if os.path.exists(filepath):
-            os.remove(filepath)
+        discard_received_upload(filepath, session)
         return jsonify({"error": "Ocurrió un error inesperado al procesar el archivo. Por favor, intentá de nuevo."}), 500
 
+@app.route('/api/upload-part', methods=['POST'])
+def upload_part():
+    """
+    Recibe una parte de una subida por partes. Con la última, el archivo pasa a la caché de
+    uploads y se devuelve su ruta (y sus columnas, ya leídas del archivo completo).
+    """
+    session = UploadSession.find(request.form.get('upload_id'))
+    if session is None:
+        return jsonify({"error": "La subida no existe o expiró. Por favor, seleccioná el archivo de nuevo."}), 404
+    if 'part' not in request.files:
+        return jsonify({"error": "No se recibió ninguna parte del archivo."}), 400
+    try:
+        offset = int(request.form.get('offset', ''))
+    except ValueError:
+        return jsonify({"error": "La posición de la parte debe ser un número entero."}), 400
+
+    try:
+        received = session.append(offset, request.files['part'].stream)
+    except ValueError as e:
+        return jsonify({"error": str(e), "received": session.received}), 409
+    except OSError:
+        return jsonify({"error": "La subida no existe o expiró. Por favor, seleccioná el archivo de nuevo."}), 404
+
+    if received < session.total_size:
+        return jsonify({"received": received})
+
+    try:
+        filepath = session.finish()
+        schedule_columnar_sidecar(filepath)
+        return jsonify({"received": received, "filepath": filepath, "columns": read_upload_header(filepath)})
+    except Exception as e:
+        session.discard()
+        return jsonify({"error": f"Ocurrió un error inesperado al guardar el archivo: {e}"}), 500
+
+def get_preview_sample_options(data, default_rows):
+    """
+    Lee de la petición el modo ('head', 'tail' o 'random'), la cantidad de filas y la semilla
+    de la previsualización. Devuelve: (opciones, error_mensaje)
+    """
+    mode = data.get('mode', 'head')
+    if mode not in PREVIEW_MODES:
+        return None, "Modo de previsualización no válido. Usá 'head', 'tail' o 'random'."
+    try:
+        nrows = int(data.get('rows', default_rows))
+        seed = int(data.get('seed', 0))
+    except (TypeError, ValueError):
+        return None, "La cantidad de filas y la semilla de la previsualización deben ser números enteros."
+    if not 1 <= nrows <= app.config['PREVIEW_MAX_ROWS']:
+        return None, f"La cantidad de filas de la previsualización debe estar entre 1 y {app.config['PREVIEW_MAX_ROWS']}."
+    return {'mode': mode, 'nrows': nrows, 'seed': seed}, None
+
 @app.route('/api/preview-file', methods=['POST'])
 def preview_file():
     """Genera y devuelve una previsualización de los datos del archivo."""
@@ -239,7 +1905,11 @@ def preview_file():
     if not filepath or not os.path.exists(filepath):
         return jsonify({"error": "No se pudo encontrar el archivo original para la previsualización. Por favor, intentá subir el archivo de nuevo."}), 400
 
-    preview_data, final_columns, error_message = generate_preview_data(filepath, selected_columns, needs_docnum_generation)
+    sample, error_message = get_preview_sample_options(data, default_rows=10)
+    if error_message:
+        return jsonify({"error": error_message}), 400
+
+    preview_data, final_columns, error_message = generate_preview_data(filepath, selected_columns, needs_docnum_generation, **sample)
 
     if error_message:
         return jsonify({"error": error_message}), 500
@@ -257,30 +1927,70 @@ def process_file_request():
     if not filepath or not os.path.exists(filepath):
         return jsonify({"error": "No se pudo encontrar el archivo original para iniciar el proceso. Por favor, intentá subir el archivo de nuevo."}), 400
 
-    task_id = str(uuid.uuid4())
-    original_filename = os.path.basename(filepath)
-    new_filename = f"{os.path.splitext(original_filename)[0]}_limpio.csv"
+    new_filename = get_output_filename(filepath, '_limpio')
     output_path = os.path.join(app.config['DOWNLOAD_FOLDER'], new_filename)
 
-    tasks[task_id] = {'status': 'processing', 'progress': 0}
-
-    thread = threading.Thread(target=process_csv_task, args=(task_id, filepath, selected_columns, needs_docnum_generation, output_path))
-    thread.start()
+    task_id = start_task('clean', process_csv_task, filepath, selected_columns, needs_docnum_generation, output_path)
 
     return jsonify({'task_id': task_id})
 
 @app.route('/api/progress/<task_id>')
 def get_progress(task_id):
     """Devuelve el progreso de una tarea de procesamiento."""
-    task = tasks.get(task_id)
+    task = job_store.get(task_id)
     if not task:
         return jsonify({'status': 'error', 'error': 'Task not found'}), 404
     return jsonify(task)
 
+@app.route('/api/progress/<task_id>/stream')
+def stream_progress(task_id):
+    """
+    Envía el progreso de una tarea por Server-Sent Events. Solo se envía un evento
+    cuando el estado cambia, y el stream se cierra al completarse o fallar la tarea.
+    """
+    def events():
+        last_task = None
+        last_event_at = time.monotonic()
+        while True:
+            task = job_store.get(task_id) or {'status': 'error', 'error': 'Task not found'}
+            if task != last_task:
+                yield f"data: {json.dumps(task)}\n\n"
+                if task['status'] != 'processing':
+                    return
+                last_task = task
+                last_event_at = time.monotonic()
+            elif time.monotonic() - last_event_at >= app.config['PROGRESS_STREAM_KEEPALIVE']:
+                # Comentario SSE para mantener viva la conexión a través de proxies
+                yield ": keepalive\n\n"
+                last_event_at = time.monotonic()
+            job_store.wait_for_change(app.config['PROGRESS_STREAM_INTERVAL'])
+
+    return Response(events(), mimetype='text/event-stream', headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'})
+
 @app.route('/downloads/<path:filename>')
 def download_file(filename):
-    """Sirve los archivos procesados para su descarga."""
-    return send_from_directory(app.config['DOWNLOAD_FOLDER'], filename, as_attachment=True)
+    """
+    Sirve los archivos procesados para su descarga. Un CSV comprimido (.gz / .zst) se envía tal
+    cual con `Content-Encoding` si el cliente acepta esa codificación (el navegador lo guarda
+    descomprimido como .csv) y, si no, se descomprime en streaming al enviarlo.
+    """
+    compression = get_compression(filename)
+    if not compression:
+        return send_from_directory(app.config['DOWNLOAD_FOLDER'], filename, as_attachment=True)
+
+    download_name = os.path.basename(os.path.splitext(filename)[0])
+    if request.accept_encodings[compression]:
+        response = send_from_directory(app.config['DOWNLOAD_FOLDER'], filename, as_attachment=True,
+                                       download_name=download_name, mimetype='text/csv')
+        response.headers['Content-Encoding'] = compression
+    else:
+        path = safe_join(app.config['DOWNLOAD_FOLDER'], filename)
+        if path is None or not os.path.isfile(path):
+            abort(404)
+        response = send_file(DecompressedReader(open(path, 'rb'), compression), as_attachment=True,
+                             download_name=download_name, mimetype='text/csv')
+    response.headers['Vary'] = 'Accept-Encoding'
+    return response
 
 
 @app.route('/api/multi-export-initial-process', methods=['POST'])
@@ -289,219 +1999,738 @@ def multi_export_initial_process():
         return jsonify({"error": "No se ha subido ningún archivo."}), 400
 
     file = request.files['csv_file']
-    if file.filename == '' or not file.filename.endswith('.csv'):
-        return jsonify({"error": "Archivo no válido. Por favor, sube un archivo .csv."}), 400
+    if file.filename == '' or not is_csv_filename(file.filename):
+        return jsonify({"error": "Archivo no válido. Por favor, sube un archivo .csv (o comprimido: .csv.gz, .csv.zst)."}), 400
 
-    temp_filepath = os.path.join(app.config['UPLOAD_FOLDER'], file.filename)
+    temp_filepath = None
+    session = None
     try:
-        file.save(temp_filepath)
-
-        task_id = str(uuid.uuid4())
-        tasks[task_id] = {'status': 'processing', 'progress': 0}
-
-        thread = threading.Thread(target=multi_export_initial_process_task, args=(task_id, temp_filepath))
-        thread.start()
+        temp_filepath, session = receive_upload(file, scanned=True)
+        if session is not None:
+            # El escaneo empieza con la primera parte y avanza a medida que llegan las siguientes
+            task_id = start_task('multi_export_scan', multi_export_initial_process_task, None, session.upload_id)
+            return jsonify({'task_id': task_id, **upload_session_fields(session)})
+
+        metadata = get_upload_metadata(temp_filepath)
+        if 'unique_entities' in metadata:
+            # El mismo archivo ya fue escaneado: la tarea se completa sin volver a leerlo
+            task_id = job_store.create('multi_export_scan')
+            update_task(task_id, status='complete', progress=100, result={
+                "filepath": temp_filepath,
+                "unique_data": metadata['unique_entities']
+            })
+        else:
+            task_id = start_task('multi_export_scan', multi_export_initial_process_task, temp_filepath)
+        schedule_columnar_sidecar(temp_filepath)
 
         return jsonify({'task_id': task_id})
 
     except Exception as e:
-        if os.path.exists(temp_filepath):
-            os.remove(temp_filepath)
+        discard_received_upload(temp_filepath, session)
         return jsonify({"error": f"Ocurrió un error inesperado al iniciar el procesamiento: {e}"}), 500
 
-def multi_export_initial_process_task(task_id, temp_filepath):
+def multi_export_initial_process_task(task_id, temp_filepath, upload_id=None):
+    """
+    Escaneo inicial de la exportación múltiple: entidades únicas de cada categoría e índice invertido.
+    Con `upload_id`, el archivo se sigue subiendo por partes y se escanea a medida que llega;
+    su ruta en la caché se conoce al terminar la subida.
+    """
     try:
-        encoding = get_csv_encoding(temp_filepath)
-        try:
-            df = pd.read_csv(temp_filepath, sep=app.config['CSV_SEPARATOR'], encoding=encoding)
-        except UnicodeDecodeError:
-            encoding = 'latin-1'
-            df = pd.read_csv(temp_filepath, sep=app.config['CSV_SEPARATOR'], encoding=encoding)
-
-        all_banks = set()
-        all_cards = set()
-        all_cobrands = set()
-        all_partners = set()
-
-        total_rows = len(df)
-        processed_rows = 0
-
-        for index, row in df.iterrows():
-            if 'EMIS_BANCOS' in df.columns and pd.notna(row['EMIS_BANCOS']):
-                for item in str(row['EMIS_BANCOS']).split(','):
-                    cleaned_item = item.strip()
-                    if cleaned_item and cleaned_item != 'OTROS_BANCOS':
-                        all_banks.add(cleaned_item)
-
-            if 'EMIS_TARJETAS' in df.columns and pd.notna(row['EMIS_TARJETAS']):
-                for item in str(row['EMIS_TARJETAS']).split(','):
-                    cleaned_item = item.strip()
-                    if cleaned_item and cleaned_item != 'OTRAS_TARJETAS':
-                        all_cards.add(cleaned_item)
-
-            if 'PLUS_PARTNER_COBRAND' in df.columns and pd.notna(row['PLUS_PARTNER_COBRAND']):
-                for item in str(row['PLUS_PARTNER_COBRAND']).split(','):
-                    cleaned_item = item.strip()
-                    if cleaned_item:
-                        all_cobrands.add(cleaned_item)
-
-            if 'PLUS_PARTNER_EMPRESAS' in df.columns and pd.notna(row['PLUS_PARTNER_EMPRESAS']):
-                for item in str(row['PLUS_PARTNER_EMPRESAS']).split(','):
-                    cleaned_item = item.strip()
-                    if cleaned_item:
-                        all_partners.add(cleaned_item)
-            
-            processed_rows += 1
-            progress = (processed_rows / total_rows) * 100
-            tasks[task_id]['progress'] = round(progress)
-
-        tasks[task_id]['status'] = 'complete'
-        tasks[task_id]['result'] = {
+        scanned = None
+        if upload_id is not None:
+            temp_filepath, scanned = scan_multi_export_upload(task_id, upload_id)
+        if scanned is None:
+            columns = read_upload_header(temp_filepath)
+            entity_columns, index = prepare_multi_export_scan(columns, temp_filepath if is_cached_upload(temp_filepath) else None)
+            chunks = read_upload_in_chunks(temp_filepath, usecols=multi_export_scan_columns(entity_columns, index))
+            unique_entities, row_count = scan_multi_export_entities(task_id, chunks, entity_columns, index)
+            if index:
+                index.save()
+        else:
+            unique_entities, row_count, entity_columns = scanned
+
+        unique_data = {category: sorted(items) for category, items in unique_entities.items()}
+        if app.config['ENTITY_CATALOG_AUTO_UPDATE']:
+            entity_catalog.merge(unique_data)
+        metadata = {'unique_entities': unique_data}
+        if entity_columns:
+            metadata['row_count'] = row_count
+        update_upload_metadata(temp_filepath, **metadata)
+
+        update_task(task_id, status='complete', result={
             "filepath": temp_filepath,
-            "unique_data": {
-                "bancos": sorted(list(all_banks)),
-                "tarjetas": sorted(list(all_cards)),
-                "cobrands": sorted(list(all_cobrands)),
-                "partners": sorted(list(all_partners))
-            }
-        }
+            "unique_data": unique_data
+        })
 
     except UnicodeDecodeError:
-        tasks[task_id]['status'] = 'error'
-        tasks[task_id]['error'] = "Error de codificación: El archivo no pudo ser leído correctamente. Asegúrate de que esté en formato UTF-8 o Latin-1."
+        update_task(task_id, status='error', error="Error de codificación: El archivo no pudo ser leído correctamente. Asegúrate de que esté en formato UTF-8 o Latin-1.")
     except Exception as e:
-        tasks[task_id]['status'] = 'error'
-        tasks[task_id]['error'] = f"Ocurrió un error inesperado durante el procesamiento inicial: {e}"
+        update_task(task_id, status='error', error=f"Ocurrió un error inesperado durante el procesamiento inicial: {e}")
 
+def prepare_multi_export_scan(columns, index_dir):
+    """
+    Columnas de entidades presentes en el archivo y, si corresponde, el constructor del índice
+    invertido (en `index_dir`, o None para no armarlo). Devuelve (columnas de entidades, índice o None).
+    """
+    entity_columns = [column for _, column, _, _ in MULTI_EXPORT_CATEGORIES if column in columns]
+    index = None
+    if entity_columns and 'email' in columns and app.config['MULTI_EXPORT_INDEX'] and index_dir:
+        index = EntityIndexBuilder(get_entity_index_path(index_dir))
+    return entity_columns, index
 
-def multi_export_process_task(task_id, filepath, selected_categories_and_items, output_zip_path):
+def multi_export_scan_columns(entity_columns, index):
+    # Solo se leen las columnas de entidades presentes en el archivo (y el email, para el índice)
+    return ['email'] + entity_columns if index else entity_columns
+
+def scan_multi_export_entities(task_id, chunks, entity_columns, index):
+    """
+    Junta las entidades únicas de cada categoría (y arma el índice, sin guardarlo) recorriendo
+    los chunks. Devuelve (entidades únicas, cantidad de filas). Si falla, descarta el índice.
+    """
+    unique_entities = {category: set() for category, _, _, _ in MULTI_EXPORT_CATEGORIES}
+    row_count = 0
+    if not entity_columns:
+        return unique_entities, row_count
     try:
-        # --- Cargar configuración ---
-        with open('config/bancos_conocidos.txt', 'r') as f:
-            known_banks = set(line.strip() for line in f)
-        with open('config/tarjetas_conocidas.txt', 'r') as f:
-            known_cards = set(line.strip() for line in f)
-        with open('config/arplus_cobrand.txt', 'r') as f:
-            known_cobrands = set(line.strip() for line in f)
-        with open('config/arplus_partners.txt', 'r') as f:
-            known_partners = set(line.strip() for line in f)
-
-        # --- Leer CSV ---
-        encoding = get_csv_encoding(filepath)
+        for chunk, progress in chunks:
+            collect_unique_entities(chunk, unique_entities)
+            if index:
+                index.add_chunk(chunk)
+            row_count += len(chunk)
+            update_task(task_id, progress=progress)
+    except Exception:
+        if index:
+            index.discard()
+        raise
+    return unique_entities, row_count
+
+def scan_multi_export_upload(task_id, upload_id):
+    """
+    Escaneo inicial mientras el archivo se sigue subiendo: lee `data` de la subida por partes,
+    esperando los bytes que faltan, con el formato detectado en lo ya recibido.
+    Devuelve (ruta del archivo en la caché, (entidades únicas, filas, columnas de entidades)), o
+    (ruta, None) si el formato del archivo completo no coincide con el detectado al principio
+    (ej: un carácter latin-1 después de la primera parte) y hay que escanearlo de nuevo.
+    """
+    session = UploadSession(upload_id)
+    try:
+        dialect = get_csv_dialect(session.data_path)
+        columns = read_upload_header(session.data_path)
+        # El índice se arma dentro de la sesión y se mueve junto al archivo al terminar la subida
+        entity_columns, index = prepare_multi_export_scan(columns, session.data_path)
         try:
-            df = pd.read_csv(filepath, sep=app.config['CSV_SEPARATOR'], encoding=encoding)
+            with session.open_reader() as raw, open_decompressed(raw, session.compression) as reader:
+                chunks = read_csv_handle_in_chunks(reader, *dialect, multi_export_scan_columns(entity_columns, index),
+                                                   session.total_size, raw.tell)
+                unique_entities, row_count = scan_multi_export_entities(task_id, chunks, entity_columns, index)
         except UnicodeDecodeError:
-            encoding = 'latin-1'
-            df = pd.read_csv(filepath, sep=app.config['CSV_SEPARATOR'], encoding=encoding)
+            temp_filepath = session.wait()
+            if get_csv_dialect(temp_filepath) == dialect:
+                raise
+            return temp_filepath, None
+
+        temp_filepath = session.wait()
+        if get_csv_dialect(temp_filepath) != dialect or read_upload_header(temp_filepath) != columns:
+            if index:
+                index.discard()
+            return temp_filepath, None
+        if index:
+            index.save(get_entity_index_path(temp_filepath))
+        return temp_filepath, (unique_entities, row_count, entity_columns)
+    finally:
+        session.discard()
+
+
+# --- Motor Vectorizado de Exportación Múltiple ---
+
+# (categoría, columna del CSV, prefijo del archivo generado, catálogo de entidades conocidas)
+MULTI_EXPORT_CATEGORIES = [
+    ('bancos', 'EMIS_BANCOS', 'banco', 'config/bancos_conocidos.txt'),
+    ('tarjetas', 'EMIS_TARJETAS', 'tarjeta', 'config/tarjetas_conocidas.txt'),
+    ('cobrands', 'PLUS_PARTNER_COBRAND', 'cobrand', 'config/arplus_cobrand.txt'),
+    ('partners', 'PLUS_PARTNER_EMPRESAS', 'partner', 'config/arplus_partners.txt'),
+]
+
+# Valores genéricos que no se ofrecen como entidades seleccionables
+EXCLUDED_ENTITIES = {
+    'bancos': {'OTROS_BANCOS'},
+    'tarjetas': {'OTRAS_TARJETAS'},
+}
+
+@contextmanager
+def file_lock(path, timeout=30, stale_seconds=60):
+    """
+    Lock entre procesos sobre `path` con un archivo `path + '.lock'` creado en forma exclusiva
+    (funciona igual en Linux y Windows). Un lock más viejo que `stale_seconds` se considera de un
+    proceso que murió sin soltarlo y se descarta.
+    """
+    lock_path = f"{path}.lock"
+    deadline = time.monotonic() + timeout
+    while True:
+        try:
+            os.close(os.open(lock_path, os.O_CREAT | os.O_EXCL | os.O_WRONLY))
+            break
+        except FileExistsError:
+            try:
+                if time.time() - os.path.getmtime(lock_path) > stale_seconds:
+                    os.remove(lock_path)
+                    continue
+            except FileNotFoundError:
+                continue
+            if time.monotonic() > deadline:
+                raise TimeoutError(f"No se pudo tomar el lock de {path}")
+            time.sleep(0.05)
+    try:
+        yield
+    finally:
+        try:
+            os.remove(lock_path)
+        except FileNotFoundError:
+            pass
+
+class EntityCatalog:
+    """
+    Catálogos de entidades conocidas (`config/*.txt`) en memoria, compartidos por todas las tareas.
+
+    Cada archivo se lee una sola vez y se vuelve a leer solo si cambia su fecha de modificación o
+    su tamaño (ej: si se edita a mano). `merge` agrega entidades nuevas (con `batch catalogos` o,
+    si está activado `ENTITY_CATALOG_AUTO_UPDATE`, las del escaneo inicial) y reescribe solo los
+    catálogos que cambiaron, ordenados y de forma atómica. Cada catálogo se relee y se reescribe
+    con su `file_lock` tomado, así dos procesos (workers de gunicorn, `--procesos` del batch) que
+    agregan a la vez no pierden las entidades del otro.
+    """
+
+    def __init__(self, categories):
+        self._paths = {category: config_path for category, _, _, config_path in categories}
+        self._lock = threading.Lock()
+        # categoría -> ((mtime, tamaño) del archivo leído, entidades)
+        self._entries = {}
+
+    def _load(self, category):
+        # Se llama con el lock tomado
+        path = self._paths[category]
+        try:
+            stat = os.stat(path)
+        except FileNotFoundError:
+            self._entries.pop(category, None)
+            return frozenset()
+        signature = (stat.st_mtime_ns, stat.st_size)
+        entry = self._entries.get(category)
+        if entry is None or entry[0] != signature:
+            with open(path, 'r', encoding='utf-8') as f:
+                entry = (signature, frozenset(line.strip() for line in f if line.strip()))
+            self._entries[category] = entry
+        return entry[1]
+
+    def get(self):
+        """Entidades conocidas de cada categoría ({categoría: frozenset})."""
+        with self._lock:
+            return {category: self._load(category) for category in self._paths}
+
+    def merge(self, unique_entities):
+        """
+        Agrega a los catálogos las entidades de `unique_entities` ({categoría: ítems}) que todavía
+        no están, sin las genéricas de `EXCLUDED_ENTITIES`. Devuelve {categoría: ítems agregados}.
+        """
+        added = {}
+        with self._lock:
+            for category, items in unique_entities.items():
+                if category not in self._paths:
+                    continue
+                new_items = set(items) - self._load(category) - EXCLUDED_ENTITIES.get(category, set()) - {''}
+                if not new_items:
+                    continue
+                path = self._paths[category]
+                with file_lock(path):
+                    # Releído con el lock: otro proceso pudo haberlo reescrito
+                    self._entries.pop(category, None)
+                    known = self._load(category)
+                    new_items -= known
+                    if not new_items:
+                        continue
+                    temp_path = f"{path}.{os.getpid()}.tmp"
+                    with open(temp_path, 'w', encoding='utf-8') as f:
+                        f.writelines(f"{item}\n" for item in sorted(known | new_items))
+                    os.replace(temp_path, path)
+                    self._entries.pop(category, None)
+                    self._load(category)
+                added[category] = sorted(new_items)
+        return added
+
+entity_catalog = EntityCatalog(MULTI_EXPORT_CATEGORIES)
+
+def load_known_entities():
+    """Entidades conocidas de cada categoría (ver `EntityCatalog`)."""
+    return entity_catalog.get()
+
+def clean_email_series(emails):
+    """Versión vectorizada de `clean_email`: descarta todo hasta el primer '>'."""
+    return emails.str.replace(r'^[^>]*>', '', n=1, regex=True)
+
+def explode_multi_value_column(series):
+    """
+    Separa por coma una columna multivalor (ej: 'GALICIA, VISA') y devuelve
+    un ítem por fila, conservando el índice de la fila original.
+    """
+    return series.dropna().astype(str).str.split(',').explode().str.strip()
+
+def collect_unique_entities(chunk, unique_entities):
+    """
+    Agrega a `unique_entities` las entidades individuales que aparecen en un chunk.
+    Las celdas repetidas se descartan antes de separarlas por coma.
+    """
+    for category, column, _, _ in MULTI_EXPORT_CATEGORIES:
+        if column not in chunk.columns:
+            continue
+        raw_cells = pd.Series(chunk[column].dropna().unique(), dtype=object)
+        items = explode_multi_value_column(raw_cells)
+        unique_entities[category].update(item for item in items.unique() if item)
+        unique_entities[category] -= EXCLUDED_ENTITIES.get(category, set())
+
+def iter_entity_occurrences(chunk, wanted_items):
+    """
+    Recorre las entidades de un chunk (ya filtrado a las filas con email).
+
+    Las columnas multivalor tienen pocas combinaciones distintas, así que cada una se
+    factoriza, se explotan y filtran (`isin`) solo sus valores únicos, y luego cada
+    entidad se traduce a las filas que la contienen con operaciones de NumPy.
+
+    `wanted_items` = {categoría: ítems buscados, o None para todos los ítems}.
+    Genera (orden de la categoría, categoría, prefijo, ítem, posiciones de las filas que lo
+    contienen, veces que aparece en cada una, posición del ítem en la celda de la primera fila).
+    """
+    for category_order, (category, column, prefix, _) in enumerate(MULTI_EXPORT_CATEGORIES):
+        if category not in wanted_items:
+            continue
+
+        codes, uniques = pd.factorize(chunk[column])
+        items = explode_multi_value_column(pd.Series(uniques, dtype=object))
+        positions = items.groupby(level=0).cumcount()
+        wanted = wanted_items[category]
+        mask = items.isin(wanted) if wanted is not None else items != ''
+        if not mask.any():
+            continue
+
+        matches = pd.DataFrame({'item': items[mask], 'code': items.index[mask.to_numpy()], 'pos': positions[mask]})
+        for item, group in matches.groupby('item', sort=False):
+            item_codes = group['code'].to_numpy()
+            # Cantidad de veces que aparece la entidad en la celda de cada fila (código -1 = vacía)
+            occurrences = np.bincount(item_codes + 1, minlength=len(uniques) + 1)[codes + 1]
+            hit_rows = np.flatnonzero(occurrences)
+            first_pos = group['pos'].to_numpy()[item_codes == codes[hit_rows[0]]][0]
+            yield category_order, category, prefix, item, hit_rows, occurrences[hit_rows], first_pos
+
+class EmailTable:
+    """
+    Tabla de emails internados de la exportación múltiple. Cada email se guarda una sola vez,
+    codificado en UTF-8 dentro de un único buffer, y los archivos de cada entidad guardan
+    solo los ids (uint32) de sus filas. Los textos se recuperan al escribir cada archivo.
+    """
+
+    def __init__(self):
+        self.count = 0
+        self._parts = []
+        self._lengths = []
+        self._data = b''
+        self._offsets = np.zeros(1, dtype=np.int64)
+        self._separator = 0
+
+    @classmethod
+    def from_file(cls, path, separator=b'\x00'):
+        """Carga una tabla desde un archivo de emails terminados en `separator` (el emails.txt del índice)."""
+        table = cls()
+        with open(path, 'rb') as f:
+            table._data = f.read()
+        ends = np.flatnonzero(np.frombuffer(table._data, dtype=np.uint8) == separator[0])
+        table._offsets = np.concatenate(([0], ends + 1))
+        table._separator = len(separator)
+        table.count = len(ends)
+        return table
+
+    def add(self, emails):
+        """Agrega los emails a la tabla y devuelve sus ids."""
+        encoded = [email.encode('utf-8') for email in emails]
+        self._parts.append(b''.join(encoded))
+        self._lengths.append(np.fromiter(map(len, encoded), dtype=np.int64, count=len(encoded)))
+        ids = np.arange(self.count, self.count + len(encoded), dtype=np.uint32)
+        self.count += len(encoded)
+        return ids
+
+    def _compact(self):
+        if not self._parts:
+            return
+        lengths = np.concatenate(self._lengths)
+        self._offsets = np.concatenate((self._offsets, self._offsets[-1] + np.cumsum(lengths)))
+        self._data += b''.join(self._parts)
+        self._parts, self._lengths = [], []
+
+    @property
+    def nbytes(self):
+        return len(self._data) + self._offsets.nbytes + sum(len(part) for part in self._parts) + sum(lengths.nbytes for lengths in self._lengths)
+
+    def resolve(self, ids, batch_size=65536):
+        """
+        Devuelve la lista de emails correspondiente a un array de ids. Los bytes de cada
+        lote se juntan con NumPy (separados por NUL) y se decodifican de una sola vez.
+        """
+        self._compact()
+        data = np.frombuffer(self._data, dtype=np.uint8)
+        emails = []
+        for batch_start in range(0, len(ids), batch_size):
+            batch = np.asarray(ids[batch_start:batch_start + batch_size], dtype=np.int64)
+            starts = self._offsets[batch]
+            lengths = self._offsets[batch + 1] - self._separator - starts
+            out_starts = np.cumsum(lengths + 1) - (lengths + 1)
+            positions = np.arange(int(lengths.sum()) + len(batch)) + np.repeat(starts - out_starts, lengths + 1)
+            gathered = data.take(positions, mode='clip')
+            gathered[out_starts + lengths] = 0
+            values = gathered.tobytes().decode('utf-8').split('\x00')[:-1]
+            if len(values) != len(batch):
+                # Algún email contiene NUL: se recuperan de a uno
+                values = [self._data[start:start + length].decode('utf-8') for start, length in zip(starts.tolist(), lengths.tolist())]
+            emails.extend(values)
+        return emails
+
+def multi_export_fan_out_chunk(chunk, selected_categories_and_items, known_entities, data_for_csv, first_seen, email_table):
+    """
+    Reparte los emails de un chunk entre los archivos de cada entidad seleccionada.
+
+    Los emails de las filas que entran en algún archivo se internan en `email_table`, y
+    `data_for_csv` acumula por archivo los arrays de ids. `first_seen` guarda la posición
+    (fila, categoría, ítem dentro de la celda) de la primera aparición de cada archivo,
+    para poder reproducir el orden en que el recorrido fila por fila los habría creado.
+    """
+    chunk = chunk[chunk['email'].notna()]
+    if chunk.empty:
+        return
+
+    row_labels = chunk.index.to_numpy()
+    wanted_items = {
+        category: known_entities[category].intersection(selected_categories_and_items[category])
+        for category, _, _, _ in MULTI_EXPORT_CATEGORIES if category in selected_categories_and_items
+    }
+    hits = list(iter_entity_occurrences(chunk, wanted_items))
+    if not hits:
+        return
+
+    used_rows = np.unique(np.concatenate([hit_rows for _, _, _, _, hit_rows, _, _ in hits]))
+    ids = np.zeros(len(chunk), dtype=np.uint32)
+    ids[used_rows] = email_table.add(clean_email_series(chunk['email'].iloc[used_rows]).tolist())
+
+    for category_order, _, prefix, item, hit_rows, occurrences, first_pos in hits:
+        key = f"{prefix}_{item}"
+        if key not in data_for_csv:
+            data_for_csv[key] = []
+            first_seen[key] = (row_labels[hit_rows[0]], category_order, first_pos)
+        data_for_csv[key].append(np.repeat(ids[hit_rows], occurrences))
+
+def order_multi_export_data(data_for_csv, first_seen):
+    """Devuelve los archivos a generar (nombre, ids) en el orden de su primera aparición en el CSV."""
+    return [(key, np.concatenate(data_for_csv[key])) for key in sorted(data_for_csv, key=first_seen.__getitem__)]
+
+# Índice invertido de la exportación múltiple, guardado en uploads/<hash>/entity_index/
+ENTITY_INDEX_DIR = 'entity_index'
+ENTITY_INDEX_VERSION = 2
+
+def get_entity_index_path(filepath):
+    return os.path.join(os.path.dirname(filepath), ENTITY_INDEX_DIR)
+
+class EntityIndexBuilder:
+    """
+    Arma el índice invertido de la exportación múltiple durante el escaneo inicial.
+
+    Cada fila con email recibe un id (su posición entre esas filas) y su email limpio se
+    escribe en `emails.txt`. Para cada entidad se guardan los ids de las filas donde aparece,
+    repetidos tantas veces como aparece en la celda, y su primera aparición, de modo que el
+    ZIP se puede generar para cualquier selección sin volver a leer el CSV. Además, cada
+    entidad tiene un bitmap de pertenencia sobre los ids (`bitmaps.npy`, un bit por fila)
+    para responder conteos y cruces entre entidades sin recorrer las listas.
+    """
+
+    def __init__(self, index_path):
+        self.index_path = index_path
+        self.temp_path = f"{index_path}.{uuid.uuid4().hex}.tmp"
+        os.makedirs(self.temp_path)
+        self._emails = open(os.path.join(self.temp_path, 'emails.txt'), 'w', encoding='utf-8', newline='')
+        self.email_count = 0
+        self.postings = {}
+        self.first_seen = {}
+        self.enabled = True
+
+    def add_chunk(self, chunk):
+        if not self.enabled:
+            return
+        chunk = chunk[chunk['email'].notna()]
+        if chunk.empty:
+            return
+
+        emails = clean_email_series(chunk['email']).tolist()
+        text = '\x00'.join(emails)
+        if text.count('\x00') != len(emails) - 1:
+            # El separador aparece en los datos: la exportación leerá el CSV
+            self.enabled = False
+            return
+        self._emails.write(text + '\x00')
+
+        ids = np.arange(self.email_count, self.email_count + len(chunk), dtype=np.uint32)
+        wanted_items = {category: None for category, column, _, _ in MULTI_EXPORT_CATEGORIES if column in chunk.columns}
+        for category_order, category, _, item, hit_rows, occurrences, first_pos in iter_entity_occurrences(chunk, wanted_items):
+            key = (category, item)
+            if key not in self.first_seen:
+                self.first_seen[key] = [int(ids[hit_rows[0]]), category_order, int(first_pos)]
+            self.postings.setdefault(key, []).append(np.repeat(ids[hit_rows], occurrences))
+        self.email_count += len(chunk)
+
+    def save(self, index_path=None):
+        """
+        Escribe las listas de ids y reemplaza el índice anterior de forma atómica. `index_path`
+        cambia el destino, cuando se conoce recién al terminar el escaneo (subida por partes).
+        """
+        if index_path is not None:
+            self.index_path = index_path
+        self._emails.close()
+        if not self.enabled:
+            self.discard()
+            return
+
+        entries, arrays, start = [], [], 0
+        bitmaps = np.zeros((len(self.postings), (self.email_count + 7) // 8), dtype=np.uint8)
+        members = np.zeros(self.email_count, dtype=bool)
+        for row, ((category, item), parts) in enumerate(self.postings.items()):
+            array = np.concatenate(parts)
+            entries.append([category, item, start, start + len(array), self.first_seen[(category, item)]])
+            arrays.append(array)
+            start += len(array)
+            members[array] = True
+            bitmaps[row] = np.packbits(members)
+            members[array] = False
+        postings = np.concatenate(arrays) if arrays else np.empty(0, dtype=np.uint32)
+        np.save(os.path.join(self.temp_path, 'postings.npy'), postings)
+        np.save(os.path.join(self.temp_path, 'bitmaps.npy'), bitmaps)
+        with open(os.path.join(self.temp_path, 'entries.json'), 'w', encoding='utf-8') as f:
+            json.dump({'version': ENTITY_INDEX_VERSION, 'emails': self.email_count, 'entries': entries}, f)
+
+        shutil.rmtree(self.index_path, ignore_errors=True)
+        os.replace(self.temp_path, self.index_path)
+
+    def discard(self):
+        self._emails.close()
+        shutil.rmtree(self.temp_path, ignore_errors=True)
+
+def load_multi_export_from_index(filepath, selected_categories_and_items, known_entities):
+    """
+    Devuelve la tabla de emails y los archivos de la exportación (nombre, ids), en el orden
+    de su primera aparición, a partir del índice invertido, o None si el archivo no tiene índice.
+    """
+    if not is_cached_upload(filepath):
+        return None
+    index_path = get_entity_index_path(filepath)
+    try:
+        with open(os.path.join(index_path, 'entries.json'), encoding='utf-8') as f:
+            index = json.load(f)
+        if index['version'] != ENTITY_INDEX_VERSION:
+            return None
+        postings = np.load(os.path.join(index_path, 'postings.npy'), mmap_mode='r')
+        email_table = EmailTable.from_file(os.path.join(index_path, 'emails.txt'))
+    except (OSError, ValueError, KeyError):
+        return None
+
+    prefixes = {category: prefix for category, _, prefix, _ in MULTI_EXPORT_CATEGORIES}
+    selected = [
+        (first_seen, f"{prefixes[category]}_{item}", start, end)
+        for category, item, start, end, first_seen in index['entries']
+        if item in selected_categories_and_items.get(category, ()) and item in known_entities.get(category, ())
+    ]
+    selected.sort()
+    return email_table, [(name, postings[start:end]) for _, name, start, end in selected]
+
+# Cantidad de bits en 1 de cada byte posible, para contar los miembros de un bitmap
+POPCOUNT_TABLE = np.array([bin(value).count('1') for value in range(256)], dtype=np.uint8)
+
+def bitmap_count(bitmap):
+    if hasattr(np, 'bitwise_count'):  # NumPy >= 2.0
+        return int(np.bitwise_count(bitmap).sum(dtype=np.int64))
+    return int(POPCOUNT_TABLE[bitmap].sum(dtype=np.int64))
+
+class EntityBitmaps:
+    """
+    Bitmaps de pertenencia del índice invertido: una fila de bits por entidad, donde el
+    bit i indica si la fila con email i contiene la entidad. Los conteos y cruces entre
+    entidades se resuelven con AND/OR bit a bit sobre el archivo mapeado en memoria.
+    """
+
+    def __init__(self, index_path):
+        with open(os.path.join(index_path, 'entries.json'), encoding='utf-8') as f:
+            index = json.load(f)
+        if index['version'] != ENTITY_INDEX_VERSION:
+            raise ValueError(f"Versión del índice no soportada: {index['version']}")
+        self.total_rows = index['emails']
+        self.bitmaps = np.load(os.path.join(index_path, 'bitmaps.npy'), mmap_mode='r')
+        self.rows = {}
+        self.occurrences = {}
+        for row, (category, item, start, end, _) in enumerate(index['entries']):
+            self.rows[(category, item)] = row
+            self.occurrences[(category, item)] = end - start
+
+    def bitmap(self, category, item):
+        row = self.rows.get((category, item))
+        if row is None:
+            return np.zeros(self.bitmaps.shape[1], dtype=np.uint8)
+        return self.bitmaps[row]
+
+    def count(self, category, item):
+        return bitmap_count(self.bitmap(category, item))
+
+    def overlap(self, first, second):
+        return bitmap_count(np.bitwise_and(self.bitmap(*first), self.bitmap(*second)))
+
+    def _union_bitmap(self, category, items):
+        union = np.zeros(self.bitmaps.shape[1], dtype=np.uint8)
+        for item in items:
+            np.bitwise_or(union, self.bitmap(category, item), out=union)
+        return union
+
+    def union(self, selected_categories_and_items):
+        """Filas que contienen al menos una de las entidades elegidas (las que entran en la exportación)."""
+        result = np.zeros(self.bitmaps.shape[1], dtype=np.uint8)
+        for category, items in selected_categories_and_items.items():
+            np.bitwise_or(result, self._union_bitmap(category, items), out=result)
+        return bitmap_count(result)
+
+    def segment(self, selected_categories_and_items):
+        """
+        Filas que cumplen la selección en todas las categorías elegidas: al menos una de
+        las entidades de cada categoría (OR dentro de la categoría, AND entre categorías).
+        """
+        result = None
+        for category, items in selected_categories_and_items.items():
+            if not items:
+                continue
+            union = self._union_bitmap(category, items)
+            result = union if result is None else np.bitwise_and(result, union, out=result)
+        return bitmap_count(result) if result is not None else 0
+
+@functools.lru_cache(maxsize=16)
+def load_entity_bitmaps(index_path, mtime_ns):
+    """Carga los bitmaps de un índice. `mtime_ns` (de entries.json) forma parte de la clave de la caché."""
+    return EntityBitmaps(index_path)
+
+def get_entity_bitmaps(filepath):
+    """Devuelve los bitmaps del índice de un archivo subido, o None si no tiene índice."""
+    if not is_cached_upload(filepath):
+        return None
+    index_path = get_entity_index_path(filepath)
+    try:
+        mtime_ns = os.stat(os.path.join(index_path, 'entries.json')).st_mtime_ns
+        return load_entity_bitmaps(index_path, mtime_ns)
+    except (OSError, ValueError, KeyError):
+        return None
+
+def finalize_multi_export_file(ids, email_table):
+    """
+    Limpieza final de un archivo de la exportación múltiple: descarta los emails sin '@' y
+    los duplicados, conservando el orden de primera aparición.
+
+    Los ids repetidos (la entidad aparece más de una vez en la celda) se descartan antes de
+    resolverlos; los emails iguales de filas distintas se detectan sobre los textos.
+    Retorna: (emails finales, {'raw', 'invalid', 'duplicates', 'final'})
+    """
+    unique_ids, first_index, repeats = np.unique(ids, return_index=True, return_counts=True)
+    order = np.argsort(first_index, kind='stable')
+    unique_ids, repeats = unique_ids[order], repeats[order]
+
+    emails = pd.Series(email_table.resolve(unique_ids), dtype=object)
+    is_valid = emails.str.contains('@', regex=False).to_numpy(dtype=bool)
+    emails, repeats = emails[is_valid], repeats[is_valid]
+    is_duplicate = emails.duplicated().to_numpy()
+    final = emails[~is_duplicate].tolist()
+
+    raw = len(ids)
+    invalid = raw - int(repeats.sum())
+    return final, {'raw': raw, 'invalid': invalid, 'duplicates': raw - invalid - len(final), 'final': len(final)}
+
+def write_multi_export_zip(files, email_table, output_zip_path):
+    """
+    Escribe el ZIP de la exportación múltiple directamente en `output_zip_path`.
+    Cada archivo (name, ids) pasa por `finalize_multi_export_file` y se genera dentro del
+    ZIP, sin armar ni el CSV ni el ZIP en memoria. Los archivos que quedan vacíos no se incluyen.
+    Retorna los contadores de la limpieza de cada archivo.
+    """
+    level = app.config['ZIP_COMPRESSION_LEVEL']
+    compression = zipfile.ZIP_STORED if level == 0 else zipfile.ZIP_DEFLATED
+    file_stats = []
+    with zipfile.ZipFile(output_zip_path, 'w', compression, compresslevel=level or None) as zf:
+        for name, ids in files:
+            if not len(ids):
+                continue
+            emails, counts = finalize_multi_export_file(ids, email_table)
+            file_stats.append({'name': f"{name}.csv", **counts})
+            if not emails:
+                continue
+            with zf.open(f"{name}.csv", 'w', force_zip64=True) as member:
+                # Mismo formato que DataFrame.to_csv: comillas mínimas y fin de línea del sistema
+                member.write(format_csv_header(['email']))
+                write_csv_column(member, emails)
+    return file_stats
+
+def multi_export_process_task(task_id, filepath, selected_categories_and_items, output_zip_path):
+    try:
+        # --- Cargar configuración ---
+        known_entities = load_known_entities()
 
         # Check for required columns
         required_cols = ['email']
-        if 'bancos' in selected_categories_and_items:
-            required_cols.append('EMIS_BANCOS')
-        if 'tarjetas' in selected_categories_and_items:
-            required_cols.append('EMIS_TARJETAS')
-        if 'cobrands' in selected_categories_and_items:
-            required_cols.append('PLUS_PARTNER_COBRAND')
-        if 'partners' in selected_categories_and_items:
-            required_cols.append('PLUS_PARTNER_EMPRESAS')
-
-        missing_cols = [col for col in required_cols if col not in df.columns]
+        for category, column, _, _ in MULTI_EXPORT_CATEGORIES:
+            if category in selected_categories_and_items:
+                required_cols.append(column)
+
+        # --- Verificar columnas ---
+        columns = read_upload_header(filepath)
+
+        missing_cols = [col for col in required_cols if col not in columns]
         if missing_cols:
-            tasks[task_id]['status'] = 'error'
-            tasks[task_id]['error'] = f"Faltan las siguientes columnas en el archivo CSV: {', '.join(missing_cols)}"
+            update_task(task_id, status='error', error=f"Faltan las siguientes columnas en el archivo CSV: {', '.join(missing_cols)}")
             return
 
-        # --- Procesar datos ---
-        data_for_csv = {}
-        total_rows = len(df)
-        processed_rows = 0
+        # --- Usar el índice invertido del escaneo inicial, si existe ---
+        loaded = None
+        if app.config['MULTI_EXPORT_INDEX']:
+            loaded = load_multi_export_from_index(filepath, selected_categories_and_items, known_entities)
 
-        for _, row in df.iterrows():
-            email = row['email']
-            if pd.isna(email):
-                continue
-            
-            # Clean the email field
-            email = clean_email(email)
-
-            # Procesar bancos
-            if 'bancos' in selected_categories_and_items and pd.notna(row.get('EMIS_BANCOS')):
-                banks = str(row['EMIS_BANCOS']).split(',')
-                for bank in banks:
-                    bank = bank.strip()
-                    if bank in known_banks and bank in selected_categories_and_items['bancos']:
-                        key = f"banco_{bank}"
-                        if key not in data_for_csv:
-                            data_for_csv[key] = []
-                        data_for_csv[key].append(email)
-            
-            # Procesar tarjetas
-            if 'tarjetas' in selected_categories_and_items and pd.notna(row.get('EMIS_TARJETAS')):
-                cards = str(row['EMIS_TARJETAS']).split(',')
-                for card in cards:
-                    card = card.strip()
-                    if card in known_cards and card in selected_categories_and_items['tarjetas']:
-                        key = f"tarjeta_{card}"
-                        if key not in data_for_csv:
-                            data_for_csv[key] = []
-                        data_for_csv[key].append(email)
-
-            # Procesar cobrands
-            if 'cobrands' in selected_categories_and_items and pd.notna(row.get('PLUS_PARTNER_COBRAND')):
-                cobrands = str(row['PLUS_PARTNER_COBRAND']).split(',')
-                for cobrand in cobrands:
-                    cobrand = cobrand.strip()
-                    if cobrand in known_cobrands and cobrand in selected_categories_and_items['cobrands']:
-                        key = f"cobrand_{cobrand}"
-                        if key not in data_for_csv:
-                            data_for_csv[key] = []
-                        data_for_csv[key].append(email)
-
-            # Procesar partners
-            if 'partners' in selected_categories_and_items and pd.notna(row.get('PLUS_PARTNER_EMPRESAS')):
-                partners = str(row['PLUS_PARTNER_EMPRESAS']).split(',')
-                for partner in partners:
-                    partner = partner.strip()
-                    if partner in known_partners and partner in selected_categories_and_items['partners']:
-                        key = f"partner_{partner}"
-                        if key not in data_for_csv:
-                            data_for_csv[key] = []
-                        data_for_csv[key].append(email)
-            
-            processed_rows += 1
-            tasks[task_id]['progress'] = round((processed_rows / total_rows) * 100)
-
-        # --- Crear ZIP en memoria ---
-        memory_file = io.BytesIO()
-        with zipfile.ZipFile(memory_file, 'w', zipfile.ZIP_DEFLATED) as zf:
-            for name, emails in data_for_csv.items():
-                if emails:
-                    output = io.StringIO()
-                    pd.DataFrame(emails, columns=['email']).to_csv(output, index=False)
-                    zf.writestr(f"{name}.csv", output.getvalue())
-        
-        memory_file.seek(0)
-        
-        # Save the zip file to disk
-        with open(output_zip_path, 'wb') as f:
-            f.write(memory_file.getvalue())
+        # --- Si no, procesar datos por chunks (del sidecar Parquet si ya está listo) ---
+        if loaded is not None:
+            email_table, files = loaded
+        else:
+            email_table = EmailTable()
+            data_for_csv = {}
+            first_seen = {}
+
+            for chunk, progress in read_upload_in_chunks(filepath, usecols=required_cols):
+                multi_export_fan_out_chunk(chunk, selected_categories_and_items, known_entities, data_for_csv, first_seen, email_table)
+                update_task(task_id, progress=progress)
 
-        tasks[task_id]['status'] = 'complete'
-        tasks[task_id]['result'] = f'/downloads/{os.path.basename(output_zip_path)}'
+            files = order_multi_export_data(data_for_csv, first_seen)
+
+        # --- Crear ZIP directamente en disco ---
+        try:
+            file_stats = write_multi_export_zip(files, email_table, output_zip_path)
+        except Exception:
+            if os.path.exists(output_zip_path):
+                os.remove(output_zip_path)
+            raise
+
+        stats = {key: sum(counts[key] for counts in file_stats) for key in ('raw', 'invalid', 'duplicates', 'final')}
+        stats['files'] = file_stats
+        update_task(task_id, status='complete', result=f'/downloads/{os.path.basename(output_zip_path)}', stats=stats)
 
     except FileNotFoundError as e:
-        tasks[task_id]['status'] = 'error'
-        tasks[task_id]['error'] = f"Faltan archivos de configuración o el archivo CSV original. Detalle: {e}"
+        update_task(task_id, status='error', error=f"Faltan archivos de configuración o el archivo CSV original. Detalle: {e}")
     except KeyError as e:
-        tasks[task_id]['status'] = 'error'
-        tasks[task_id]['error'] = f"Una columna esperada no se encontró en el archivo CSV. Detalle: {e}"
+        update_task(task_id, status='error', error=f"Una columna esperada no se encontró en el archivo CSV. Detalle: {e}")
     except Exception as e:
-        tasks[task_id]['status'] = 'error'
-        tasks[task_id]['error'] = f"Ocurrió un error inesperado durante la exportación múltiple: {e}"
-    finally:
-        # Clean up the temporary CSV file
-        if os.path.exists(filepath):
-            os.remove(filepath)
+        update_task(task_id, status='error', error=f"Ocurrió un error inesperado durante la exportación múltiple: {e}")
+    # Los archivos subidos quedan en la caché de uploads/ (se eliminan al superar UPLOAD_CACHE_MAX_MB);
+    # los que no están en la caché (ej: del modo batch) son del usuario y no se tocan
 
 @app.route('/api/multi-export-process', methods=['POST'])
 def multi_export_process_request():
@@ -514,18 +2743,65 @@ def multi_export_process_request():
     if not selected_categories_and_items:
         return jsonify({"error": "No se han seleccionado categorías o ítems para exportar."}), 400
 
-    task_id = str(uuid.uuid4())
     zip_filename = f"exportacion_multiple_{datetime.now().strftime('%Y%m%d_%H%M%S')}.zip"
     output_zip_path = os.path.join(app.config['DOWNLOAD_FOLDER'], zip_filename)
 
-    tasks[task_id] = {'status': 'processing', 'progress': 0}
-
-    thread = threading.Thread(target=multi_export_process_task, args=(task_id, filepath, selected_categories_and_items, output_zip_path))
-    thread.start()
+    task_id = start_task('multi_export', multi_export_process_task, filepath, selected_categories_and_items, output_zip_path)
 
     return jsonify({'task_id': task_id})
 
 
+@app.route('/api/multi-export-segment-counts', methods=['POST'])
+def multi_export_segment_counts():
+    """
+    Conteos de la selección a partir de los bitmaps del índice: filas con cada entidad,
+    cruces de a pares entre las entidades elegidas (ej: GALICIA ∩ VISA), filas que entrarían
+    en la exportación (`union`) y filas que cumplen todas las categorías elegidas (`segment`).
+    Sin selección, devuelve los conteos de todas las entidades.
+    """
+    data = request.get_json()
+    filepath = data.get('filepath')
+    selected_categories_and_items = data.get('selected_items') or {}
+
+    if not filepath or not os.path.exists(filepath):
+        return jsonify({"error": "No se pudo encontrar el archivo original. Por favor, intentá subir el archivo de nuevo."}), 400
+    bitmaps = get_entity_bitmaps(filepath)
+    if bitmaps is None:
+        return jsonify({"error": "El archivo no tiene un índice de entidades. Volvé a escanearlo con MULTI_EXPORT_INDEX activado."}), 404
+
+    known_entities = load_known_entities()
+    has_selection = any(selected_categories_and_items.values())
+    if has_selection:
+        selected = {
+            category: [item for item in items if item in known_entities.get(category, ())]
+            for category, items in selected_categories_and_items.items()
+        }
+    else:
+        selected = {category: [] for category, _, _, _ in MULTI_EXPORT_CATEGORIES}
+        for category, item in bitmaps.rows:
+            selected.setdefault(category, []).append(item)
+        selected = {category: sorted(items) for category, items in selected.items()}
+
+    pairs = [(category, item) for category, items in selected.items() for item in items]
+    counts = {
+        category: {item: {'rows': bitmaps.count(category, item), 'occurrences': bitmaps.occurrences.get((category, item), 0)} for item in items}
+        for category, items in selected.items()
+    }
+
+    overlaps = []
+    if has_selection:
+        for i, first in enumerate(pairs):
+            for second in pairs[i + 1:]:
+                overlaps.append({'a': list(first), 'b': list(second), 'rows': bitmaps.overlap(first, second)})
+
+    return jsonify({
+        'total_rows': bitmaps.total_rows,
+        'counts': counts,
+        'overlaps': overlaps,
+        'union': bitmaps.union(selected) if has_selection else None,
+        'segment': bitmaps.segment(selected) if has_selection else None,
+    })
+
 # --- Funciones Auxiliares CRM ---
 
 def detect_email_columns(columns):
@@ -540,29 +2816,206 @@ def detect_email_columns(columns):
                 break
     return suggested
 
-def split_emails_by_separators(value):
+# Separadores de emails dentro de una celda: guión con espacios ( - ) y ; , / | o espacios
+EMAIL_DASH_SEPARATOR = re.compile(r'\s+-\s+')
+EMAIL_SEPARATORS = re.compile(r'[;,/|\s]+')
+
+# Para separar una columna completa de una sola vez, sus celdas se unen en un único texto
+# donde los espacios se marcan con \x02, el resto de los separadores con \x01 y el fin de
+# cada celda con \x03. Todos los espacios Unicode (los de `\s`) están en el plano básico.
+WHITESPACE_MARKS = str.maketrans({c: '\x02' for c in map(chr, range(0x10000)) if c.isspace()})
+SEPARATOR_MARKS = str.maketrans({c: '\x01' for c in ';,/|\x02'})
+# Equivale a EMAIL_DASH_SEPARATOR sobre el texto marcado; el prefijo literal acelera la búsqueda
+MARKED_DASH_SEPARATOR = re.compile('\x02\x02*-\x02+')
+
+def split_email_column(series):
     """
-    Separa emails que están juntos en una celda.
+    Separa los emails que están juntos en las celdas de una columna (o chunk de columna).
     Separadores: ; , / | espacio, y guión con espacios ( - )
+    Retorna: (array con un email por elemento en orden de aparición, array con el número de celda de cada uno)
     """
-    if not isinstance(value, str) or not value.strip():
-        return []
-    
-    import re
-    # Primero reemplazamos el guión con espacios por un delimitador único
-    value = re.sub(r'\s+-\s+', '|||SEPARATOR|||', value)
-    
-    # Ahora separamos por los otros delimitadores
-    # Usamos regex para dividir por ; , / | o espacios múltiples
-    parts = re.split(r'[;,/|\s]+', value.replace('|||SEPARATOR|||', ';'))
-    
-    # Limpiamos y filtramos partes vacías
-    emails = [part.strip() for part in parts if part.strip()]
-    return emails
+    values = series.dropna().astype(str).tolist()
+    text = '\x03'.join(values) + '\x03'
+
+    if '\x01' in text or '\x02' in text or text.count('\x03') != len(values):
+        # Los datos contienen los caracteres de marca: se separa celda por celda con regex
+        cells = pd.Series(values, dtype=object)
+        parts = cells.str.replace(EMAIL_DASH_SEPARATOR, ';', regex=True).str.split(EMAIL_SEPARATORS).explode()
+        parts = parts[parts.notna() & (parts != '')]
+        return parts.to_numpy(dtype=object), parts.index.to_numpy()
+
+    text = MARKED_DASH_SEPARATOR.sub('\x01', text.translate(WHITESPACE_MARKS))
+    pieces = np.array(text.translate(SEPARATOR_MARKS).replace('\x03', '\x01\x03\x01').split('\x01'), dtype=object)
+    cell_ends = pieces == '\x03'
+    keep = ~cell_ends & (pieces != '')
+    return pieces[keep], np.cumsum(cell_ends)[keep]
+
+def extract_emails_from_column(series, stats):
+    """
+    Extrae los emails de una columna de forma vectorizada y actualiza los contadores
+    de `stats` (total_raw, invalid, separated).
+    Retorna: (emails válidos en minúscula, registros inválidos tal como aparecen)
+    """
+    parts, cells = split_email_column(series)
+    if not len(parts):
+        return [], []
+
+    is_valid = np.fromiter(('@' in part for part in parts), dtype=bool, count=len(parts))
+    valid_count = int(np.count_nonzero(is_valid))
+    cells_with_emails = int(np.count_nonzero(np.diff(cells))) + 1
+
+    stats['total_raw'] += len(parts)
+    stats['separated'] += len(parts) - cells_with_emails
+    stats['invalid'] += len(parts) - valid_count
+
+    return [part.lower() for part in parts[is_valid]], parts[~is_valid].tolist()
+
+def dedup_key(value):
+    """Clave de 128 bits de un texto para `OrderedDeduplicator` (el hash() de Python tiene solo 64)."""
+    return hashlib.blake2b(value.encode('utf-8', 'surrogatepass'), digest_size=16).digest()
+
+class OrderedDeduplicator:
+    """
+    Elimina duplicados de una secuencia de textos preservando el orden de primera aparición
+    y escribe cada valor único en un CSV de una columna a medida que aparece.
+
+    En memoria solo se guarda una clave de 128 bits de cada valor visto (BLAKE2b, ver
+    `dedup_key`). Al superar `memory_limit_bytes` ese conjunto se congela y los valores nuevos
+    se reparten por hash en archivos temporales (`partitions`), que se deduplican uno por uno
+    comparando los valores completos al cerrar y se agregan a la salida en su orden original.
+
+    Dos valores distintos con la misma clave se tomarían como duplicados: con 128 bits, la
+    probabilidad es del orden de n² / 2¹²⁹ (menos de 1e-20 para mil millones de valores).
+    """
+
+    SPILL_BATCH_SIZE = 10000
+    # Memoria de cada clave (el objeto bytes; la tabla del set ya la cuenta sys.getsizeof)
+    KEY_BYTES = sys.getsizeof(bytes(16))
+
+    def __init__(self, output_path, header, memory_limit_bytes, partitions, create_empty=True):
+        self.output_path = output_path
+        self.header = header
+        self.memory_limit_bytes = memory_limit_bytes
+        self.partitions = partitions
+        self.total = 0
+        self.unique = 0
+        self._seen = set()
+        self._handle = None
+        self._spill_dir = None
+        self._spill_buffers = None
+        self._spill_files = None
+        self._spilled = 0
+        if create_empty:
+            self._open_output()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def _open_output(self):
+        self._handle = open_output_file(self.output_path)
+        self._handle.write(format_csv_header([self.header]))
+
+    def _write(self, values):
+        if not values:
+            return
+        if self._handle is None:
+            self._open_output()
+        write_csv_column(self._handle, values)
+        self.unique += len(values)
+
+    def add(self, values):
+        """Agrega una lista de valores; los que aparecen por primera vez se escriben enseguida."""
+        self.total += len(values)
+        batch = list(dict.fromkeys(values))
+        keys = list(map(dedup_key, batch))
+        seen = self._seen
+        new_values = [value for value, key in zip(batch, keys) if key not in seen]
+
+        if self._spill_dir is not None:
+            self._spill(new_values)
+            return
 
-def is_potential_email(value):
-    """Verifica si un valor podría ser un email (contiene @)."""
-    return isinstance(value, str) and '@' in value
+        seen.update(keys)
+        self._write(new_values)
+        if sys.getsizeof(seen) + len(seen) * self.KEY_BYTES > self.memory_limit_bytes:
+            self._start_spilling()
+
+    def _start_spilling(self):
+        self._spill_dir = tempfile.mkdtemp(prefix='dedup_')
+        self._spill_buffers = [[] for _ in range(self.partitions)]
+        self._spill_files = [
+            open(os.path.join(self._spill_dir, f'part_{i}.pkl'), 'wb') for i in range(self.partitions)
+        ]
+
+    def _spill(self, values):
+        for value in values:
+            partition = hash(value) % self.partitions
+            buffer = self._spill_buffers[partition]
+            buffer.append((self._spilled, value))
+            self._spilled += 1
+            if len(buffer) >= self.SPILL_BATCH_SIZE:
+                pickle.dump(buffer, self._spill_files[partition], pickle.HIGHEST_PROTOCOL)
+                buffer.clear()
+
+    @staticmethod
+    def _read_batches(path):
+        with open(path, 'rb') as handle:
+            while True:
+                try:
+                    yield from pickle.load(handle)
+                except EOFError:
+                    return
+
+    def _merge_spilled(self):
+        """Deduplica cada partición en memoria y mezcla los resultados por orden de aparición."""
+        runs = []
+        for partition, handle in enumerate(self._spill_files):
+            buffer = self._spill_buffers[partition]
+            if buffer:
+                pickle.dump(buffer, handle, pickle.HIGHEST_PROTOCOL)
+            handle.close()
+
+            first_seen = {}
+            for position, value in self._read_batches(handle.name):
+                first_seen.setdefault(value, position)
+
+            run_path = os.path.join(self._spill_dir, f'run_{partition}.pkl')
+            with open(run_path, 'wb') as run:
+                items = [(position, value) for value, position in first_seen.items()]
+                for start in range(0, len(items), self.SPILL_BATCH_SIZE):
+                    pickle.dump(items[start:start + self.SPILL_BATCH_SIZE], run, pickle.HIGHEST_PROTOCOL)
+            os.remove(handle.name)
+            runs.append(run_path)
+
+        pending = []
+        for _, value in heapq.merge(*(self._read_batches(path) for path in runs)):
+            pending.append(value)
+            if len(pending) >= self.SPILL_BATCH_SIZE:
+                self._write(pending)
+                pending = []
+        self._write(pending)
+
+    def finish(self):
+        """Termina de escribir la salida. Retorna la cantidad de valores únicos."""
+        if self._spill_dir is not None:
+            self._merge_spilled()
+        self.close()
+        return self.unique
+
+    def close(self):
+        """Cierra la salida y elimina los archivos temporales (también si la tarea falla)."""
+        if self._handle is not None:
+            self._handle.close()
+            self._handle = None
+        if self._spill_dir is not None:
+            for handle in self._spill_files:
+                handle.close()
+            shutil.rmtree(self._spill_dir, ignore_errors=True)
+            self._spill_dir = None
+        self._seen = set()
 
 def crm_process_emails_from_df(df, selected_columns):
     """
@@ -579,23 +3032,8 @@ def crm_process_emails_from_df(df, selected_columns):
     
     for col in selected_columns:
         if col in df.columns:
-            for value in df[col]:
-                if pd.isna(value):
-                    continue
-                    
-                emails_in_cell = split_emails_by_separators(str(value))
-                
-                if len(emails_in_cell) > 1:
-                    stats['separated'] += len(emails_in_cell) - 1
-                
-                for email in emails_in_cell:
-                    stats['total_raw'] += 1
-                    email = email.strip().lower()
-                    
-                    if is_potential_email(email):
-                        all_emails.append(email)
-                    else:
-                        stats['invalid'] += 1
+            valid_emails, _ = extract_emails_from_column(df[col], stats)
+            all_emails.extend(valid_emails)
     
     # Eliminar duplicados
     unique_emails = list(dict.fromkeys(all_emails))
@@ -618,28 +3056,29 @@ def crm_get_columns():
     if file.filename == '':
         return jsonify({"error": "No has seleccionado ningún archivo."}), 400
 
-    if not file.filename.endswith('.csv'):
-        return jsonify({"error": "El formato del archivo no es válido. Solo se aceptan archivos .csv."}), 400
+    if not is_csv_filename(file.filename):
+        return jsonify({"error": "El formato del archivo no es válido. Solo se aceptan archivos .csv (o comprimidos: .csv.gz, .csv.zst)."}), 400
 
-    filepath = os.path.join(app.config['UPLOAD_FOLDER'], file.filename)
+    filepath = None
+    session = None
     try:
-        file.save(filepath)
+        filepath, session = receive_upload(file)
         
-        encoding = get_csv_encoding(filepath)
-        df_header = pd.read_csv(filepath, nrows=0, encoding=encoding, sep=app.config['CSV_SEPARATOR'])
-        columns = df_header.columns.tolist()
+        columns = read_upload_header(filepath or session.data_path)
+        if filepath:
+            schedule_columnar_sidecar(filepath)
         
         suggested_columns = detect_email_columns(columns)
         
         return jsonify({
             "columns": columns,
             "suggested_columns": suggested_columns,
-            "filepath": filepath
+            "filepath": filepath,
+            **upload_session_fields(session)
         })
 
     except Exception as e:
-        if os.path.exists(filepath):
-            os.remove(filepath)
+        discard_received_upload(filepath, session)
         return jsonify({"error": f"Ocurrió un error al procesar el archivo: {str(e)}"}), 500
 
 
@@ -656,10 +3095,16 @@ def crm_preview():
     if not selected_columns:
         return jsonify({"error": "Debés seleccionar al menos una columna de email."}), 400
 
+    sample, error_message = get_preview_sample_options(data, default_rows=100)
+    if error_message:
+        return jsonify({"error": error_message}), 400
+
     try:
-        encoding = get_csv_encoding(filepath)
-        # Leer solo las primeras 100 filas para preview
-        df_preview = pd.read_csv(filepath, nrows=100, encoding=encoding, sep=app.config['CSV_SEPARATOR'])
+        columns = read_upload_header(filepath)
+        # Leer solo una muestra (por defecto las primeras 100 filas) de las columnas seleccionadas
+        email_columns = [col for col in columns if col in selected_columns]
+        df_preview = read_upload_sample(filepath, sample['nrows'], usecols=email_columns or None,
+                                        mode=sample['mode'], seed=sample['seed'])
         
         unique_emails, stats = crm_process_emails_from_df(df_preview, selected_columns)
         
@@ -688,36 +3133,88 @@ def crm_process_request():
     if not selected_columns:
         return jsonify({"error": "Debés seleccionar al menos una columna de email."}), 400
 
-    task_id = str(uuid.uuid4())
-    original_filename = os.path.basename(filepath)
-    new_filename = f"{os.path.splitext(original_filename)[0]}_emails_limpios.csv"
+    new_filename = get_output_filename(filepath, '_emails_limpios')
     output_path = os.path.join(app.config['DOWNLOAD_FOLDER'], new_filename)
 
-    tasks[task_id] = {'status': 'processing', 'progress': 0}
-
-    thread = threading.Thread(target=crm_process_task, args=(task_id, filepath, selected_columns, output_path))
-    thread.start()
+    task_id = start_task('crm', crm_process_task, filepath, selected_columns, output_path)
 
     return jsonify({'task_id': task_id})
 
 
+def crm_extract_byte_range(filepath, start, end, columns, usecols, selected_columns, encoding, separator, chunk_size):
+    """
+    Extrae los emails de un rango de bytes del CSV (en un proceso del pool).
+    Lee el rango de a partes (`FileRangeReader`), en chunks de `chunk_size` filas igual que la
+    lectura secuencial, así la memoria no crece con el tamaño del rango, y devuelve
+    los emails válidos y los registros inválidos sin duplicados (en orden de primera aparición
+    dentro del rango), los contadores de `stats`, la cantidad de emails válidos y de filas.
+    """
+    stats = {'total_raw': 0, 'invalid': 0, 'separated': 0}
+    valid, invalid = {}, {}
+    rows = 0
+    with open(filepath, 'rb') as f, io.BufferedReader(FileRangeReader(f, start, end)) as handle:
+        chunks = pd.read_csv(handle, header=None, names=columns, usecols=usecols, encoding=encoding,
+                             sep=separator, dtype=CSV_STRING_DTYPE, chunksize=chunk_size)
+        for chunk in chunks:
+            for col in selected_columns:
+                if col in chunk.columns:
+                    valid_emails, invalid_values = extract_emails_from_column(chunk[col], stats)
+                    valid.update(dict.fromkeys(valid_emails))
+                    invalid.update(dict.fromkeys(invalid_values))
+            rows += len(chunk)
+    valid_count = stats['total_raw'] - stats['invalid']
+    return list(valid), list(invalid), stats, valid_count, rows
+
+def crm_process_byte_ranges(task_id, filepath, ranges, email_columns, selected_columns, unique_emails, unique_invalid, stats, total_rows):
+    """
+    Modo paralelo del CRM: cada rango de bytes se procesa en un proceso del pool y los resultados
+    se agregan a los deduplicadores en el orden de los rangos en el archivo. Como cada rango ya viene
+    sin duplicados y en orden de primera aparición, el resultado es el mismo que en modo secuencial.
+    Devuelve la cantidad de filas leídas.
+    """
+    encoding, separator = get_csv_dialect(filepath)
+    columns = read_upload_header(filepath)
+    workers = app.config['CRM_WORKERS']
+    total_bytes = (ranges[-1][1] - ranges[0][0]) or 1
+    rows_processed = 0
+    done_bytes = 0
+    pending = deque()
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        remaining = iter(ranges)
+
+        def submit_next():
+            item = next(remaining, None)
+            if item is not None:
+                start, end, _ = item
+                future = executor.submit(crm_extract_byte_range, filepath, start, end, columns, email_columns,
+                                         selected_columns, encoding, separator, app.config['CHUNK_SIZE'])
+                pending.append((future, end - start))
+
+        # Como mucho `workers * 2` rangos en vuelo, para no acumular resultados en memoria
+        for _ in range(workers * 2):
+            submit_next()
+        while pending:
+            future, size = pending.popleft()
+            valid, invalid, range_stats, valid_count, rows = future.result()
+            submit_next()
+            for key in ('total_raw', 'invalid', 'separated'):
+                stats[key] += range_stats[key]
+            unique_emails.add(valid)
+            unique_emails.total += valid_count - len(valid)
+            unique_invalid.add(invalid)
+            rows_processed += rows
+            done_bytes += size
+            update_task(task_id, progress=round(min(done_bytes / total_bytes, 1) * 100),
+                        processed_rows=rows_processed, total_rows=total_rows)
+    return rows_processed
+
 def crm_process_task(task_id, filepath, selected_columns, output_path):
     """Tarea en segundo plano para procesar emails del CRM."""
     try:
-        # Detectar encoding primero
-        encoding = get_csv_encoding(filepath)
-        
-        # Contar total de filas para progreso (con manejo de errores de encoding)
-        try:
-            total_rows = sum(1 for _ in open(filepath, 'r', encoding='latin-1', errors='replace')) - 1
-        except:
-            total_rows = 1000  # Valor por defecto si falla el conteo
+        # Leer solo las columnas seleccionadas
+        columns = read_upload_header(filepath)
+        email_columns = [col for col in columns if col in selected_columns] or None
         
-        if total_rows <= 0:
-            total_rows = 1
-        
-        all_emails = []
-        invalid_entries = []  # Lista para guardar registros inválidos
         stats = {
             'total_raw': 0,
             'invalid': 0,
@@ -725,76 +3222,59 @@ def crm_process_task(task_id, filepath, selected_columns, output_path):
             'duplicates': 0
         }
         
-        chunk_size = app.config['CHUNK_SIZE']
         rows_processed = 0
         
-        # Intentar leer primero con encoding detectado, si falla usar latin-1
-        def read_chunks():
-            try:
-                for chunk in pd.read_csv(filepath, chunksize=chunk_size, encoding=encoding, sep=app.config['CSV_SEPARATOR']):
-                    yield chunk
-            except UnicodeDecodeError:
-                for chunk in pd.read_csv(filepath, chunksize=chunk_size, encoding='latin-1', sep=app.config['CSV_SEPARATOR']):
-                    yield chunk
+        # Los emails únicos se escriben a medida que aparecen; el CSV de inválidos solo se crea si hay alguno
+        invalid_filename = get_output_filename(filepath, '_invalidos')
+        invalid_path = os.path.join(app.config['DOWNLOAD_FOLDER'], invalid_filename)
+        memory_limit = app.config['DEDUP_MEMORY_LIMIT_MB'] * 1024 * 1024 // 2
+        partitions = app.config['DEDUP_SPILL_PARTITIONS']
         
-        for chunk in read_chunks():
-            for col in selected_columns:
-                if col in chunk.columns:
-                    for value in chunk[col]:
-                        if pd.isna(value):
-                            continue
-                            
-                        emails_in_cell = split_emails_by_separators(str(value))
-                        
-                        if len(emails_in_cell) > 1:
-                            stats['separated'] += len(emails_in_cell) - 1
-                        
-                        for email in emails_in_cell:
-                            stats['total_raw'] += 1
-                            email_clean = email.strip().lower()
-                            
-                            if is_potential_email(email_clean):
-                                all_emails.append(email_clean)
-                            else:
-                                stats['invalid'] += 1
-                                if email.strip():  # Solo guardar si no está vacío
-                                    invalid_entries.append(email.strip())
+        with OrderedDeduplicator(output_path, 'email', memory_limit, partitions) as unique_emails, \
+                OrderedDeduplicator(invalid_path, 'registro_invalido', memory_limit, partitions,
+                                    create_empty=False) as unique_invalid:
+            ranges = None
+            if app.config['CRM_WORKERS']:
+                ranges = split_csv_byte_ranges(filepath, app.config['CRM_WORKERS'] * 4, align_rows=app.config['CHUNK_SIZE'])
+            # Modo paralelo solo con la cantidad de filas confirmada por una lectura anterior (ver split_csv_byte_ranges).
+            # Cantidad de filas si ya se conoce; si no, el progreso es por bytes
+            total_rows = count_csv_rows(filepath)
+            if ranges:
+                rows_processed = crm_process_byte_ranges(task_id, filepath, ranges, email_columns, selected_columns,
+                                                         unique_emails, unique_invalid, stats, total_rows)
+            else:
+                for chunk, progress in read_upload_in_chunks(filepath, usecols=email_columns):
+                    for col in selected_columns:
+                        if col in chunk.columns:
+                            valid_emails, invalid_values = extract_emails_from_column(chunk[col], stats)
+                            unique_emails.add(valid_emails)
+                            unique_invalid.add(invalid_values)
+
+                    rows_processed += len(chunk)
+                    update_task(task_id, progress=progress, processed_rows=rows_processed, total_rows=total_rows)
             
-            rows_processed += len(chunk)
-            progress = (rows_processed / total_rows) * 100
-            tasks[task_id]['progress'] = round(min(progress, 100))
-        
-        # Eliminar duplicados preservando orden
-        unique_emails = list(dict.fromkeys(all_emails))
-        unique_invalid = list(dict.fromkeys(invalid_entries))
-        stats['duplicates'] = len(all_emails) - len(unique_emails)
-        stats['total_unique'] = len(unique_emails)
-        
-        # Guardar CSV de emails válidos
-        df_output = pd.DataFrame(unique_emails, columns=['email'])
-        df_output.to_csv(output_path, index=False)
+            unique_emails.finish()
+            unique_invalid.finish()
         
-        # Guardar CSV de registros inválidos (si hay)
-        invalid_result = None
-        if unique_invalid:
-            invalid_filename = f"{os.path.splitext(os.path.basename(filepath))[0]}_invalidos.csv"
-            invalid_path = os.path.join(app.config['DOWNLOAD_FOLDER'], invalid_filename)
-            df_invalid = pd.DataFrame(unique_invalid, columns=['registro_invalido'])
-            df_invalid.to_csv(invalid_path, index=False)
-            invalid_result = f'/downloads/{invalid_filename}'
+        stats['duplicates'] = unique_emails.total - unique_emails.unique
+        stats['total_unique'] = unique_emails.unique
+        invalid_result = f'/downloads/{invalid_filename}' if unique_invalid.unique else None
+        update_upload_metadata(filepath, row_count=rows_processed)
         
-        tasks[task_id]['status'] = 'complete'
-        tasks[task_id]['result'] = f'/downloads/{os.path.basename(output_path)}'
-        tasks[task_id]['invalid_result'] = invalid_result
-        tasks[task_id]['stats'] = stats
-        tasks[task_id]['processed_rows'] = len(unique_emails)
+        update_task(
+            task_id,
+            status='complete',
+            result=f'/downloads/{os.path.basename(output_path)}',
+            invalid_result=invalid_result,
+            stats=stats,
+            processed_rows=unique_emails.unique,
+            total_rows=rows_processed,
+        )
 
     except FileNotFoundError:
-        tasks[task_id]['status'] = 'error'
-        tasks[task_id]['error'] = "El archivo original fue eliminado o movido durante el procesamiento."
+        update_task(task_id, status='error', error="El archivo original fue eliminado o movido durante el procesamiento.")
     except Exception as e:
-        tasks[task_id]['status'] = 'error'
-        tasks[task_id]['error'] = f"Ocurrió un error inesperado: {str(e)}"
+        update_task(task_id, status='error', error=f"Ocurrió un error inesperado: {str(e)}")
 
 
 # --- Bloque Principal ---
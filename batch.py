@@ -0,0 +1,288 @@
+'''
+Modo batch: ejecuta "Limpiar Base", "Procesar CRM" y la exportación múltiple sobre archivos
+locales, sin el servidor web, con las mismas funciones de `app.py` que usan las rutas. También
+actualiza los catálogos de entidades conocidas con las entidades de los archivos.
+
+Cada archivo se lee en su lugar, sin copiarlo ni modificarlo. Con `--cache` pasa primero por la
+caché de uploads (se enlaza o se copia), así una segunda corrida sobre el mismo contenido reutiliza
+el formato detectado, la cantidad de filas y el índice invertido de la exportación múltiple. Los
+archivos se procesan en paralelo con `--procesos` y se imprime el tiempo de cada etapa.
+
+Para ejecutarlo (desde la raíz del proyecto):
+    python -m batch limpiar "exportaciones/*.csv.gz" --salida resultados
+    python -m batch crm "crm/**/*.csv" --columnas EMAIL,EMAIL_ALTERNATIVO --procesos 4
+    python -m batch exportar base.csv --categorias bancos,tarjetas --compresion-zip 0 --cache
+    python -m batch catalogos "examples/*.csv"
+'''
+
+import argparse
+import glob
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from contextlib import contextmanager
+
+import app
+
+# Las rutas de la aplicación (config/, uploads/, jobs.db) son relativas a la raíz del proyecto;
+# las de los archivos a procesar, a la carpeta desde donde se ejecuta el comando
+ROOT_DIR = os.path.dirname(os.path.abspath(__file__))
+
+class BatchError(Exception):
+    """Error de un archivo del batch (se informa y se sigue con los demás)."""
+
+@contextmanager
+def app_config(**values):
+    """Cambia la configuración de `app.py` mientras dura el bloque y después la restaura."""
+    previous = {key: app.app.config[key] for key in values}
+    app.app.config.update(values)
+    try:
+        yield
+    finally:
+        app.app.config.update(previous)
+
+@contextmanager
+def working_directory(path):
+    """Ejecuta el bloque con `path` como carpeta actual y después vuelve a la anterior."""
+    previous = os.getcwd()
+    os.chdir(path)
+    try:
+        yield
+    finally:
+        os.chdir(previous)
+
+@contextmanager
+def stage(timings, name):
+    """Mide una etapa del procesamiento de un archivo."""
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        timings.append((name, time.perf_counter() - start))
+
+def run_task(job_type, target, *args):
+    """Ejecuta una tarea de `app.py` en este proceso y devuelve su estado final."""
+    task_id = app.job_store.create(job_type)
+    target(task_id, *args)
+    task = app.job_store.get(task_id)
+    if task['status'] != 'complete':
+        raise BatchError(task.get('error') or 'La tarea no terminó.')
+    return task
+
+def clean_file(filepath, options, timings):
+    """Limpiar Base: por defecto con todas las columnas, como si se seleccionaran todas."""
+    with stage(timings, 'columnas'):
+        columns, error_message, needs_docnum_generation, _ = app.validate_and_get_columns(filepath)
+        if error_message:
+            # Solo se descarta la copia de la caché, nunca el archivo del usuario
+            if app.is_cached_upload(filepath):
+                app.discard_upload(filepath)
+            raise BatchError(error_message)
+    selected_columns = columns
+    if options.columnas:
+        missing = [column for column in options.columnas if column not in columns]
+        if missing:
+            raise BatchError(f"Columnas que no están en el archivo: {', '.join(missing)}")
+        # email y docnum son obligatorias, igual que en la interfaz
+        mandatory = [column for column in columns if column.lower() in ('email', 'docnum')]
+        selected_columns = mandatory + [column for column in options.columnas if column not in mandatory]
+
+    output_path = os.path.join(app.app.config['DOWNLOAD_FOLDER'], app.get_output_filename(filepath, '_limpio'))
+    with stage(timings, 'limpieza'):
+        task = run_task('clean', app.process_csv_task, filepath, selected_columns, needs_docnum_generation, output_path)
+    return [output_path], f"{task['processed_rows']:,} filas"
+
+def crm_file(filepath, options, timings):
+    """Procesar CRM: por defecto con las columnas de email sugeridas."""
+    with stage(timings, 'columnas'):
+        columns = app.read_upload_header(filepath)
+    selected_columns = options.columnas or app.detect_email_columns(columns)
+    if not selected_columns:
+        raise BatchError("No se encontraron columnas de email; indicalas con --columnas.")
+    missing = [column for column in selected_columns if column not in columns]
+    if missing:
+        raise BatchError(f"Columnas que no están en el archivo: {', '.join(missing)}")
+
+    output_path = os.path.join(app.app.config['DOWNLOAD_FOLDER'], app.get_output_filename(filepath, '_emails_limpios'))
+    with stage(timings, 'emails'):
+        task = run_task('crm', app.crm_process_task, filepath, selected_columns, output_path)
+    outputs = [output_path]
+    if task['invalid_result']:
+        outputs.append(os.path.join(app.app.config['DOWNLOAD_FOLDER'], os.path.basename(task['invalid_result'])))
+    stats = task['stats']
+    return outputs, (f"{task['total_rows']:,} filas, {stats['total_unique']:,} emails únicos, "
+                     f"{stats['duplicates']:,} duplicados, {stats['invalid']:,} inválidos")
+
+def scan_entities(filepath, timings):
+    """Entidades únicas de cada categoría (escaneo inicial de la exportación múltiple)."""
+    with stage(timings, 'escaneo'):
+        # Si el mismo contenido ya fue escaneado, las entidades y el índice están en la caché
+        unique_data = app.get_upload_metadata(filepath).get('unique_entities')
+        if unique_data is None:
+            unique_data = run_task('multi_export_scan', app.multi_export_initial_process_task, filepath)['result']['unique_data']
+    return unique_data
+
+def export_file(filepath, options, timings):
+    """Exportación múltiple: por defecto, todas las entidades encontradas en el escaneo inicial."""
+    unique_data = scan_entities(filepath, timings)
+    selected = {category: items for category, items in unique_data.items()
+                if items and (not options.categorias or category in options.categorias)}
+    if not selected:
+        raise BatchError("El archivo no tiene entidades de las categorías elegidas.")
+
+    output_path = os.path.join(app.app.config['DOWNLOAD_FOLDER'], f"{app.get_csv_basename(filepath)}_exportacion_multiple.zip")
+    with stage(timings, 'exportación'):
+        task = run_task('multi_export', app.multi_export_process_task, filepath, selected, output_path)
+    stats = task['stats']
+    return [output_path], f"{stats['final']:,} emails en {len(stats['files'])} archivos"
+
+def catalog_file(filepath, options, timings):
+    """Agrega a los catálogos de entidades conocidas (config/*.txt) las entidades nuevas del archivo."""
+    unique_data = scan_entities(filepath, timings)
+    with stage(timings, 'catálogos'):
+        added = app.entity_catalog.merge(unique_data)
+    outputs = [config_path for category, _, _, config_path in app.MULTI_EXPORT_CATEGORIES if category in added]
+    if not added:
+        return outputs, "sin entidades nuevas"
+    return outputs, ', '.join(f"{category}: {', '.join(items)}" for category, items in added.items())
+
+PIPELINES = {
+    'limpiar': clean_file,
+    'crm': crm_file,
+    'exportar': export_file,
+    'catalogos': catalog_file,
+}
+
+def process_file(path, output_dir, options):
+    """
+    Procesa un archivo (en el proceso actual o en uno del pool), dejando lo generado en `output_dir`.
+    Devuelve: {'input', 'outputs', 'summary', 'error', 'timings': [(etapa, segundos)]}
+    """
+    config = {
+        'DOWNLOAD_FOLDER': output_dir,
+        'OUTPUT_COMPRESSION': options.compresion,
+        # Los sidecars Parquet se arman en segundo plano para la interfaz; acá cada archivo se lee una vez
+        'COLUMNAR_SIDECAR': False,
+        # Los catálogos solo se actualizan con `catalogos`, que informa las entidades que agregó
+        'ENTITY_CATALOG_AUTO_UPDATE': False,
+    }
+    if options.compresion_zip is not None:
+        config['ZIP_COMPRESSION_LEVEL'] = options.compresion_zip
+
+    result = {'input': path, 'outputs': [], 'summary': '', 'error': None, 'timings': []}
+    try:
+        os.makedirs(output_dir, exist_ok=True)
+        with app_config(**config):
+            filepath = path
+            if options.cache:
+                with stage(result['timings'], 'carga'):
+                    filepath = app.cache_local_file(path)
+            result['outputs'], result['summary'] = PIPELINES[options.comando](filepath, options, result['timings'])
+    except BatchError as e:
+        result['error'] = str(e)
+    except Exception as e:
+        result['error'] = f"Error inesperado: {e}"
+    return result
+
+def expand_inputs(patterns):
+    """Rutas absolutas de los archivos CSV que coinciden con los patrones (admite `**`), sin repetir."""
+    paths = []
+    for pattern in patterns:
+        matches = sorted(glob.glob(pattern, recursive=True)) or [pattern]
+        paths.extend(os.path.abspath(path) for path in matches if os.path.isfile(path) and app.is_csv_filename(path))
+    return list(dict.fromkeys(paths))
+
+def get_output_dirs(paths, salida):
+    """
+    Carpeta de salida de cada archivo: dentro de `salida`, la misma subcarpeta que tiene respecto
+    de la carpeta común de todos los archivos (ej: crm/x/base.csv y crm/y/base.csv -> salida/x y salida/y).
+    """
+    common = os.path.commonpath([os.path.dirname(path) for path in paths])
+    return {path: os.path.normpath(os.path.join(salida, os.path.relpath(os.path.dirname(path), common))) for path in paths}
+
+def find_output_conflicts(paths, output_dirs):
+    """
+    Grupos de archivos que generarían los mismos archivos de salida: los nombres salen del
+    nombre del archivo sin sus extensiones (ej: base.csv y base.csv.gz en la misma carpeta).
+    """
+    outputs = {}
+    for path in paths:
+        outputs.setdefault((output_dirs[path], app.get_csv_basename(path)), []).append(path)
+    return [group for group in outputs.values() if len(group) > 1]
+
+def format_result(result):
+    timings = ' | '.join(f"{name} {seconds:.2f}s" for name, seconds in result['timings'])
+    total = sum(seconds for _, seconds in result['timings'])
+    line = f"{os.path.basename(result['input'])}: {timings} | total {total:.2f}s"
+    if result['error']:
+        return f"{line}\n    ERROR: {result['error']}"
+    if not result['outputs']:
+        return f"{line}\n    {result['summary']}"
+    return f"{line}\n    {result['summary']} -> {', '.join(result['outputs'])}"
+
+def parse_args(argv):
+    parser = argparse.ArgumentParser(prog='python -m batch', description=__doc__,
+                                     formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('comando', choices=PIPELINES, help="limpiar (Limpiar Base), crm (Procesar CRM), exportar (exportación múltiple) "
+                                                         "o catalogos (actualizar config/*.txt con las entidades de los archivos)")
+    parser.add_argument('archivos', nargs='+', help="archivos o patrones (ej: 'bases/*.csv.gz', 'crm/**/*.csv')")
+    parser.add_argument('--salida', default=os.path.join(ROOT_DIR, app.app.config['DOWNLOAD_FOLDER']), help="carpeta de los archivos generados (por defecto, downloads/)")
+    parser.add_argument('--procesos', type=int, default=1, help="archivos que se procesan a la vez (por defecto, 1)")
+    parser.add_argument('--columnas', type=lambda value: [column.strip() for column in value.split(',') if column.strip()],
+                        help="limpiar: columnas a conservar además de email/docnum; crm: columnas de email")
+    parser.add_argument('--categorias', type=lambda value: [category.strip() for category in value.split(',')],
+                        help=f"exportar: categorías a exportar ({', '.join(category for category, _, _, _ in app.MULTI_EXPORT_CATEGORIES)})")
+    parser.add_argument('--compresion', choices=list(app.COMPRESSION_EXTENSIONS), help="comprimir los CSV generados")
+    parser.add_argument('--cache', action='store_true', help="pasar los archivos por la caché de uploads/ (se enlazan o se copian) "
+                                                             "para reutilizar su formato, cantidad de filas e índice en las próximas corridas")
+    parser.add_argument('--compresion-zip', type=int, choices=range(10), metavar='0-9', help="nivel del ZIP de la exportación (0 = sin comprimir)")
+    return parser.parse_args(argv)
+
+def main(argv=None):
+    options = parse_args(argv)
+    # Las rutas de los archivos y de la salida se resuelven antes de pasar a la raíz del proyecto
+    paths = expand_inputs(options.archivos)
+    options.salida = os.path.abspath(options.salida)
+    if not paths:
+        print("No se encontraron archivos .csv, .csv.gz o .csv.zst.", file=sys.stderr)
+        return 2
+    output_dirs = get_output_dirs(paths, options.salida)
+    conflicts = find_output_conflicts(paths, output_dirs) if options.comando != 'catalogos' else []
+    if conflicts:
+        print("Estos archivos generarían los mismos archivos de salida; procesalos por separado o renombralos:", file=sys.stderr)
+        for group in conflicts:
+            print(f"    {', '.join(os.path.relpath(path) for path in group)}", file=sys.stderr)
+        return 2
+
+    with working_directory(ROOT_DIR):
+        return run_batch(paths, output_dirs, options)
+
+def run_batch(paths, output_dirs, options):
+    """Procesa los archivos (desde la raíz del proyecto) e imprime el resultado de cada uno y los totales."""
+    start = time.perf_counter()
+    if options.procesos > 1 and len(paths) > 1:
+        with ProcessPoolExecutor(max_workers=min(options.procesos, len(paths))) as executor:
+            futures = [executor.submit(process_file, path, output_dirs[path], options) for path in paths]
+            results = []
+            for future in as_completed(futures):
+                results.append(future.result())
+                print(format_result(results[-1]), flush=True)
+    else:
+        results = []
+        for path in paths:
+            results.append(process_file(path, output_dirs[path], options))
+            print(format_result(results[-1]), flush=True)
+    elapsed = time.perf_counter() - start
+
+    totals = {}
+    for result in results:
+        for name, seconds in result['timings']:
+            totals[name] = totals.get(name, 0) + seconds
+    failed = sum(1 for result in results if result['error'])
+    print(f"\n{len(results)} archivo(s) en {elapsed:.2f}s ({len(results) - failed} correctos, {failed} con error)")
+    print("Tiempo por etapa (suma de todos los archivos): " + ' | '.join(f"{name} {seconds:.2f}s" for name, seconds in totals.items()))
+    return 1 if failed else 0
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,103 @@
+'''
+Benchmark del sidecar Parquet (`app.config['COLUMNAR_SIDECAR']`): latencia de las acciones
+que se repiten sobre un mismo archivo subido (previsualización, "Limpiar Base", CRM y
+exportación múltiple) leyendo el CSV contra leyendo solo las columnas necesarias del sidecar.
+
+Sube una base sintética con columnas de relleno a una caché de uploads temporal, genera el
+sidecar, ejecuta cada acción en ambos modos, verifica que las salidas sean idénticas y
+reporta la mediana de los tiempos. Requiere pyarrow.
+
+Para ejecutarlo (desde la raíz del proyecto):
+    python benchmarks/bench_columnar_sidecar.py                  # 500.000 filas, 30 columnas extra
+    python benchmarks/bench_columnar_sidecar.py 1000000 60 5     # filas, columnas extra, repeticiones
+'''
+
+import filecmp
+import os
+import statistics
+import sys
+import tempfile
+import time
+
+from werkzeug.datastructures import FileStorage
+
+from synthetic import generate_clientes_base, setup_app_path
+from bench_multi_export import zip_members
+
+setup_app_path()
+import app  # noqa: E402
+
+CLEAN_COLUMNS = ['email', 'docnum', 'NOMBRE', 'EMIS_BANCOS']
+
+def run_task(job_type, target, *args):
+    task_id = app.job_store.create(job_type)
+    target(task_id, *args)
+    task = app.job_store.get(task_id)
+    if task['status'] != 'complete':
+        raise RuntimeError(task.get('error'))
+
+def actions(filepath, workdir):
+    '''Devuelve (nombre, función que ejecuta la acción y retorna lo que hay que comparar).'''
+    selected = {category: sorted(entities) for category, entities in app.load_known_entities().items()}
+
+    def preview():
+        return app.generate_preview_data(filepath, CLEAN_COLUMNS, True)
+
+    def clean():
+        output = os.path.join(workdir, f"limpio_{app.app.config['COLUMNAR_SIDECAR']}.csv")
+        run_task('clean', app.process_csv_task, filepath, CLEAN_COLUMNS, True, output)
+        return output
+
+    def crm():
+        output = os.path.join(workdir, f"crm_{app.app.config['COLUMNAR_SIDECAR']}.csv")
+        run_task('crm', app.crm_process_task, filepath, ['email'], output)
+        return output
+
+    def multi_export():
+        output = os.path.join(workdir, f"multi_{app.app.config['COLUMNAR_SIDECAR']}.zip")
+        run_task('multi_export', app.multi_export_process_task, filepath, selected, output)
+        return zip_members(output)
+
+    return [('previsualización', preview), ('limpiar base', clean), ('crm', crm), ('exportación múltiple', multi_export)]
+
+def measure(action, repeat):
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = action()
+        times.append(time.perf_counter() - start)
+    return statistics.median(times), result
+
+def same_output(csv_result, sidecar_result):
+    if isinstance(csv_result, str):
+        return filecmp.cmp(csv_result, sidecar_result, shallow=False)
+    return csv_result == sidecar_result
+
+if __name__ == '__main__':
+    if app.pq is None:
+        sys.exit('Este benchmark requiere pyarrow.')
+    rows = int(sys.argv[1]) if len(sys.argv) > 1 else 500_000
+    extra_columns = int(sys.argv[2]) if len(sys.argv) > 2 else 30
+    repeat = int(sys.argv[3]) if len(sys.argv) > 3 else 3
+
+    with tempfile.TemporaryDirectory() as workdir:
+        app.app.config['UPLOAD_FOLDER'] = os.path.join(workdir, 'uploads')
+        source = generate_clientes_base(os.path.join(workdir, 'base.csv'), rows, extra_columns=extra_columns)
+        with open(source, 'rb') as stream:
+            filepath, _ = app.save_upload(FileStorage(stream=stream, filename='base.csv'))
+
+        start = time.perf_counter()
+        run_task('sidecar', app.build_columnar_sidecar, filepath)
+        conversion_time = time.perf_counter() - start
+        csv_size = os.path.getsize(filepath) / 1024 / 1024
+        sidecar_size = os.path.getsize(app.get_sidecar_path(filepath)) / 1024 / 1024
+        print(f"{rows:,} filas, {extra_columns + 6} columnas | CSV: {csv_size:,.0f} MB | "
+              f"sidecar: {sidecar_size:,.0f} MB | conversión: {conversion_time:.2f}s")
+
+        for name, action in actions(filepath, workdir):
+            app.app.config['COLUMNAR_SIDECAR'] = False
+            csv_time, csv_result = measure(action, repeat)
+            app.app.config['COLUMNAR_SIDECAR'] = True
+            sidecar_time, sidecar_result = measure(action, repeat)
+            print(f"  {name:<21}: CSV {csv_time:7.3f}s | sidecar {sidecar_time:7.3f}s | "
+                  f"speedup: {csv_time / sidecar_time:5.1f}x | idéntico: {same_output(csv_result, sidecar_result)}")
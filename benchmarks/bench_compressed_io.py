@@ -0,0 +1,72 @@
+'''
+Benchmark de los archivos comprimidos (.csv.gz / .csv.zst): tamaño en disco y tiempo de la
+limpieza completa (`process_csv_task`) leyendo la base sin comprimir, con gzip y con zstd, y
+escribiendo el resultado con cada valor de `OUTPUT_COMPRESSION`.
+
+Verifica que todas las combinaciones generen el mismo CSV una vez descomprimido.
+
+Para ejecutarlo (desde la raíz del proyecto):
+    python benchmarks/bench_compressed_io.py              # 1M filas
+    python benchmarks/bench_compressed_io.py 2000000
+'''
+
+import hashlib
+import os
+import shutil
+import sys
+import tempfile
+import time
+
+from synthetic import generate_clientes_base, setup_app_path
+
+setup_app_path()
+import app  # noqa: E402
+
+def compress(source, compression):
+    '''Copia `source` comprimida con `compression` usando los mismos helpers que la aplicación.'''
+    path = f"{source}{app.COMPRESSION_EXTENSIONS[compression]}"
+    with open(source, 'rb') as src, app.open_output_file(path) as dst:
+        shutil.copyfileobj(src, dst, 1024 * 1024)
+    return path
+
+def clean(source, output_compression, workdir):
+    app.app.config['OUTPUT_COMPRESSION'] = output_compression
+    output_path = os.path.join(workdir, app.get_output_filename(source, '_limpio'))
+    columns = app.read_upload_header(source)
+    task_id = app.job_store.create('clean')
+    start = time.perf_counter()
+    app.process_csv_task(task_id, source, columns, False, output_path)
+    elapsed = time.perf_counter() - start
+    task = app.job_store.get(task_id)
+    if task['status'] != 'complete':
+        raise RuntimeError(task.get('error'))
+    digest = hashlib.sha256()
+    with app.open_csv_file(output_path) as f:
+        for block in iter(lambda: f.read(1024 * 1024), b''):
+            digest.update(block)
+    size = os.path.getsize(output_path)
+    os.remove(output_path)
+    return elapsed, size, digest.hexdigest()
+
+if __name__ == '__main__':
+    rows = int(sys.argv[1]) if len(sys.argv) > 1 else 1_000_000
+
+    with tempfile.TemporaryDirectory() as workdir:
+        app.app.config['UPLOAD_FOLDER'] = os.path.join(workdir, 'uploads')
+        app.app.config['COLUMNAR_SIDECAR'] = False
+        source = generate_clientes_base(os.path.join(workdir, 'base.csv'), rows)
+        print(f"{rows:,} filas ({os.cpu_count()} CPUs)")
+        inputs = {'sin comprimir': source}
+        for compression in app.COMPRESSION_EXTENSIONS:
+            start = time.perf_counter()
+            inputs[compression] = compress(source, compression)
+            print(f"  comprimir con {compression:<5}: {time.perf_counter() - start:6.2f}s")
+        digests = set()
+        for name, path in inputs.items():
+            print(f"  entrada {name:<13}: {os.path.getsize(path) / 1024 / 1024:8.1f} MB en disco")
+            for output_compression in [None, *app.COMPRESSION_EXTENSIONS]:
+                elapsed, size, digest = clean(path, output_compression, workdir)
+                digests.add(digest)
+                print(f"    salida {output_compression or 'sin comprimir':<13}: {elapsed:6.2f}s | "
+                      f"{rows / elapsed:10,.0f} filas/s | {size / 1024 / 1024:8.1f} MB en disco")
+        print(f"  mismo resultado en todas las combinaciones: {len(digests) == 1}")
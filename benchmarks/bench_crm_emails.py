@@ -0,0 +1,94 @@
+'''
+Benchmark de la separación y validación de emails del CRM: función por celda
+(`split_emails_by_separators`, implementación original) contra el camino vectorizado
+de `extract_emails_from_column`.
+
+Genera celdas con emails sueltos, varios emails separados por ; , / | espacio o
+" - ", valores inválidos y celdas vacías; verifica que ambos caminos produzcan los
+mismos contadores (`stats`), los mismos emails y registros inválidos en el mismo
+orden, y reporta el tiempo por millón de celdas.
+
+Para ejecutarlo (desde la raíz del proyecto):
+    python benchmarks/bench_crm_emails.py            # 1M celdas
+    python benchmarks/bench_crm_emails.py 5000000
+'''
+
+import re
+import sys
+import time
+
+import numpy as np
+import pandas as pd
+
+from synthetic import setup_app_path
+
+setup_app_path()
+import app  # noqa: E402
+
+def split_emails_by_separators(value):
+    '''Implementación original (por celda), usada como referencia.'''
+    if not isinstance(value, str) or not value.strip():
+        return []
+    value = re.sub(r'\s+-\s+', '|||SEPARATOR|||', value)
+    parts = re.split(r'[;,/|\s]+', value.replace('|||SEPARATOR|||', ';'))
+    return [part.strip() for part in parts if part.strip()]
+
+def legacy_extract(series, stats):
+    valid, invalid = [], []
+    for value in series:
+        if pd.isna(value):
+            continue
+        emails_in_cell = split_emails_by_separators(str(value))
+        if len(emails_in_cell) > 1:
+            stats['separated'] += len(emails_in_cell) - 1
+        for email in emails_in_cell:
+            stats['total_raw'] += 1
+            email_clean = email.strip().lower()
+            if '@' in email_clean:
+                valid.append(email_clean)
+            else:
+                stats['invalid'] += 1
+                invalid.append(email.strip())
+    return valid, invalid
+
+def generate_cells(cells, seed=0):
+    rng = np.random.default_rng(seed)
+    separators = np.array([';', ',', ' / ', '|', ' ', ' - ', '; '])
+    kinds = rng.choice(5, size=cells, p=[0.55, 0.2, 0.1, 0.1, 0.05])
+    users = rng.integers(0, cells // 2, size=cells)
+    values = []
+    for kind, user, separator in zip(kinds, users, rng.choice(separators, size=cells)):
+        if kind == 0:
+            values.append(f'Cliente{user}@Correo.com')
+        elif kind == 1:
+            values.append(f'cliente{user}@correo.com{separator}otro{user}@mail.com')
+        elif kind == 2:
+            values.append(f'sin-arroba-{user}')
+        elif kind == 3:
+            values.append(None)
+        else:
+            values.append(f' a{user}@x.com{separator}NO TIENE{separator}b{user}@y.com ')
+    return pd.Series(values, dtype=object)
+
+def empty_stats():
+    return {'total_raw': 0, 'invalid': 0, 'separated': 0, 'duplicates': 0}
+
+if __name__ == '__main__':
+    cells = int(sys.argv[1]) if len(sys.argv) > 1 else 1_000_000
+    series = generate_cells(cells)
+
+    legacy_stats = empty_stats()
+    start = time.perf_counter()
+    legacy_result = legacy_extract(series, legacy_stats)
+    legacy_time = time.perf_counter() - start
+
+    vectorized_stats = empty_stats()
+    start = time.perf_counter()
+    vectorized_result = app.extract_emails_from_column(series, vectorized_stats)
+    vectorized_time = time.perf_counter() - start
+
+    per_million = 1_000_000 / cells
+    print(f"{cells:,} celdas")
+    print(f"  por celda   : {legacy_time * per_million:6.2f}s por millón de celdas")
+    print(f"  vectorizado : {vectorized_time * per_million:6.2f}s por millón de celdas | speedup: {legacy_time / vectorized_time:4.1f}x")
+    print(f"  mismos stats: {legacy_stats == vectorized_stats} | misma salida y orden: {legacy_result == vectorized_result}")
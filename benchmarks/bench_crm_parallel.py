@@ -0,0 +1,70 @@
+'''
+Benchmark del modo paralelo de "Procesar CRM" (`app.config['CRM_WORKERS']`).
+
+Genera una base CRM sintética con tres columnas de emails (celdas con varios emails,
+separadores, inválidos y vacías, ver `bench_crm_emails.generate_cells`), extrae los
+emails en modo secuencial y con 1, 2, 4 y 8 procesos, verifica que los `stats` y los
+archivos de emails e inválidos sean idénticos y reporta tiempos y filas/s.
+
+Para ejecutarlo (desde la raíz del proyecto):
+    python benchmarks/bench_crm_parallel.py              # 1M filas
+    python benchmarks/bench_crm_parallel.py 500000 1 2 4
+'''
+
+import filecmp
+import os
+import sys
+import tempfile
+import time
+
+import pandas as pd
+
+from synthetic import setup_app_path
+from bench_crm_emails import generate_cells
+
+setup_app_path()
+import app  # noqa: E402
+
+EMAIL_COLUMNS = ['EMAIL', 'EMAIL_ALTERNATIVO', 'EMAIL_LABORAL']
+
+def generate_crm_base(path, rows):
+    data = {'ID_CLIENTE': range(rows)}
+    for seed, column in enumerate(EMAIL_COLUMNS):
+        data[column] = generate_cells(rows, seed=seed)
+    pd.DataFrame(data).to_csv(path, index=False, sep=';')
+    return path
+
+def process(source, output, workers):
+    app.app.config['CRM_WORKERS'] = workers
+    task_id = app.job_store.create('crm')
+    start = time.perf_counter()
+    app.crm_process_task(task_id, source, EMAIL_COLUMNS, output)
+    elapsed = time.perf_counter() - start
+    task = app.job_store.get(task_id)
+    if task['status'] != 'complete':
+        raise RuntimeError(task.get('error'))
+    invalid_path = os.path.join(app.app.config['DOWNLOAD_FOLDER'], os.path.basename(task['invalid_result']))
+    os.replace(invalid_path, f'{output}.invalidos')
+    return elapsed, task['stats']
+
+if __name__ == '__main__':
+    rows = int(sys.argv[1]) if len(sys.argv) > 1 else 1_000_000
+    worker_counts = [int(arg) for arg in sys.argv[2:]] or [1, 2, 4, 8]
+
+    with tempfile.TemporaryDirectory() as workdir:
+        app.app.config['UPLOAD_FOLDER'] = os.path.join(workdir, 'uploads')
+        app.app.config['DOWNLOAD_FOLDER'] = workdir
+        # Como una subida: la corrida secuencial confirma la cantidad de filas que habilita el modo paralelo
+        source = app.cache_local_file(generate_crm_base(os.path.join(workdir, 'crm.csv'), rows))
+        reference = os.path.join(workdir, 'secuencial.csv')
+        serial_time, serial_stats = process(source, reference, 0)
+        print(f"{rows:,} filas, {len(EMAIL_COLUMNS)} columnas de emails ({os.cpu_count()} CPUs)")
+        print(f"  secuencial   : {serial_time:7.2f}s | {rows / serial_time:12,.0f} filas/s | {serial_stats}")
+
+        for workers in worker_counts:
+            output = os.path.join(workdir, f'paralelo_{workers}.csv')
+            elapsed, stats = process(source, output, workers)
+            identical = (stats == serial_stats and filecmp.cmp(reference, output, shallow=False)
+                         and filecmp.cmp(f'{reference}.invalidos', f'{output}.invalidos', shallow=False))
+            print(f"  {workers} proceso(s) : {elapsed:7.2f}s | {rows / elapsed:12,.0f} filas/s | "
+                  f"speedup: {serial_time / elapsed:5.2f}x | idéntico: {identical}")
@@ -0,0 +1,82 @@
+'''
+Benchmark de los motores de lectura de CSV (`app.config['CSV_ENGINE']`): 'c' (pandas)
+contra 'pyarrow' (multihilo), a través de `read_csv_in_chunks`.
+
+Para cada forma de lectura que usan las tareas (todas las columnas, las columnas de
+"Limpiar Base", las de la exportación múltiple y solo el email del CRM) lee la base
+completa en un proceso nuevo y reporta filas/s, MB/s y el pico de memoria (RSS).
+Requiere pyarrow para el motor 'pyarrow'.
+
+Para ejecutarlo (desde la raíz del proyecto):
+    python benchmarks/bench_csv_engines.py                 # 1M filas, 30 columnas extra
+    python benchmarks/bench_csv_engines.py 2000000 60
+'''
+
+import json
+import os
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+
+from synthetic import generate_clientes_base, setup_app_path
+
+SHAPES = {
+    'todas las columnas': None,
+    'limpiar base': ['email', 'NOMBRE', 'EMIS_BANCOS'],
+    'exportación múltiple': ['email', 'EMIS_BANCOS', 'EMIS_TARJETAS', 'PLUS_PARTNER_COBRAND', 'PLUS_PARTNER_EMPRESAS'],
+    'crm': ['email'],
+}
+
+def peak_rss_mb():
+    '''Pico de memoria del proceso. En Linux se usa VmHWM, porque ru_maxrss se hereda del proceso padre.'''
+    try:
+        with open('/proc/self/status') as status:
+            for line in status:
+                if line.startswith('VmHWM:'):
+                    return int(line.split()[1]) / 1024
+    except OSError:
+        pass
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+def measure(engine, shape, path):
+    '''Se ejecuta en un proceso nuevo para que el pico de RSS corresponda a una sola lectura.'''
+    setup_app_path()
+    import app
+
+    app.app.config['CSV_ENGINE'] = engine
+    start = time.perf_counter()
+    rows = 0
+    for chunk, _ in app.read_csv_in_chunks(path, usecols=SHAPES[shape]):
+        rows += len(chunk)
+    elapsed = time.perf_counter() - start
+    print(json.dumps({'rows': rows, 'seconds': elapsed, 'peak_rss_mb': peak_rss_mb()}))
+
+def run(engine, shape, path):
+    output = subprocess.run([sys.executable, __file__, '--medir', engine, shape, path],
+                            check=True, capture_output=True, text=True).stdout
+    return json.loads(output.splitlines()[-1])
+
+if __name__ == '__main__':
+    if sys.argv[1:2] == ['--medir']:
+        measure(*sys.argv[2:5])
+        sys.exit()
+
+    setup_app_path()
+    import app
+
+    rows = int(sys.argv[1]) if len(sys.argv) > 1 else 1_000_000
+    extra_columns = int(sys.argv[2]) if len(sys.argv) > 2 else 30
+    engines = ['c', 'pyarrow'] if app.pa is not None else ['c']
+
+    with tempfile.TemporaryDirectory() as workdir:
+        path = generate_clientes_base(os.path.join(workdir, 'base.csv'), rows, extra_columns=extra_columns)
+        size_mb = os.path.getsize(path) / 1024 / 1024
+        print(f"{rows:,} filas, {extra_columns + 6} columnas, {size_mb:,.0f} MB ({os.cpu_count()} CPUs)")
+        for shape in SHAPES:
+            print(f"  {shape}:")
+            for engine in engines:
+                result = run(engine, shape, path)
+                print(f"    {engine:<8}: {result['seconds']:7.2f}s | {result['rows'] / result['seconds']:12,.0f} filas/s | "
+                      f"{size_mb / result['seconds']:7.1f} MB/s | pico RSS: {result['peak_rss_mb']:7.0f} MB")
@@ -0,0 +1,86 @@
+'''
+Benchmark de escritura de los CSV generados, en MB/s.
+
+- Tabla ("Limpiar Base"): la versión anterior, `chunk.to_csv(output_path, mode='a')` por chunk
+  (reabre el archivo cada vez y usa el formateador de pandas), contra un solo archivo abierto
+  con buffer y `format_csv_frame` (comillas y uniones con pyarrow.compute).
+- Una columna (emails del CRM e inválidos, archivos del ZIP de la exportación múltiple):
+  `csv.writer` fila por fila contra `write_csv_column`.
+
+Los chunks se limpian antes de medir, así que solo se mide la escritura. Verifica que los
+archivos sean idénticos.
+
+Para ejecutarlo (desde la raíz del proyecto):
+    python benchmarks/bench_csv_writer.py              # 1M filas
+    python benchmarks/bench_csv_writer.py 2000000
+'''
+
+import csv
+import filecmp
+import io
+import os
+import sys
+import tempfile
+import time
+
+from synthetic import generate_clientes_base, setup_app_path
+
+setup_app_path()
+import app  # noqa: E402
+
+def write_frames_to_csv(chunks, path):
+    '''Versión anterior de `process_csv_task`: reabre el archivo de salida en cada chunk.'''
+    for position, chunk in enumerate(chunks):
+        if position == 0:
+            chunk.to_csv(path, index=False, mode='w')
+        else:
+            chunk.to_csv(path, index=False, mode='a', header=False)
+
+def write_frames_fast(chunks, path):
+    with app.open_output_file(path) as output:
+        for position, chunk in enumerate(chunks):
+            output.write(app.format_csv_frame(chunk, header=position == 0))
+
+def write_column_csv_writer(values, path):
+    '''Versión anterior de `OrderedDeduplicator` y del ZIP de la exportación múltiple.'''
+    with io.TextIOWrapper(open(path, 'wb'), encoding='utf-8', newline='') as output:
+        writer = csv.writer(output, lineterminator=os.linesep)
+        writer.writerow(['email'])
+        writer.writerows([value] for value in values)
+
+def write_column_fast(values, path):
+    with app.open_output_file(path) as output:
+        output.write(app.format_csv_header(['email']))
+        app.write_csv_column(output, values)
+
+def measure(write, data, path):
+    start = time.perf_counter()
+    write(data, path)
+    elapsed = time.perf_counter() - start
+    return elapsed, os.path.getsize(path) / 1024 / 1024 / elapsed
+
+if __name__ == '__main__':
+    rows = int(sys.argv[1]) if len(sys.argv) > 1 else 1_000_000
+
+    with tempfile.TemporaryDirectory() as workdir:
+        app.app.config['COLUMNAR_SIDECAR'] = False
+        source = generate_clientes_base(os.path.join(workdir, 'base.csv'), rows)
+        columns = app.read_upload_header(source)
+        chunks = [app.clean_chunk(chunk, columns, True) for chunk, _ in app.read_csv_in_chunks(source)]
+        emails = [email for chunk in chunks for email in chunk['email'].dropna().tolist()]
+        # Algunos valores con comas y comillas, como los registros inválidos del CRM
+        emails[::50] = [f'"{email}", {email}' for email in emails[::50]]
+
+        print(f"{rows:,} filas")
+        cases = [
+            ('tabla', chunks, write_frames_to_csv, write_frames_fast),
+            ('una columna', emails, write_column_csv_writer, write_column_fast),
+        ]
+        for name, data, previous, fast in cases:
+            previous_path, fast_path = os.path.join(workdir, 'anterior.csv'), os.path.join(workdir, 'nuevo.csv')
+            previous_time, previous_rate = measure(previous, data, previous_path)
+            fast_time, fast_rate = measure(fast, data, fast_path)
+            size = os.path.getsize(fast_path) / 1024 / 1024
+            print(f"  {name:<12} ({size:6.1f} MB): anterior {previous_time:6.2f}s ({previous_rate:6.1f} MB/s) | "
+                  f"nuevo {fast_time:6.2f}s ({fast_rate:6.1f} MB/s) | speedup: {previous_time / fast_time:4.2f}x | "
+                  f"idéntico: {filecmp.cmp(previous_path, fast_path, shallow=False)}")
@@ -0,0 +1,135 @@
+'''
+Benchmark de memoria de la exportación múltiple: emails internados (`EmailTable` + arrays
+de ids uint32 por archivo) contra listas de strings por archivo (la versión anterior,
+donde un cliente con cinco bancos y tres tarjetas aparece en ocho listas).
+
+Con todas las entidades seleccionadas mide, en un proceso nuevo por variante, la memoria
+que retienen los datos de la exportación antes de escribir el ZIP (tracemalloc) y el pico
+de RSS, tanto leyendo el CSV como cargando desde el índice invertido. Verifica además
+que ambas variantes produzcan los mismos emails por archivo.
+
+Para ejecutarlo (desde la raíz del proyecto):
+    python benchmarks/bench_email_interning.py            # 5M filas
+    python benchmarks/bench_email_interning.py 1000000
+'''
+
+import gc
+import hashlib
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+
+import numpy as np
+
+from synthetic import generate_clientes_base, setup_app_path
+from bench_csv_engines import peak_rss_mb
+
+VARIANTS = ['csv-listas', 'csv-internado', 'indice-listas', 'indice-internado']
+
+def legacy_fan_out_chunk(app, chunk, selected_categories_and_items, known_entities, data_for_csv, first_seen):
+    '''Versión anterior de `multi_export_fan_out_chunk`: una lista de strings por archivo.'''
+    chunk = chunk[chunk['email'].notna()]
+    if chunk.empty:
+        return
+    emails = app.clean_email_series(chunk['email']).to_numpy(dtype=object)
+    row_labels = chunk.index.to_numpy()
+    wanted_items = {
+        category: known_entities[category].intersection(selected_categories_and_items[category])
+        for category, _, _, _ in app.MULTI_EXPORT_CATEGORIES if category in selected_categories_and_items
+    }
+    for category_order, _, prefix, item, hit_rows, occurrences, first_pos in app.iter_entity_occurrences(chunk, wanted_items):
+        key = f"{prefix}_{item}"
+        if key not in data_for_csv:
+            data_for_csv[key] = []
+            first_seen[key] = (row_labels[hit_rows[0]], category_order, first_pos)
+        data_for_csv[key].extend(np.repeat(emails[hit_rows], occurrences).tolist())
+
+def load_variant(app, variant, filepath, selected, known):
+    '''Arma los datos de la exportación y devuelve una función que da los emails de cada archivo.'''
+    source, mode = variant.split('-')
+    if source == 'indice':
+        email_table, files = app.load_multi_export_from_index(filepath, selected, known)
+        if mode == 'internado':
+            return files, email_table.resolve
+        # Versión anterior: todos los emails como objetos y una lista por archivo
+        emails = np.array(email_table.resolve(np.arange(email_table.count)), dtype=object)
+        del email_table
+        files = [(name, emails[ids].tolist()) for name, ids in files]
+        return files, list
+
+    required_cols = ['email'] + [column for _, column, _, _ in app.MULTI_EXPORT_CATEGORIES]
+    data_for_csv, first_seen = {}, {}
+    if mode == 'internado':
+        email_table = app.EmailTable()
+        for chunk, _ in app.read_upload_in_chunks(filepath, usecols=required_cols):
+            app.multi_export_fan_out_chunk(chunk, selected, known, data_for_csv, first_seen, email_table)
+        return app.order_multi_export_data(data_for_csv, first_seen), email_table.resolve
+    for chunk, _ in app.read_upload_in_chunks(filepath, usecols=required_cols):
+        legacy_fan_out_chunk(app, chunk, selected, known, data_for_csv, first_seen)
+    return [(key, data_for_csv[key]) for key in sorted(data_for_csv, key=first_seen.__getitem__)], list
+
+def measure(variant, filepath):
+    '''Se ejecuta en un proceso nuevo para que la memoria corresponda a una sola variante.'''
+    setup_app_path()
+    import app
+
+    app.app.config['UPLOAD_FOLDER'] = os.path.dirname(os.path.dirname(filepath))
+    app.app.config['COLUMNAR_SIDECAR'] = False
+    known = app.load_known_entities()
+    selected = {category: sorted(items) for category, items in known.items()}
+    tracemalloc.start()
+    start = time.perf_counter()
+    files, resolve = load_variant(app, variant, filepath, selected, known)
+    elapsed = time.perf_counter() - start
+    gc.collect()
+    retained, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    digest = hashlib.sha256()
+    entries = 0
+    for name, values in files:
+        emails = resolve(values)
+        entries += len(emails)
+        digest.update(name.encode('utf-8'))
+        digest.update('\n'.join(emails).encode('utf-8'))
+    print(json.dumps({'seconds': elapsed, 'retained_mb': retained / 1024 / 1024, 'peak_rss_mb': peak_rss_mb(),
+                      'entries': entries, 'digest': digest.hexdigest()}))
+
+def run(variant, filepath):
+    output = subprocess.run([sys.executable, __file__, '--medir', variant, filepath],
+                            check=True, capture_output=True, text=True).stdout
+    return json.loads(output.splitlines()[-1])
+
+if __name__ == '__main__':
+    if sys.argv[1:2] == ['--medir']:
+        measure(*sys.argv[2:4])
+        sys.exit()
+
+    setup_app_path()
+    import app
+    from werkzeug.datastructures import FileStorage
+
+    rows = int(sys.argv[1]) if len(sys.argv) > 1 else 5_000_000
+
+    with tempfile.TemporaryDirectory() as workdir:
+        app.app.config['UPLOAD_FOLDER'] = os.path.join(workdir, 'uploads')
+        app.app.config['COLUMNAR_SIDECAR'] = False
+        source = generate_clientes_base(os.path.join(workdir, 'base.csv'), rows)
+        with open(source, 'rb') as stream:
+            filepath, _ = app.save_upload(FileStorage(stream=stream, filename='base.csv'))
+        task_id = app.job_store.create('multi_export_scan')
+        app.multi_export_initial_process_task(task_id, filepath)
+
+        results = {variant: run(variant, filepath) for variant in VARIANTS}
+        print(f"{rows:,} filas, todas las entidades ({results['csv-listas']['entries']:,} emails en los archivos)")
+        for source in ('csv', 'indice'):
+            lists, interned = results[f'{source}-listas'], results[f'{source}-internado']
+            for name, result in (('listas de str', lists), ('internado', interned)):
+                print(f"  {source:<6} {name:<14}: retenido {result['retained_mb']:8.1f} MB | pico RSS {result['peak_rss_mb']:8.1f} MB | "
+                      f"{result['seconds']:6.2f}s")
+            print(f"  {source:<6} reducción      : {lists['retained_mb'] / interned['retained_mb']:5.1f}x | "
+                  f"idéntico: {lists['digest'] == interned['digest']}")
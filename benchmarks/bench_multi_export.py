@@ -0,0 +1,91 @@
+'''
+Benchmark de la Exportación Múltiple: recorrido fila por fila (`iterrows`) contra
+el motor vectorizado de `multi_export_process_task`.
+
+Para cada tamaño genera una base sintética, ejecuta ambos caminos con todas las
+entidades seleccionadas, verifica que los ZIP tengan los mismos archivos, en el
+mismo orden y con el mismo contenido, y reporta los tiempos.
+
+Para ejecutarlo (desde la raíz del proyecto):
+    python benchmarks/bench_multi_export.py            # 1M y 5M filas
+    python benchmarks/bench_multi_export.py 200000     # tamaños a elección
+'''
+
+import io
+import os
+import shutil
+import sys
+import tempfile
+import time
+import zipfile
+
+import pandas as pd
+
+from synthetic import generate_clientes_base, setup_app_path
+
+setup_app_path()
+import app  # noqa: E402
+
+def legacy_multi_export(filepath, selected_categories_and_items, output_zip_path):
+    '''Implementación original (fila por fila), con la limpieza final de cada archivo, usada como referencia.'''
+    known = app.load_known_entities()
+    df = pd.read_csv(filepath, sep=';', encoding=app.get_csv_dialect(filepath)[0])
+    data_for_csv = {}
+    for _, row in df.iterrows():
+        email = row['email']
+        if pd.isna(email):
+            continue
+        email = app.clean_email(email)
+        for category, column, prefix, _ in app.MULTI_EXPORT_CATEGORIES:
+            if category in selected_categories_and_items and pd.notna(row.get(column)):
+                for item in str(row[column]).split(','):
+                    item = item.strip()
+                    if item in known[category] and item in selected_categories_and_items[category]:
+                        data_for_csv.setdefault(f"{prefix}_{item}", []).append(email)
+
+    with zipfile.ZipFile(output_zip_path, 'w', zipfile.ZIP_DEFLATED) as zf:
+        for name, emails in data_for_csv.items():
+            # Limpieza final: sin emails sin '@' ni duplicados
+            emails = list(dict.fromkeys(email for email in emails if '@' in str(email)))
+            if not emails:
+                continue
+            output = io.StringIO()
+            pd.DataFrame(emails, columns=['email']).to_csv(output, index=False)
+            zf.writestr(f"{name}.csv", output.getvalue())
+
+def zip_members(path):
+    with zipfile.ZipFile(path) as zf:
+        return [(info.filename, zf.read(info.filename)) for info in zf.infolist()]
+
+def run(rows, workdir):
+    source = os.path.join(workdir, f'base_{rows}.csv')
+    generate_clientes_base(source, rows)
+    selected = {category: sorted(entities) for category, entities in app.load_known_entities().items()}
+
+    legacy_zip = os.path.join(workdir, 'legacy.zip')
+    start = time.perf_counter()
+    legacy_multi_export(source, selected, legacy_zip)
+    legacy_time = time.perf_counter() - start
+
+    # La tarea borra el CSV al terminar, así que trabaja sobre una copia
+    working_copy = os.path.join(workdir, 'working.csv')
+    shutil.copyfile(source, working_copy)
+    vectorized_zip = os.path.join(workdir, 'vectorized.zip')
+    task_id = app.job_store.create('multi_export')
+    start = time.perf_counter()
+    app.multi_export_process_task(task_id, working_copy, selected, vectorized_zip)
+    vectorized_time = time.perf_counter() - start
+    task = app.job_store.get(task_id)
+    if task['status'] != 'complete':
+        raise RuntimeError(task.get('error'))
+
+    identical = zip_members(legacy_zip) == zip_members(vectorized_zip)
+    print(f"{rows:>10,} filas | iterrows: {legacy_time:8.2f}s | vectorizado: {vectorized_time:7.2f}s | "
+          f"speedup: {legacy_time / vectorized_time:6.1f}x | contenido idéntico: {identical}")
+    os.remove(source)
+
+if __name__ == '__main__':
+    sizes = [int(arg) for arg in sys.argv[1:]] or [1_000_000, 5_000_000]
+    with tempfile.TemporaryDirectory() as workdir:
+        for rows in sizes:
+            run(rows, workdir)
@@ -0,0 +1,78 @@
+'''
+Benchmark del índice invertido de la exportación múltiple (`app.config['MULTI_EXPORT_INDEX']`).
+
+Sube una base sintética a una caché de uploads temporal y mide:
+  - el escaneo inicial con y sin armar el índice (costo extra del índice);
+  - el tiempo desde la selección hasta el ZIP, leyendo el CSV contra usando el índice,
+    para todas las entidades y para una selección chica, verificando que los ZIP sean idénticos;
+  - la latencia de `/api/multi-export-segment-counts` (conteos y cruces con los bitmaps).
+
+Para ejecutarlo (desde la raíz del proyecto):
+    python benchmarks/bench_multi_export_index.py            # 1M filas
+    python benchmarks/bench_multi_export_index.py 5000000
+'''
+
+import os
+import sys
+import tempfile
+import time
+
+from werkzeug.datastructures import FileStorage
+
+from synthetic import generate_clientes_base, setup_app_path
+from bench_multi_export import zip_members
+
+setup_app_path()
+import app  # noqa: E402
+
+def run_task(job_type, target, *args):
+    task_id = app.job_store.create(job_type)
+    start = time.perf_counter()
+    target(task_id, *args)
+    elapsed = time.perf_counter() - start
+    task = app.job_store.get(task_id)
+    if task['status'] != 'complete':
+        raise RuntimeError(task.get('error'))
+    return elapsed
+
+if __name__ == '__main__':
+    rows = int(sys.argv[1]) if len(sys.argv) > 1 else 1_000_000
+    app.app.config['COLUMNAR_SIDECAR'] = False
+
+    with tempfile.TemporaryDirectory() as workdir:
+        app.app.config['UPLOAD_FOLDER'] = os.path.join(workdir, 'uploads')
+        source = generate_clientes_base(os.path.join(workdir, 'base.csv'), rows)
+        with open(source, 'rb') as stream:
+            filepath, _ = app.save_upload(FileStorage(stream=stream, filename='base.csv'))
+
+        app.app.config['MULTI_EXPORT_INDEX'] = False
+        scan_time = run_task('multi_export_scan', app.multi_export_initial_process_task, filepath)
+        app.app.config['MULTI_EXPORT_INDEX'] = True
+        indexed_scan_time = run_task('multi_export_scan', app.multi_export_initial_process_task, filepath)
+        print(f"{rows:,} filas")
+        print(f"  escaneo inicial: {scan_time:7.2f}s | con índice: {indexed_scan_time:7.2f}s")
+
+        known = app.load_known_entities()
+        selections = {
+            'todas las entidades': {category: sorted(items) for category, items in known.items()},
+            'selección chica': {'bancos': ['GALICIA', 'BNA'], 'tarjetas': ['VISA']},
+        }
+        for name, selected in selections.items():
+            outputs = {}
+            times = {}
+            for use_index in (False, True):
+                app.app.config['MULTI_EXPORT_INDEX'] = use_index
+                outputs[use_index] = os.path.join(workdir, f'multi_{use_index}.zip')
+                times[use_index] = run_task('multi_export', app.multi_export_process_task, filepath, selected, outputs[use_index])
+            identical = zip_members(outputs[False]) == zip_members(outputs[True])
+            print(f"  {name:<20}: leyendo el CSV {times[False]:7.2f}s | con índice {times[True]:7.2f}s | "
+                  f"speedup: {times[False] / times[True]:5.1f}x | idéntico: {identical}")
+
+        client = app.app.test_client()
+        for name, selected in selections.items():
+            start = time.perf_counter()
+            response = client.post('/api/multi-export-segment-counts', json={'filepath': filepath, 'selected_items': selected})
+            elapsed = time.perf_counter() - start
+            data = response.get_json()
+            print(f"  conteos ({name}): {elapsed * 1000:7.1f}ms | {len(data['overlaps'])} cruces | "
+                  f"filas a exportar: {data['union']:,} | segmento: {data['segment']:,}")
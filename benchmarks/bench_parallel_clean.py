@@ -0,0 +1,52 @@
+'''
+Benchmark del modo paralelo de "Limpiar Base" (`app.config['CLEAN_WORKERS']`).
+
+Genera una base sintética, la limpia en modo secuencial y con 1, 2, 4 y 8 procesos,
+verifica que todos los archivos de salida sean idénticos y reporta tiempos y filas/s.
+
+Para ejecutarlo (desde la raíz del proyecto):
+    python benchmarks/bench_parallel_clean.py              # 1M filas
+    python benchmarks/bench_parallel_clean.py 500000 1 2 4
+'''
+
+import filecmp
+import os
+import sys
+import tempfile
+import time
+
+from synthetic import generate_clientes_base, setup_app_path
+
+setup_app_path()
+import app  # noqa: E402
+
+SELECTED_COLUMNS = ['email', 'docnum', 'NOMBRE', 'EMIS_BANCOS', 'EMIS_TARJETAS']
+
+def clean(source, output, workers):
+    app.app.config['CLEAN_WORKERS'] = workers
+    task_id = app.job_store.create('clean')
+    start = time.perf_counter()
+    app.process_csv_task(task_id, source, SELECTED_COLUMNS, True, output)
+    elapsed = time.perf_counter() - start
+    task = app.job_store.get(task_id)
+    if task['status'] != 'complete':
+        raise RuntimeError(task.get('error'))
+    return elapsed
+
+if __name__ == '__main__':
+    rows = int(sys.argv[1]) if len(sys.argv) > 1 else 1_000_000
+    worker_counts = [int(arg) for arg in sys.argv[2:]] or [1, 2, 4, 8]
+
+    with tempfile.TemporaryDirectory() as workdir:
+        source = generate_clientes_base(os.path.join(workdir, 'base.csv'), rows)
+        reference = os.path.join(workdir, 'secuencial.csv')
+        serial_time = clean(source, reference, 0)
+        print(f"{rows:,} filas ({os.cpu_count()} CPUs)")
+        print(f"  secuencial   : {serial_time:7.2f}s | {rows / serial_time:12,.0f} filas/s")
+
+        for workers in worker_counts:
+            output = os.path.join(workdir, f'paralelo_{workers}.csv')
+            elapsed = clean(source, output, workers)
+            identical = filecmp.cmp(reference, output, shallow=False)
+            print(f"  {workers} proceso(s) : {elapsed:7.2f}s | {rows / elapsed:12,.0f} filas/s | "
+                  f"speedup: {serial_time / elapsed:5.2f}x | idéntico: {identical}")
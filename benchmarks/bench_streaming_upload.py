@@ -0,0 +1,130 @@
+'''
+Benchmark de la subida por partes (`UploadSession`): tiempo hasta tener las columnas y hasta
+terminar el escaneo inicial de la exportación múltiple, subiendo el archivo completo y después
+procesándolo (versión anterior) contra subirlo por partes, con el escaneo leyendo el archivo
+mientras llega.
+
+La red se simula limitando la velocidad de lectura del cuerpo de cada petición (por defecto
+50 MB/s). Verifica que ambos caminos devuelvan las mismas entidades y el mismo índice invertido.
+
+Para ejecutarlo (desde la raíz del proyecto):
+    python benchmarks/bench_streaming_upload.py               # 1M filas, 50 MB/s
+    python benchmarks/bench_streaming_upload.py 2000000 20
+'''
+
+import io
+import json
+import os
+import shutil
+import sys
+import tempfile
+import threading
+import time
+
+from werkzeug.test import EnvironBuilder
+
+from synthetic import generate_clientes_base, setup_app_path
+
+setup_app_path()
+import app  # noqa: E402
+
+FIRST_PART_SIZE = 1024 * 1024
+
+class ThrottledStream(io.RawIOBase):
+    '''Lee un buffer a `rate` bytes por segundo, como si llegara por la red.'''
+
+    def __init__(self, data, rate):
+        super().__init__()
+        self._data = memoryview(data)
+        self._rate = rate
+        self._position = 0
+
+    def readable(self):
+        return True
+
+    def readinto(self, buffer):
+        count = min(len(buffer), 256 * 1024, len(self._data) - self._position)
+        time.sleep(count / self._rate)
+        buffer[:count] = self._data[self._position:self._position + count]
+        self._position += count
+        return count
+
+def post(url, fields, rate):
+    '''POST multipart (directo a la aplicación WSGI) cuyo cuerpo llega a `rate` bytes/s. Devuelve el JSON.'''
+    environ = EnvironBuilder(path=url, method='POST', data=fields).get_environ()
+    body = environ['wsgi.input'].read()
+    environ['wsgi.input'] = io.BufferedReader(ThrottledStream(body, rate))
+    response = b''.join(app.app(environ, lambda status, headers, exc_info=None: None))
+    return json.loads(response)
+
+def wait_task(task_id):
+    while True:
+        task = app.job_store.get(task_id)
+        if task['status'] in ('complete', 'error'):
+            if task['status'] == 'error':
+                raise RuntimeError(task['error'])
+            return task
+        time.sleep(0.01)
+
+def index_contents(filepath):
+    index_path = app.get_entity_index_path(filepath)
+    return {name: open(os.path.join(index_path, name), 'rb').read() for name in sorted(os.listdir(index_path))}
+
+def run_whole(data, filename, rate):
+    start = time.perf_counter()
+    response = post('/api/get-columns', {'csv_file': (io.BytesIO(data), filename)}, rate)
+    columns_time = time.perf_counter() - start
+    shutil.rmtree(os.path.dirname(response['filepath']))
+
+    start = time.perf_counter()
+    response = post('/api/multi-export-initial-process', {'csv_file': (io.BytesIO(data), filename)}, rate)
+    task = wait_task(response['task_id'])
+    return columns_time, time.perf_counter() - start, task['result']
+
+def send_parts(data, upload_id, offset, rate):
+    part_size = app.app.config['UPLOAD_PART_SIZE']
+    while offset < len(data):
+        part = data[offset:offset + part_size]
+        response = post('/api/upload-part', {'upload_id': upload_id, 'offset': str(offset),
+                                             'part': (io.BytesIO(part), 'blob')}, rate)
+        offset = response['received']
+
+def run_parts(data, filename, rate):
+    first_part = {'csv_file': (io.BytesIO(data[:FIRST_PART_SIZE]), filename), 'total_size': str(len(data))}
+    start = time.perf_counter()
+    response = post('/api/get-columns', dict(first_part), rate)
+    columns_time = time.perf_counter() - start
+    send_parts(data, response['upload_id'], response['received'], rate)
+
+    first_part['csv_file'] = (io.BytesIO(data[:FIRST_PART_SIZE]), filename)
+    start = time.perf_counter()
+    response = post('/api/multi-export-initial-process', first_part, rate)
+    uploader = threading.Thread(target=send_parts, args=(data, response['upload_id'], response['received'], rate))
+    uploader.start()
+    task = wait_task(response['task_id'])
+    uploader.join()
+    return columns_time, time.perf_counter() - start, task['result']
+
+if __name__ == '__main__':
+    rows = int(sys.argv[1]) if len(sys.argv) > 1 else 1_000_000
+    rate = (float(sys.argv[2]) if len(sys.argv) > 2 else 50) * 1024 * 1024
+
+    with tempfile.TemporaryDirectory() as workdir:
+        app.app.config['UPLOAD_FOLDER'] = os.path.join(workdir, 'uploads')
+        app.app.config['COLUMNAR_SIDECAR'] = False
+        source = generate_clientes_base(os.path.join(workdir, 'base.csv'), rows)
+        with open(source, 'rb') as f:
+            data = f.read()
+
+        whole_columns, whole_scan, whole_result = run_whole(data, 'base.csv', rate)
+        whole_index = index_contents(whole_result['filepath'])
+        shutil.rmtree(os.path.dirname(whole_result['filepath']))
+        parts_columns, parts_scan, parts_result = run_parts(data, 'base.csv', rate)
+
+        identical = (whole_result == parts_result and whole_index == index_contents(parts_result['filepath']))
+        print(f"{rows:,} filas ({len(data) / 1024 / 1024:.0f} MB), red simulada a {rate / 1024 / 1024:.0f} MB/s "
+              f"(subida: {len(data) / rate:.2f}s)")
+        print(f"  columnas        : archivo completo {whole_columns:6.2f}s | por partes {parts_columns:6.2f}s")
+        print(f"  escaneo inicial : archivo completo {whole_scan:6.2f}s | por partes {parts_scan:6.2f}s | "
+              f"speedup: {whole_scan / parts_scan:4.2f}x")
+        print(f"  mismo resultado e índice: {identical}")
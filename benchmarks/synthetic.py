@@ -0,0 +1,66 @@
+'''
+Generador de bases sintéticas para los benchmarks.
+
+Produce archivos con la misma forma que las descargas de ICOMM ("Clientes País"):
+separador ';', columna `email` con el formato "<docnum>usuario@dominio" y las
+columnas multivalor EMIS_BANCOS, EMIS_TARJETAS, PLUS_PARTNER_COBRAND y
+PLUS_PARTNER_EMPRESAS separadas por coma.
+'''
+
+import os
+import sys
+
+import numpy as np
+import pandas as pd
+
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+BANCOS = ['AMEX_BANCO', 'BAPRO', 'BBVA', 'BNA', 'CIUDAD', 'GALICIA', 'HSBC', 'ICBC', 'ITAU', 'MACRO', 'NARANJA', 'SANTANDER', 'OTROS_BANCOS']
+TARJETAS = ['AMEX_NO_BANCO', 'MASTERCARD', 'NARANJA_AMEX', 'NARANJA_MASTERCARD', 'NARANJA_VISA', 'TUYA', 'VISA', 'OTRAS_TARJETAS']
+COBRANDS = ['AMEX', 'BAPRO', 'BNA', 'CREDICOOP', 'HIPOTECARIO', 'MACRO', 'MASTERCARD', 'VISA']
+PARTNERS = ['BOOKING', 'COMPUMUNDO', 'GARBARINO', 'IRSA', 'OTROS', 'SANCOR', 'YPF']
+
+def setup_app_path():
+    '''Permite importar `app` desde los benchmarks y resolver sus rutas relativas (config/, uploads/).'''
+    if ROOT_DIR not in sys.path:
+        sys.path.insert(0, ROOT_DIR)
+    os.chdir(ROOT_DIR)
+
+def _multi_value_column(rng, values, rows, max_items, empty_ratio):
+    '''Arma una columna con 0..max_items valores por celda separados por coma.'''
+    values = np.array(values)
+    counts = rng.integers(1, max_items + 1, size=rows)
+    counts[rng.random(rows) < empty_ratio] = 0
+    cells = []
+    for n in counts:
+        cells.append(','.join(rng.choice(values, size=n, replace=False)) if n else '')
+    return cells
+
+def generate_clientes_base(path, rows, seed=0, chunk_size=500000, extra_columns=0):
+    '''
+    Escribe en `path` una base sintética de `rows` filas, por bloques para no agotar la memoria.
+    `extra_columns` agrega columnas de texto de relleno (CAMPO_01, CAMPO_02, ...), como las
+    muchas columnas de atributos que traen las bases reales.
+    '''
+    rng = np.random.default_rng(seed)
+    written = 0
+    first = True
+    while written < rows:
+        n = min(chunk_size, rows - written)
+        ids = np.arange(written, written + n)
+        # Aproximadamente un 30% de emails repetidos entre filas
+        mailbox = rng.integers(0, max(1, int(rows * 0.7)), size=n)
+        df = pd.DataFrame({
+            'email': [f'<{i}>cliente{m}@correo.com' for i, m in zip(ids, mailbox)],
+            'NOMBRE': [f'nombre {i}' for i in ids],
+            'EMIS_BANCOS': _multi_value_column(rng, BANCOS, n, 3, 0.2),
+            'EMIS_TARJETAS': _multi_value_column(rng, TARJETAS, n, 3, 0.3),
+            'PLUS_PARTNER_COBRAND': _multi_value_column(rng, COBRANDS, n, 2, 0.6),
+            'PLUS_PARTNER_EMPRESAS': _multi_value_column(rng, PARTNERS, n, 2, 0.7),
+        })
+        for column in range(1, extra_columns + 1):
+            df[f'CAMPO_{column:02d}'] = [f'valor {column}-{v}' for v in rng.integers(0, 1000, size=n)]
+        df.to_csv(path, sep=';', index=False, mode='w' if first else 'a', header=first)
+        first = False
+        written += n
+    return path
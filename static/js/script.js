@@ -1,12 +1,16 @@
 document.addEventListener('DOMContentLoaded', () => {
+    // Primera parte de una subida por partes: alcanza para la cabecera y para detectar el formato
+    const FIRST_UPLOAD_PART_SIZE = 1024 * 1024;
+
     const App = {
         // --- STATE MANAGEMENT ---
         state: {
-            originalFilepath: '',
+            originalFilepath: '', // Ruta en el servidor (o promesa de la ruta, mientras se sube el resto del archivo)
             currentOrderedColumns: [],
             draggedItem: null,
             modalTimeout: null,
             needs_docnum_generation: false, // Flag para la nueva funcionalidad
+            preview: { mode: 'head', seed: 0 }, // Filas de la previsualización ('head', 'tail' o 'random')
 
             // --- Estado para Exportación Múltiple ---
             multiExportFile: null, // El objeto File seleccionado
@@ -21,9 +25,10 @@ document.addEventListener('DOMContentLoaded', () => {
 
             // --- Estado para CRM ---
             crmFile: null,
-            crmFilepath: '',
+            crmFilepath: '', // Igual que originalFilepath: puede ser una promesa mientras se sube el archivo
             crmSelectedColumns: [],
             crmSuggestedColumns: [],
+            crmPreview: { mode: 'head', seed: 0 },
         },
 
         // --- DOM ELEMENTS ---
@@ -41,6 +46,7 @@ document.addEventListener('DOMContentLoaded', () => {
             toggleSelectBtn: document.getElementById('toggle-select-btn'),
             previewSection: document.getElementById('preview-section'),
             previewTableContainer: document.getElementById('preview-table-container'),
+            previewModeSelect: document.getElementById('preview-mode-select'),
             backToColumnsBtn: document.getElementById('back-to-columns-btn'),
             searchColumnsInput: document.getElementById('search-columns'),
             reorderSection: document.getElementById('reorder-section'),
@@ -77,11 +83,15 @@ document.addEventListener('DOMContentLoaded', () => {
             multiCategorySelection: document.getElementById('multi-category-selection'), // Nuevo
             multiItemSelection: document.getElementById('multi-item-selection'), // Nuevo
             multiStartExportBtn: document.getElementById('multi-start-export-btn'), // Nuevo
+            multiSelectionSummary: document.getElementById('multi-selection-summary'),
             multiProcessingProgressSection: document.getElementById('multi-processing-progress-section'), // Nuevo
             multiProcessingProgress: document.getElementById('multi-processing-progress'), // Nuevo
             multiProcessingProgressText: document.getElementById('multi-processing-progress-text'), // Nuevo
             multiDownloadSection: document.getElementById('multi-download-section'),
             multiDownloadLink: document.getElementById('multi-download-link'),
+            multiFinalEmails: document.getElementById('multi-final-emails'),
+            multiFinalDuplicates: document.getElementById('multi-final-duplicates'),
+            multiFinalInvalid: document.getElementById('multi-final-invalid'),
 
             // --- Elementos para CRM ---
             crmUploadForm: document.getElementById('crm-upload-form'),
@@ -96,6 +106,7 @@ document.addEventListener('DOMContentLoaded', () => {
             crmBackToUploadBtn: document.getElementById('crm-back-to-upload-btn'),
             crmPreviewSection: document.getElementById('crm-preview-section'),
             crmPreviewList: document.getElementById('crm-preview-list'),
+            crmPreviewModeSelect: document.getElementById('crm-preview-mode-select'),
             crmStatTotal: document.getElementById('crm-stat-total'),
             crmStatUnique: document.getElementById('crm-stat-unique'),
             crmStatDuplicates: document.getElementById('crm-stat-duplicates'),
@@ -263,6 +274,12 @@ document.addEventListener('DOMContentLoaded', () => {
                 progressText.textContent = text;
             },
 
+            formatRowProgress(task) {
+                // ' · 12.345 de 200.000 filas' cuando la tarea informa la cantidad total de filas
+                if (task.processed_rows === undefined || task.total_rows == null) return '';
+                return ` · ${task.processed_rows.toLocaleString('es-AR')} de ${task.total_rows.toLocaleString('es-AR')} filas`;
+            },
+
             updateMultiExportProgress(progress, text) {
                 const { multiProcessingProgress, multiProcessingProgressText } = App.elements;
                 multiProcessingProgress.style.width = `${progress}%`;
@@ -353,20 +370,50 @@ document.addEventListener('DOMContentLoaded', () => {
 
         // --- API MODULE ---
         api: {
-            async getColumns(file) {
+            // Subida por partes: la primera parte va a `url`, que responde apenas leyó la cabecera
+            // (o inició el escaneo), y el resto se sube en segundo plano a /api/upload-part.
+            // Devuelve { data, uploaded }: `uploaded` resuelve con { filepath, columns } cuando
+            // llegó el archivo completo. onUploadProgress(progreso) recibe el porcentaje subido.
+            async uploadFile(url, file, errorMessage, onUploadProgress) {
                 const formData = new FormData();
-                formData.append('csv_file', file);
-                const response = await fetch('/api/get-columns', { method: 'POST', body: formData });
+                formData.append('csv_file', file.slice(0, FIRST_UPLOAD_PART_SIZE), file.name);
+                formData.append('total_size', file.size);
+                const response = await fetch(url, { method: 'POST', body: formData });
                 const data = await response.json();
-                if (!response.ok) throw new Error(data.error || 'Error del servidor.');
-                return data;
+                if (!response.ok) throw new Error(data.error || errorMessage);
+
+                const uploaded = data.upload_id
+                    ? App.api.uploadRemainingParts(data.upload_id, file, data.received, data.part_size, onUploadProgress)
+                    : Promise.resolve({ filepath: data.filepath, columns: data.columns });
+                return { data, uploaded };
+            },
+
+            async uploadRemainingParts(uploadId, file, offset, partSize, onUploadProgress) {
+                let result = {};
+                if (onUploadProgress) onUploadProgress(Math.round((offset / file.size) * 100));
+                while (offset < file.size) {
+                    const formData = new FormData();
+                    formData.append('upload_id', uploadId);
+                    formData.append('offset', offset);
+                    formData.append('part', file.slice(offset, offset + partSize));
+                    const response = await fetch('/api/upload-part', { method: 'POST', body: formData });
+                    result = await response.json();
+                    if (!response.ok) throw new Error(result.error || 'Error al subir el archivo.');
+                    offset = result.received;
+                    if (onUploadProgress) onUploadProgress(Math.round((offset / file.size) * 100));
+                }
+                return result;
             },
 
-            async previewFile(filepath, columns, needs_docnum_generation) {
+            async getColumns(file) {
+                return App.api.uploadFile('/api/get-columns', file, 'Error del servidor.');
+            },
+
+            async previewFile(filepath, columns, needs_docnum_generation, sample = {}) {
                 const response = await fetch('/api/preview-file', {
                     method: 'POST',
                     headers: { 'Content-Type': 'application/json' },
-                    body: JSON.stringify({ filepath, columns, needs_docnum_generation }),
+                    body: JSON.stringify({ filepath, columns, needs_docnum_generation, ...sample }),
                 });
                 const data = await response.json();
                 if (!response.ok) throw new Error(data.error || 'Error en la previsualización.');
@@ -391,46 +438,59 @@ document.addEventListener('DOMContentLoaded', () => {
                 return data;
             },
 
-            // --- Nuevas funciones para Exportación Múltiple ---
-            async multiExportInitialProcess(file, progressCallback) {
+            // Sigue el progreso de una tarea hasta que termina. Usa Server-Sent Events y,
+            // si el navegador no los soporta o la conexión se corta, vuelve al sondeo.
+            // Resuelve con los datos finales de la tarea o rechaza con su error.
+            // onProgress(progreso, estado completo de la tarea)
+            watchProgress(taskId, onProgress) {
                 return new Promise((resolve, reject) => {
-                    const formData = new FormData();
-                    formData.append('csv_file', file);
-
-                    const xhr = new XMLHttpRequest();
-
-                    xhr.open('POST', '/api/multi-export-initial-process', true);
-
-                    xhr.upload.onprogress = (event) => {
-                        if (event.lengthComputable) {
-                            const progress = Math.round((event.loaded / event.total) * 100);
-                            if (progressCallback) {
-                                progressCallback(progress);
-                            }
+                    const handleUpdate = (progressData) => {
+                        if (progressData.status === 'complete') {
+                            resolve(progressData);
+                            return true;
                         }
+                        if (progressData.status === 'error') {
+                            reject(new Error(progressData.error));
+                            return true;
+                        }
+                        onProgress(progressData.progress || 0, progressData);
+                        return false;
                     };
 
-                    xhr.onload = () => {
-                        if (xhr.status >= 200 && xhr.status < 300) {
-                            resolve(JSON.parse(xhr.responseText));
-                        } else {
+                    const startPolling = () => {
+                        const pollInterval = setInterval(async () => {
                             try {
-                                const data = JSON.parse(xhr.responseText);
-                                reject(new Error(data.error || 'Error en el procesamiento inicial de exportación múltiple.'));
-                            } catch (e) {
-                                reject(new Error('Error en el procesamiento inicial de exportación múltiple.'));
+                                const progressData = await App.api.checkProgress(taskId);
+                                if (handleUpdate(progressData)) clearInterval(pollInterval);
+                            } catch (pollError) {
+                                clearInterval(pollInterval);
+                                reject(pollError);
                             }
-                        }
+                        }, 2000);
                     };
 
-                    xhr.onerror = () => {
-                        reject(new Error('Error de red al intentar procesar el archivo.'));
-                    };
+                    if (!window.EventSource) {
+                        startPolling();
+                        return;
+                    }
 
-                    xhr.send(formData);
+                    const source = new EventSource(`/api/progress/${taskId}/stream`);
+                    source.onmessage = (event) => {
+                        if (handleUpdate(JSON.parse(event.data))) source.close();
+                    };
+                    source.onerror = () => {
+                        source.close();
+                        startPolling();
+                    };
                 });
             },
 
+            // --- Nuevas funciones para Exportación Múltiple ---
+            async multiExportInitialProcess(file, progressCallback) {
+                return App.api.uploadFile('/api/multi-export-initial-process', file,
+                    'Error en el procesamiento inicial de exportación múltiple.', progressCallback);
+            },
+
             async multiExportProcess(filepath, selectedItems) {
                 const response = await fetch('/api/multi-export-process', {
                     method: 'POST',
@@ -442,21 +502,27 @@ document.addEventListener('DOMContentLoaded', () => {
                 return data;
             },
 
-            // --- Funciones API para CRM ---
-            async crmGetColumns(file) {
-                const formData = new FormData();
-                formData.append('csv_file', file);
-                const response = await fetch('/api/crm-get-columns', { method: 'POST', body: formData });
+            async multiExportSegmentCounts(filepath, selectedItems) {
+                const response = await fetch('/api/multi-export-segment-counts', {
+                    method: 'POST',
+                    headers: { 'Content-Type': 'application/json' },
+                    body: JSON.stringify({ filepath, selected_items: selectedItems }),
+                });
                 const data = await response.json();
-                if (!response.ok) throw new Error(data.error || 'Error al obtener columnas del CRM.');
+                if (!response.ok) throw new Error(data.error || 'Error al obtener los conteos de la selección.');
                 return data;
             },
 
-            async crmPreview(filepath, columns) {
+            // --- Funciones API para CRM ---
+            async crmGetColumns(file) {
+                return App.api.uploadFile('/api/crm-get-columns', file, 'Error al obtener columnas del CRM.');
+            },
+
+            async crmPreview(filepath, columns, sample = {}) {
                 const response = await fetch('/api/crm-preview', {
                     method: 'POST',
                     headers: { 'Content-Type': 'application/json' },
-                    body: JSON.stringify({ filepath, columns }),
+                    body: JSON.stringify({ filepath, columns, ...sample }),
                 });
                 const data = await response.json();
                 if (!response.ok) throw new Error(data.error || 'Error en la previsualización CRM.');
@@ -484,6 +550,7 @@ document.addEventListener('DOMContentLoaded', () => {
                 elements.searchColumnsInput.addEventListener('input', handlers.handleSearch);
                 elements.previewBtn.addEventListener('click', handlers.handlePreview);
                 elements.confirmReorderBtn.addEventListener('click', handlers.handleConfirmReorder);
+                elements.previewModeSelect.addEventListener('change', handlers.handlePreviewModeChange);
                 elements.processBtn.addEventListener('click', handlers.handleProcess);
                 elements.backToColumnsBtn.addEventListener('click', () => App.ui.showSection('columnsSection'));
                 elements.backToSelectionBtn.addEventListener('click', () => App.ui.showSection('columnsSection'));
@@ -510,6 +577,7 @@ document.addEventListener('DOMContentLoaded', () => {
                     elements.crmCsvFileInput.addEventListener('change', handlers.handleCrmFileSelect);
                     elements.crmUploadBtn.addEventListener('click', handlers.handleCrmUpload);
                     elements.crmPreviewBtn.addEventListener('click', handlers.handleCrmPreview);
+                    elements.crmPreviewModeSelect.addEventListener('change', handlers.handleCrmPreviewModeChange);
                     elements.crmBackToUploadBtn.addEventListener('click', handlers.handleCrmBackToUpload);
                     elements.crmBackToColumnsBtn.addEventListener('click', handlers.handleCrmBackToColumns);
                     elements.crmProcessBtn.addEventListener('click', handlers.handleCrmProcess);
@@ -618,8 +686,10 @@ document.addEventListener('DOMContentLoaded', () => {
                 elements.notificationArea.classList.remove('notification-warning'); // Limpiar clase
 
                 try {
-                    const data = await App.api.getColumns(file);
-                    state.originalFilepath = data.filepath;
+                    const { data, uploaded } = await App.api.getColumns(file);
+                    // Las columnas llegan con la primera parte; la ruta, cuando termina de subirse el archivo
+                    state.originalFilepath = uploaded.then(result => result.filepath);
+                    state.originalFilepath.catch(error => ui.showModal(error.message, 'error'));
                     state.needs_docnum_generation = data.needs_docnum_generation;
 
                     if (state.needs_docnum_generation) {
@@ -673,7 +743,7 @@ document.addEventListener('DOMContentLoaded', () => {
                         ui.populateReorderList(selectedColumns);
                         ui.showSection('reorderSection');
                     } else {
-                        const data = await api.previewFile(state.originalFilepath, selectedColumns, state.needs_docnum_generation);
+                        const data = await api.previewFile(await state.originalFilepath, selectedColumns, state.needs_docnum_generation, state.preview);
                         state.currentOrderedColumns = data.columns;
                         ui.displayPreview(data.preview, data.columns);
                         ui.showSection('previewSection');
@@ -685,12 +755,24 @@ document.addEventListener('DOMContentLoaded', () => {
                 }
             },
 
+            async handlePreviewModeChange(event) {
+                // Las muestras se cachean en el servidor, así que solo la primera vez se lee el archivo
+                const { elements, ui, state, api } = App;
+                state.preview = { mode: event.target.value, seed: Math.floor(Math.random() * 1e9) };
+                try {
+                    const data = await api.previewFile(await state.originalFilepath, state.currentOrderedColumns, state.needs_docnum_generation, state.preview);
+                    ui.displayPreview(data.preview, data.columns);
+                } catch (error) {
+                    ui.showModal(error.message, 'error');
+                }
+            },
+
             async handleConfirmReorder() {
                 const { elements, ui, state, api } = App;
                 const finalOrderedColumns = Array.from(elements.reorderColumnsList.children).map(item => item.querySelector('label').textContent);
                 ui.setLoading(elements.confirmReorderBtn, 'Cargando...');
                 try {
-                    const data = await api.previewFile(state.originalFilepath, finalOrderedColumns, state.needs_docnum_generation);
+                    const data = await api.previewFile(await state.originalFilepath, finalOrderedColumns, state.needs_docnum_generation, state.preview);
                     state.currentOrderedColumns = data.columns;
                     ui.displayPreview(data.preview, data.columns);
                     ui.showSection('previewSection');
@@ -712,37 +794,25 @@ document.addEventListener('DOMContentLoaded', () => {
                 ui.updateProgress(0, 'Iniciando...');
 
                 try {
-                    const { task_id } = await api.processFile(state.originalFilepath, state.currentOrderedColumns, state.needs_docnum_generation);
+                    const { task_id } = await api.processFile(await state.originalFilepath, state.currentOrderedColumns, state.needs_docnum_generation);
                     ui.updateProgress(0, 'Preparando el archivo...');
 
-                    const pollInterval = setInterval(async () => {
-                        try {
-                            const progressData = await api.checkProgress(task_id);
-                            if (progressData.status === 'processing') {
-                                ui.updateProgress(progressData.progress, `Procesando... (${progressData.progress}%)`);
-                            } else if (progressData.status === 'complete') {
-                                clearInterval(pollInterval);
-                                ui.updateProgress(100, '¡Completado!');
-                                elements.downloadLink.href = progressData.result;
-
-                                if (progressData.processed_rows !== undefined) {
-                                    elements.processedCount.textContent = `Total de registros: ${progressData.processed_rows.toLocaleString('es-AR')}`;
-                                } else {
-                                    elements.processedCount.textContent = '';
-                                }
-
-                                ui.showSection('downloadSection');
-                                ui.showModal('¡Archivo procesado con éxito!', 'success');
-                                ui.resetLoading(elements.processBtn);
-                            } else if (progressData.status === 'error') {
-                                clearInterval(pollInterval);
-                                throw new Error(progressData.error);
-                            }
-                        } catch (pollError) {
-                            clearInterval(pollInterval);
-                            throw pollError;
-                        }
-                    }, 2000);
+                    const progressData = await api.watchProgress(task_id, (progress, task) => {
+                        ui.updateProgress(progress, `Procesando... (${progress}%)${ui.formatRowProgress(task)}`);
+                    });
+
+                    ui.updateProgress(100, '¡Completado!');
+                    elements.downloadLink.href = progressData.result;
+
+                    if (progressData.processed_rows !== undefined) {
+                        elements.processedCount.textContent = `Total de registros: ${progressData.processed_rows.toLocaleString('es-AR')}`;
+                    } else {
+                        elements.processedCount.textContent = '';
+                    }
+
+                    ui.showSection('downloadSection');
+                    ui.showModal('¡Archivo procesado con éxito!', 'success');
+                    ui.resetLoading(elements.processBtn);
                 } catch (error) {
                     ui.showSection('previewSection');
                     ui.showModal(error.message, 'error');
@@ -815,52 +885,42 @@ document.addEventListener('DOMContentLoaded', () => {
                 elements.multiUploadProgress.textContent = '0%';
 
                 try {
-                    const data = await api.multiExportInitialProcess(file, (progress) => {
+                    const { data, uploaded } = await api.multiExportInitialProcess(file, (progress) => {
                         elements.multiUploadProgress.style.width = `${progress}%`;
                         elements.multiUploadProgress.textContent = `${progress}%`;
                         elements.multiUploadProgressText.textContent = `Subiendo archivo... (${progress}%)`;
                     });
-                    ui.showModal('Archivo subido. Procesando datos iniciales...', 'info');
+                    ui.showModal('Procesando datos iniciales mientras se sube el archivo...', 'info');
 
-                    // Show initial processing progress bar
-                    elements.multiUploadProgressSection.classList.add('hidden');
+                    // El escaneo avanza a medida que llegan las partes: se muestran las dos barras
                     elements.multiInitialProcessingProgressSection.classList.remove('hidden');
                     elements.multiInitialProcessingProgress.style.width = '0%';
                     elements.multiInitialProcessingProgress.textContent = '0%';
                     elements.multiInitialProcessingProgressText.textContent = 'Procesando archivo...';
-
-                    const pollInterval = setInterval(async () => {
-                        try {
-                            const progressData = await api.checkProgress(data.task_id);
-                            if (progressData.status === 'processing') {
-                                const progress = progressData.progress || 0;
-                                elements.multiInitialProcessingProgress.style.width = `${progress}%`;
-                                elements.multiInitialProcessingProgress.textContent = `${progress}%`;
-                                elements.multiInitialProcessingProgressText.textContent = `Procesando archivo... (${progress}%)`;
-                            } else if (progressData.status === 'complete') {
-                                clearInterval(pollInterval);
-                                elements.multiInitialProcessingProgress.style.width = '100%';
-                                elements.multiInitialProcessingProgress.textContent = '100%';
-                                elements.multiInitialProcessingProgressText.textContent = '¡Procesamiento completado!';
-
-                                state.multiExportFilepath = progressData.result.filepath;
-                                state.multiExportUniqueData = progressData.result.unique_data;
-
-                                ui.populateMultiExportSelection(progressData.result.unique_data);
-                                ui.showSection('multiSelectionSection');
-                                ui.showModal('Datos iniciales procesados con éxito.', 'success');
-
-                                setTimeout(() => {
-                                    elements.multiInitialProcessingProgressSection.classList.add('hidden');
-                                }, 2000);
-                            } else if (progressData.status === 'error') {
-                                clearInterval(pollInterval);
-                                throw new Error(progressData.error);
-                            }
-                        } catch (pollError) {
-                            clearInterval(pollInterval);
-                            throw pollError;
-                        }
+                    uploaded.then(() => elements.multiUploadProgressSection.classList.add('hidden'), () => {});
+
+                    const [progressData] = await Promise.all([
+                        api.watchProgress(data.task_id, (progress) => {
+                            elements.multiInitialProcessingProgress.style.width = `${progress}%`;
+                            elements.multiInitialProcessingProgress.textContent = `${progress}%`;
+                            elements.multiInitialProcessingProgressText.textContent = `Procesando archivo... (${progress}%)`;
+                        }),
+                        uploaded,
+                    ]);
+
+                    elements.multiInitialProcessingProgress.style.width = '100%';
+                    elements.multiInitialProcessingProgress.textContent = '100%';
+                    elements.multiInitialProcessingProgressText.textContent = '¡Procesamiento completado!';
+
+                    state.multiExportFilepath = progressData.result.filepath;
+                    state.multiExportUniqueData = progressData.result.unique_data;
+
+                    ui.populateMultiExportSelection(progressData.result.unique_data);
+                    ui.showSection('multiSelectionSection');
+                    ui.showModal('Datos iniciales procesados con éxito.', 'success');
+
+                    setTimeout(() => {
+                        elements.multiInitialProcessingProgressSection.classList.add('hidden');
                     }, 2000);
                 } catch (error) {
                     ui.showModal(error.message, 'error');
@@ -909,6 +969,25 @@ document.addEventListener('DOMContentLoaded', () => {
                 const { multiExportSelectedItems } = App.state;
                 const hasSelections = Object.values(multiExportSelectedItems).some(arr => arr.length > 0);
                 multiStartExportBtn.disabled = !hasSelections;
+                App.handlers.updateMultiSelectionSummary(hasSelections);
+            },
+
+            async updateMultiSelectionSummary(hasSelections) {
+                // Muestra cuántas filas entran en la exportación, según los bitmaps del índice (si existe)
+                const { multiSelectionSummary } = App.elements;
+                const { multiExportFilepath, multiExportSelectedItems } = App.state;
+                if (!hasSelections) {
+                    multiSelectionSummary.classList.add('hidden');
+                    return;
+                }
+                try {
+                    const data = await App.api.multiExportSegmentCounts(multiExportFilepath, multiExportSelectedItems);
+                    const format = n => n.toLocaleString('es-AR');
+                    multiSelectionSummary.textContent = `Filas a exportar: ${format(data.union)} de ${format(data.total_rows)} · Cumplen todas las categorías elegidas: ${format(data.segment)}`;
+                    multiSelectionSummary.classList.remove('hidden');
+                } catch (error) {
+                    multiSelectionSummary.classList.add('hidden');
+                }
             },
 
 
@@ -935,27 +1014,20 @@ document.addEventListener('DOMContentLoaded', () => {
                     const { task_id } = await api.multiExportProcess(filepath, selectedItems);
                     ui.updateMultiExportProgress(0, 'Procesando archivo...');
 
-                    const pollInterval = setInterval(async () => {
-                        try {
-                            const progressData = await api.checkProgress(task_id);
-                            if (progressData.status === 'processing') {
-                                ui.updateMultiExportProgress(progressData.progress, `Procesando... (${progressData.progress}%)`);
-                            } else if (progressData.status === 'complete') {
-                                clearInterval(pollInterval);
-                                ui.updateMultiExportProgress(100, '¡Completado!');
-                                elements.multiDownloadLink.href = progressData.result;
-                                ui.showSection('multiDownloadSection');
-                                ui.showModal('¡Archivos de exportación múltiple generados con éxito!', 'success');
-                                ui.resetLoading(elements.multiStartExportBtn);
-                            } else if (progressData.status === 'error') {
-                                clearInterval(pollInterval);
-                                throw new Error(progressData.error);
-                            }
-                        } catch (pollError) {
-                            clearInterval(pollInterval);
-                            throw pollError;
-                        }
-                    }, 2000);
+                    const progressData = await api.watchProgress(task_id, (progress) => {
+                        ui.updateMultiExportProgress(progress, `Procesando... (${progress}%)`);
+                    });
+
+                    ui.updateMultiExportProgress(100, '¡Completado!');
+                    elements.multiDownloadLink.href = progressData.result;
+                    if (progressData.stats) {
+                        elements.multiFinalEmails.textContent = progressData.stats.final.toLocaleString('es-AR');
+                        elements.multiFinalDuplicates.textContent = progressData.stats.duplicates.toLocaleString('es-AR');
+                        elements.multiFinalInvalid.textContent = progressData.stats.invalid.toLocaleString('es-AR');
+                    }
+                    ui.showSection('multiDownloadSection');
+                    ui.showModal('¡Archivos de exportación múltiple generados con éxito!', 'success');
+                    ui.resetLoading(elements.multiStartExportBtn);
                 } catch (error) {
                     ui.showSection('multiSelectionSection'); // Go back to selection on error
                     ui.showModal(error.message, 'error');
@@ -997,8 +1069,9 @@ document.addEventListener('DOMContentLoaded', () => {
                 ui.setLoading(elements.crmUploadBtn, 'Cargando...');
 
                 try {
-                    const data = await api.crmGetColumns(file);
-                    state.crmFilepath = data.filepath;
+                    const { data, uploaded } = await api.crmGetColumns(file);
+                    state.crmFilepath = uploaded.then(result => result.filepath);
+                    state.crmFilepath.catch(error => ui.showModal(error.message, 'error'));
                     state.crmSuggestedColumns = data.suggested_columns;
                     state.crmSelectedColumns = [...data.suggested_columns]; // Pre-select suggested
 
@@ -1101,7 +1174,7 @@ document.addEventListener('DOMContentLoaded', () => {
                 ui.setLoading(elements.crmPreviewBtn, 'Cargando...');
 
                 try {
-                    const data = await api.crmPreview(state.crmFilepath, state.crmSelectedColumns);
+                    const data = await api.crmPreview(await state.crmFilepath, state.crmSelectedColumns, state.crmPreview);
 
                     // Update preview list
                     elements.crmPreviewList.innerHTML = '';
@@ -1128,6 +1201,11 @@ document.addEventListener('DOMContentLoaded', () => {
                 }
             },
 
+            handleCrmPreviewModeChange(event) {
+                App.state.crmPreview = { mode: event.target.value, seed: Math.floor(Math.random() * 1e9) };
+                App.handlers.handleCrmPreview();
+            },
+
             handleCrmBackToUpload() {
                 const { elements, state } = App;
                 elements.crmColumnsSection.classList.add('hidden');
@@ -1159,51 +1237,39 @@ document.addEventListener('DOMContentLoaded', () => {
                 elements.crmProgressText.textContent = 'Iniciando...';
 
                 try {
-                    const { task_id } = await api.crmProcess(state.crmFilepath, state.crmSelectedColumns);
-
-                    const pollInterval = setInterval(async () => {
-                        try {
-                            const progressData = await api.checkProgress(task_id);
-                            if (progressData.status === 'processing') {
-                                elements.crmProgress.style.width = `${progressData.progress}%`;
-                                elements.crmProgress.textContent = `${progressData.progress}%`;
-                                elements.crmProgressText.textContent = `Procesando... (${progressData.progress}%)`;
-                            } else if (progressData.status === 'complete') {
-                                clearInterval(pollInterval);
-                                elements.crmProgress.style.width = '100%';
-                                elements.crmProgress.textContent = '100%';
-                                elements.crmProgressText.textContent = '¡Completado!';
-
-                                // Update final stats
-                                if (progressData.stats) {
-                                    elements.crmFinalUnique.textContent = progressData.stats.total_unique.toLocaleString('es-AR');
-                                    elements.crmFinalDuplicates.textContent = progressData.stats.duplicates.toLocaleString('es-AR');
-                                    elements.crmFinalInvalid.textContent = progressData.stats.invalid.toLocaleString('es-AR');
-                                }
-
-                                elements.crmDownloadLink.href = progressData.result;
-
-                                // Mostrar botón de inválidos si hay
-                                if (progressData.invalid_result) {
-                                    elements.crmDownloadInvalidLink.href = progressData.invalid_result;
-                                    elements.crmDownloadInvalidLink.classList.remove('hidden');
-                                } else {
-                                    elements.crmDownloadInvalidLink.classList.add('hidden');
-                                }
-
-                                elements.crmProgressSection.classList.add('hidden');
-                                elements.crmDownloadSection.classList.remove('hidden');
-                                ui.showModal('¡Emails consolidados con éxito!', 'success');
-                                ui.resetLoading(elements.crmProcessBtn);
-                            } else if (progressData.status === 'error') {
-                                clearInterval(pollInterval);
-                                throw new Error(progressData.error);
-                            }
-                        } catch (pollError) {
-                            clearInterval(pollInterval);
-                            throw pollError;
-                        }
-                    }, 2000);
+                    const { task_id } = await api.crmProcess(await state.crmFilepath, state.crmSelectedColumns);
+
+                    const progressData = await api.watchProgress(task_id, (progress, task) => {
+                        elements.crmProgress.style.width = `${progress}%`;
+                        elements.crmProgress.textContent = `${progress}%`;
+                        elements.crmProgressText.textContent = `Procesando... (${progress}%)${ui.formatRowProgress(task)}`;
+                    });
+
+                    elements.crmProgress.style.width = '100%';
+                    elements.crmProgress.textContent = '100%';
+                    elements.crmProgressText.textContent = '¡Completado!';
+
+                    // Update final stats
+                    if (progressData.stats) {
+                        elements.crmFinalUnique.textContent = progressData.stats.total_unique.toLocaleString('es-AR');
+                        elements.crmFinalDuplicates.textContent = progressData.stats.duplicates.toLocaleString('es-AR');
+                        elements.crmFinalInvalid.textContent = progressData.stats.invalid.toLocaleString('es-AR');
+                    }
+
+                    elements.crmDownloadLink.href = progressData.result;
+
+                    // Mostrar botón de inválidos si hay
+                    if (progressData.invalid_result) {
+                        elements.crmDownloadInvalidLink.href = progressData.invalid_result;
+                        elements.crmDownloadInvalidLink.classList.remove('hidden');
+                    } else {
+                        elements.crmDownloadInvalidLink.classList.add('hidden');
+                    }
+
+                    elements.crmProgressSection.classList.add('hidden');
+                    elements.crmDownloadSection.classList.remove('hidden');
+                    ui.showModal('¡Emails consolidados con éxito!', 'success');
+                    ui.resetLoading(elements.crmProcessBtn);
                 } catch (error) {
                     elements.crmProgressSection.classList.add('hidden');
                     elements.crmPreviewSection.classList.remove('hidden');
@@ -0,0 +1,83 @@
+'''
+Fixtures de las pruebas: cada prueba usa una carpeta temporal para uploads/, downloads/, la base de
+tareas y los catálogos de entidades conocidas, así que no toca los archivos del proyecto.
+
+Para ejecutarlas (desde la raíz del proyecto):
+    python -m pytest tests
+'''
+
+import os
+import shutil
+import sys
+
+import pytest
+
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if ROOT_DIR not in sys.path:
+    sys.path.insert(0, ROOT_DIR)
+
+import app  # noqa: E402
+
+BANCOS = ['BBVA', 'GALICIA', 'MACRO', 'SANTANDER', 'OTROS_BANCOS']
+TARJETAS = ['MASTERCARD', 'VISA', 'OTRAS_TARJETAS']
+COBRANDS = ['AMEX', 'BNA']
+PARTNERS = ['BOOKING', 'YPF']
+
+def write_clientes_base(path, rows, separator=';'):
+    '''
+    Base chica con la forma de las descargas de ICOMM: email "<docnum>usuario@dominio" (con
+    repetidos, vacíos y valores sin '@') y columnas multivalor separadas por coma.
+    '''
+    lines = [separator.join(['email', 'NOMBRE', 'EMIS_BANCOS', 'EMIS_TARJETAS', 'PLUS_PARTNER_COBRAND', 'PLUS_PARTNER_EMPRESAS'])]
+    for i in range(rows):
+        if i % 17 == 5:
+            email = ''
+        elif i % 23 == 7:
+            email = f'<{i}>sin-arroba'
+        else:
+            email = f'<{i}>cliente{i % 41}@correo.com'
+        bancos = ','.join(BANCOS[(i + k) % len(BANCOS)] for k in range(i % 3))
+        tarjetas = ', '.join(TARJETAS[(i + k) % len(TARJETAS)] for k in range(i * 7 % 3))
+        cobrand = COBRANDS[i % 2] if i % 5 == 0 else ''
+        partner = PARTNERS[i % 2] if i % 7 == 0 else ''
+        name = f'"nombre {i}{separator} con separador"' if i % 11 == 0 else f'nombre {i}'
+        lines.append(separator.join([email, name, f'"{bancos}"' if ',' in bancos else bancos,
+                                     f'"{tarjetas}"' if ',' in tarjetas else tarjetas, cobrand, partner]))
+    with open(path, 'w', encoding='utf-8', newline='') as f:
+        f.write('\n'.join(lines) + '\n')
+    return path
+
+@pytest.fixture(autouse=True)
+def isolated_app(tmp_path, monkeypatch):
+    '''Configuración de la aplicación apuntando a una carpeta temporal, restaurada al terminar.'''
+    config = dict(app.app.config)
+    for folder in ('uploads', 'downloads', 'config'):
+        os.makedirs(tmp_path / folder)
+    app.app.config.update({
+        'UPLOAD_FOLDER': str(tmp_path / 'uploads'),
+        'DOWNLOAD_FOLDER': str(tmp_path / 'downloads'),
+        'COLUMNAR_SIDECAR': False,
+        'CHUNK_SIZE': 50,
+    })
+    monkeypatch.setattr(app, 'job_store', app.JobStore(str(tmp_path / 'jobs.db'), app.app.config['JOB_TTL_SECONDS']))
+
+    categories = []
+    for category, column, prefix, config_path in app.MULTI_EXPORT_CATEGORIES:
+        catalog_path = str(tmp_path / config_path)
+        shutil.copyfile(os.path.join(ROOT_DIR, config_path), catalog_path)
+        categories.append((category, column, prefix, catalog_path))
+    monkeypatch.setattr(app, 'entity_catalog', app.EntityCatalog(categories))
+    yield tmp_path
+    app.app.config.clear()
+    app.app.config.update(config)
+
+@pytest.fixture
+def clientes_base(tmp_path):
+    '''Base de 400 filas, ya en la caché de uploads (como la dejan las rutas).'''
+    return app.cache_local_file(write_clientes_base(str(tmp_path / 'base.csv'), 400))
+
+def run_task(job_type, target, *args):
+    '''Ejecuta una tarea en el hilo actual y devuelve su estado final.'''
+    task_id = app.job_store.create(job_type)
+    target(task_id, *args)
+    return app.job_store.get(task_id)
@@ -0,0 +1,57 @@
+'''Modo batch: cada archivo deja sus salidas en su propia carpeta y no se pisan entre sí.'''
+
+import gzip
+import os
+import shutil
+import subprocess
+import sys
+
+import app
+import batch
+from conftest import write_clientes_base
+
+def test_same_name_in_different_folders(tmp_path):
+    for folder in ('x', 'y'):
+        os.makedirs(tmp_path / 'crm' / folder)
+        write_clientes_base(str(tmp_path / 'crm' / folder / 'base.csv'), 100 if folder == 'x' else 150)
+    salida = str(tmp_path / 'salida')
+
+    assert batch.main(['limpiar', str(tmp_path / 'crm' / '*' / 'base.csv'), '--columnas', 'email', '--salida', salida]) == 0
+    for folder, rows in (('x', 100), ('y', 150)):
+        with open(os.path.join(salida, folder, 'base_limpio.csv'), encoding='utf-8') as f:
+            assert sum(1 for _ in f) == rows + 1
+
+def test_colliding_outputs_are_rejected(tmp_path, capsys):
+    # a.csv y a.csv.gz generan los dos a_limpio.csv
+    with open(write_clientes_base(str(tmp_path / 'a.csv'), 50), 'rb') as src, gzip.open(tmp_path / 'a.csv.gz', 'wb') as dst:
+        shutil.copyfileobj(src, dst)
+    salida = str(tmp_path / 'salida')
+
+    assert batch.main(['limpiar', str(tmp_path / 'a.csv'), str(tmp_path / 'a.csv.gz'), '--columnas', 'email', '--salida', salida]) == 2
+    assert 'a.csv.gz' in capsys.readouterr().err
+    assert not os.path.exists(salida)
+
+def test_import_and_main_keep_the_working_directory(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    imported = subprocess.run([sys.executable, '-c', 'import os, batch; print(os.getcwd())'], cwd=tmp_path,
+                              env={**os.environ, 'PYTHONPATH': batch.ROOT_DIR}, capture_output=True, text=True, check=True)
+    assert imported.stdout.strip() == str(tmp_path)
+
+    write_clientes_base(str(tmp_path / 'base.csv'), 50)
+    config = dict(app.app.config)
+    assert batch.main(['limpiar', 'base.csv', '--columnas', 'email', '--salida', 'salida', '--compresion-zip', '0']) == 0
+    assert os.getcwd() == str(tmp_path)
+    assert os.path.exists(tmp_path / 'salida' / 'base_limpio.csv')
+    assert dict(app.app.config) == config
+
+def test_inputs_are_not_cached_or_removed(tmp_path):
+    base = write_clientes_base(str(tmp_path / 'base.csv'), 50)
+    salida = str(tmp_path / 'salida')
+    assert batch.main(['exportar', base, '--salida', salida]) == 0
+    assert os.path.exists(base)
+    assert os.path.exists(os.path.join(salida, 'base_exportacion_multiple.zip'))
+    assert os.listdir(app.app.config['UPLOAD_FOLDER']) == []
+
+    assert batch.main(['exportar', base, '--salida', salida, '--cache']) == 0
+    assert os.path.exists(base)
+    assert len(os.listdir(app.app.config['UPLOAD_FOLDER'])) == 1
@@ -0,0 +1,48 @@
+'''Catálogos de entidades conocidas: solo cambian a propósito y no se pierden entidades entre procesos.'''
+
+import multiprocessing
+
+import app
+from conftest import run_task
+
+def read_catalog(category):
+    with open(app.entity_catalog._paths[category], encoding='utf-8') as f:
+        return [line.strip() for line in f if line.strip()]
+
+def test_scan_does_not_change_catalogs_by_default(tmp_path):
+    path = tmp_path / 'nuevas.csv'
+    path.write_text('email;EMIS_BANCOS;EMIS_TARJETAS;PLUS_PARTNER_COBRAND;PLUS_PARTNER_EMPRESAS\n'
+                    '<1>a@b.com;BANCO NUEVO;VISA;;\n', encoding='utf-8')
+    before = {category: read_catalog(category) for category in app.entity_catalog._paths}
+    task = run_task('multi_export_scan', app.multi_export_initial_process_task, app.cache_local_file(str(path)))
+    assert task['status'] == 'complete', task.get('error')
+    assert 'BANCO NUEVO' in task['result']['unique_data']['bancos']
+    assert {category: read_catalog(category) for category in app.entity_catalog._paths} == before
+
+def test_merge_adds_new_entities_once():
+    assert app.entity_catalog.merge({'bancos': ['BANCO NUEVO', 'OTROS_BANCOS', '']}) == {'bancos': ['BANCO NUEVO']}
+    assert app.entity_catalog.merge({'bancos': ['BANCO NUEVO']}) == {}
+    assert 'BANCO NUEVO' in app.load_known_entities()['bancos']
+
+def test_merges_from_another_catalog_are_kept():
+    # Otro proceso con su propia copia en memoria agrega entre la lectura de este y su merge
+    other = app.EntityCatalog([(category, None, None, path) for category, path in app.entity_catalog._paths.items()])
+    app.entity_catalog.get()
+    other.merge({'tarjetas': ['TARJETA A']})
+    app.entity_catalog.merge({'tarjetas': ['TARJETA B']})
+    assert {'TARJETA A', 'TARJETA B'} <= set(read_catalog('tarjetas'))
+
+def merge_many(paths, prefix):
+    catalog = app.EntityCatalog([(category, None, None, path) for category, path in paths.items()])
+    for i in range(20):
+        catalog.merge({'bancos': [f'{prefix} {i}']})
+
+def test_concurrent_processes_keep_every_entity():
+    paths = dict(app.entity_catalog._paths)
+    processes = [multiprocessing.Process(target=merge_many, args=(paths, f'BANCO {n}')) for n in range(3)]
+    for process in processes:
+        process.start()
+    for process in processes:
+        process.join(60)
+    banks = set(read_catalog('bancos'))
+    assert all(f'BANCO {n} {i}' in banks for n in range(3) for i in range(20))
@@ -0,0 +1,97 @@
+'''"Limpiar Base": la salida de todos los modos es idéntica a la de la implementación original.'''
+
+import gzip
+import os
+import shutil
+import threading
+
+import pandas as pd
+import pytest
+
+import app
+from conftest import run_task
+
+SELECTED_COLUMNS = ['email', 'docnum', 'NOMBRE', 'EMIS_BANCOS']
+
+def legacy_clean(filepath, selected_columns, needs_docnum_generation, output_path):
+    '''Implementación original de `process_csv_task` (chunks de pandas con `to_csv` en modo append).'''
+    cols_to_read = [column for column in selected_columns if not (needs_docnum_generation and column == 'docnum')]
+    first_chunk = True
+    for chunk in pd.read_csv(filepath, usecols=cols_to_read, chunksize=app.app.config['CHUNK_SIZE'], sep=';'):
+        chunk = app.process_dataframe_logic(chunk, needs_docnum_generation)
+        chunk.columns = [column.lower() for column in chunk.columns]
+        chunk = app.reorder_chunk_columns(chunk, selected_columns)
+        chunk.to_csv(output_path, index=False, mode='w' if first_chunk else 'a', header=first_chunk)
+        first_chunk = False
+
+def read_bytes(path):
+    with app.open_csv_file(path) as f:
+        return f.read()
+
+@pytest.fixture
+def reference(clientes_base, tmp_path):
+    path = str(tmp_path / 'referencia.csv')
+    legacy_clean(clientes_base, SELECTED_COLUMNS, True, path)
+    return read_bytes(path)
+
+def clean(filepath, output_name):
+    output_path = os.path.join(app.app.config['DOWNLOAD_FOLDER'], output_name)
+    task = run_task('clean', app.process_csv_task, filepath, SELECTED_COLUMNS, True, output_path)
+    assert task['status'] == 'complete', task.get('error')
+    assert task['processed_rows'] == 400
+    return output_path
+
+def test_serial_matches_legacy(clientes_base, reference):
+    assert read_bytes(clean(clientes_base, 'limpio.csv')) == reference
+
+def test_parallel_matches_legacy(clientes_base, reference):
+    app.app.config['CLEAN_WORKERS'] = 2
+    assert read_bytes(clean(clientes_base, 'limpio.csv')) == reference
+
+@pytest.mark.skipif(app.pa is None, reason="requiere pyarrow")
+def test_pyarrow_engine_matches_legacy(clientes_base, reference):
+    app.app.config['CSV_ENGINE'] = 'pyarrow'
+    app.app.config['CSV_BLOCK_SIZE'] = 1024
+    assert read_bytes(clean(clientes_base, 'limpio.csv')) == reference
+
+def test_compressed_input_and_output(clientes_base, reference, tmp_path):
+    compressed = str(tmp_path / 'base.csv.gz')
+    with open(clientes_base, 'rb') as src, gzip.open(compressed, 'wb') as dst:
+        shutil.copyfileobj(src, dst)
+    app.app.config['OUTPUT_COMPRESSION'] = 'gzip'
+    output_path = clean(app.cache_local_file(compressed), 'limpio.csv.gz')
+    assert read_bytes(output_path) == reference
+
+class FailingOutput:
+    def __init__(self, path):
+        pass
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        pass
+
+    def write(self, data):
+        raise OSError(28, 'No space left on device')
+
+def clean_with_timeout(filepath, output_path, timeout=30):
+    task_id = app.job_store.create('clean')
+    thread = threading.Thread(target=app.process_csv_task, args=(task_id, filepath, SELECTED_COLUMNS, True, output_path))
+    thread.start()
+    thread.join(timeout)
+    assert not thread.is_alive(), "la tarea quedó bloqueada"
+    return app.job_store.get(task_id)
+
+@pytest.mark.parametrize('workers', [0, 2])
+def test_unwritable_output_is_an_error(clientes_base, tmp_path, workers):
+    app.app.config['CLEAN_WORKERS'] = workers
+    task = clean_with_timeout(clientes_base, str(tmp_path / 'no_existe' / 'limpio.csv'))
+    assert task['status'] == 'error'
+
+@pytest.mark.parametrize('workers', [0, 2])
+def test_failed_write_is_an_error(clientes_base, tmp_path, monkeypatch, workers):
+    app.app.config['CLEAN_WORKERS'] = workers
+    monkeypatch.setattr(app, 'open_output_file', FailingOutput)
+    task = clean_with_timeout(clientes_base, str(tmp_path / 'limpio.csv'))
+    assert task['status'] == 'error'
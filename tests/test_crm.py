@@ -0,0 +1,119 @@
+'''"Procesar CRM": emails, inválidos y contadores iguales a los de la implementación original.'''
+
+import io
+import os
+import re
+
+import pandas as pd
+import pytest
+
+import app
+from conftest import run_task
+
+def split_emails_by_separators(value):
+    '''Implementación original (por celda).'''
+    if not isinstance(value, str) or not value.strip():
+        return []
+    value = re.sub(r'\s+-\s+', '|||SEPARATOR|||', value)
+    parts = re.split(r'[;,/|\s]+', value.replace('|||SEPARATOR|||', ';'))
+    return [part.strip() for part in parts if part.strip()]
+
+def legacy_crm(filepath, selected_columns):
+    '''Implementación original de `crm_process_task`: (emails únicos, inválidos únicos, stats).'''
+    all_emails, invalid_entries = [], []
+    stats = {'total_raw': 0, 'invalid': 0, 'separated': 0, 'duplicates': 0}
+    for chunk in pd.read_csv(filepath, chunksize=app.app.config['CHUNK_SIZE'], sep=';'):
+        for column in selected_columns:
+            for value in chunk[column]:
+                if pd.isna(value):
+                    continue
+                emails_in_cell = split_emails_by_separators(str(value))
+                if len(emails_in_cell) > 1:
+                    stats['separated'] += len(emails_in_cell) - 1
+                for email in emails_in_cell:
+                    stats['total_raw'] += 1
+                    email_clean = email.strip().lower()
+                    if '@' in email_clean:
+                        all_emails.append(email_clean)
+                    else:
+                        stats['invalid'] += 1
+                        invalid_entries.append(email.strip())
+    unique_emails = list(dict.fromkeys(all_emails))
+    stats['duplicates'] = len(all_emails) - len(unique_emails)
+    stats['total_unique'] = len(unique_emails)
+    return unique_emails, list(dict.fromkeys(invalid_entries)), stats
+
+@pytest.fixture
+def crm_base(tmp_path):
+    lines = ['ID;EMAIL;EMAIL_ALTERNATIVO']
+    for i in range(300):
+        alternative = {0: f'Otro{i % 13}@Mail.com / b{i}@y.com', 1: 'NO TIENE', 2: '', 3: f'x{i % 9}@z.com - sin arroba'}[i % 4]
+        email = f'"Cliente{i % 37}@Correo.com; c{i % 50}@correo.com"' if i % 6 == 0 else f'cliente{i % 37}@correo.com'
+        lines.append(f'{i};{email};{alternative}')
+    path = tmp_path / 'crm.csv'
+    path.write_text('\n'.join(lines) + '\n', encoding='utf-8')
+    return app.cache_local_file(str(path))
+
+def read_column(path):
+    return pd.read_csv(path, dtype=str, keep_default_na=False).iloc[:, 0].tolist()
+
+@pytest.mark.parametrize('engine', ['c', pytest.param('pyarrow', marks=pytest.mark.skipif(app.pa is None, reason="requiere pyarrow"))])
+def test_crm_matches_legacy(crm_base, engine):
+    app.app.config['CSV_ENGINE'] = engine
+    # Bloques de pyarrow que no coinciden con los chunks de CHUNK_SIZE filas
+    app.app.config['CSV_BLOCK_SIZE'] = 1024
+    columns = ['EMAIL', 'EMAIL_ALTERNATIVO']
+    output_path = os.path.join(app.app.config['DOWNLOAD_FOLDER'], 'crm_emails_limpios.csv')
+    task = run_task('crm', app.crm_process_task, crm_base, columns, output_path)
+    assert task['status'] == 'complete', task.get('error')
+
+    emails, invalid, stats = legacy_crm(crm_base, columns)
+    assert read_column(output_path) == emails
+    assert read_column(os.path.join(app.app.config['DOWNLOAD_FOLDER'], 'crm_invalidos.csv')) == invalid
+    assert task['stats'] == stats
+    assert task['total_rows'] == 300
+
+@pytest.fixture
+def crm_multiline_base(tmp_path):
+    # Celdas entre comillas con saltos de línea y comillas escapadas: los registros no son líneas
+    lines = ['ID;EMAIL;NOTAS']
+    for i in range(300):
+        email = f'"cliente{i % 37}@correo.com\nOtro{i % 11}@Mail.com"' if i % 5 == 0 else f'c{i % 60}@correo.com'
+        notes = f'"dice ""hola""\n{i}"' if i % 7 == 0 else 'sin notas'
+        lines.append(f'{i};{email};{notes}')
+    path = tmp_path / 'crm_multilinea.csv'
+    path.write_text('\n'.join(lines) + '\n', encoding='utf-8')
+    return app.cache_local_file(str(path))
+
+def crm_outputs(filepath, columns):
+    output_path = os.path.join(app.app.config['DOWNLOAD_FOLDER'], 'crm_emails_limpios.csv')
+    task = run_task('crm', app.crm_process_task, filepath, columns, output_path)
+    assert task['status'] == 'complete', task.get('error')
+    return read_column(output_path), task['stats'], task['total_rows']
+
+@pytest.mark.parametrize('engine', ['c', pytest.param('pyarrow', marks=pytest.mark.skipif(app.pa is None, reason="requiere pyarrow"))])
+def test_byte_ranges_match_serial(crm_multiline_base, engine, monkeypatch):
+    app.app.config['CSV_ENGINE'] = engine
+    app.app.config['CSV_BLOCK_SIZE'] = 1024
+    app.app.config['CRM_WORKERS'] = 2
+    ranges_used = []
+    process_byte_ranges = app.crm_process_byte_ranges
+    monkeypatch.setattr(app, 'crm_process_byte_ranges', lambda *args: (ranges_used.append(args[2]), process_byte_ranges(*args))[1])
+    columns = ['EMAIL']
+
+    # Sin una cantidad de filas confirmada se procesa en modo secuencial
+    serial = crm_outputs(crm_multiline_base, columns)
+    assert not ranges_used
+    parallel = crm_outputs(crm_multiline_base, columns)
+    assert len(ranges_used) == 1 and len(ranges_used[0]) > 1
+
+    emails, _, stats = legacy_crm(crm_multiline_base, columns)
+    assert serial == parallel == (emails, stats, 300)
+
+def test_file_range_reader_reads_only_its_range(tmp_path):
+    path = tmp_path / 'datos.bin'
+    path.write_bytes(bytes(range(256)) * 40)
+    with open(path, 'rb') as f, io.BufferedReader(app.FileRangeReader(f, 100, 9000), buffer_size=64) as handle:
+        assert handle.read(10) == (bytes(range(256)) * 40)[100:110]
+        assert handle.read() == (bytes(range(256)) * 40)[110:9000]
+        assert handle.read() == b''
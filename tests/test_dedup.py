@@ -0,0 +1,53 @@
+'''`OrderedDeduplicator`: mismo resultado que `dict.fromkeys`, en memoria y pasando a disco.'''
+
+import os
+
+import pandas as pd
+import pytest
+
+import app
+
+def values_in_batches(count, batch_size):
+    values = [f'cliente{(i * 7919) % (count // 3)}@correo.com' for i in range(count)]
+    return values, [values[start:start + batch_size] for start in range(0, count, batch_size)]
+
+def read_column(path):
+    return pd.read_csv(path, dtype=str, keep_default_na=False)['email'].tolist()
+
+@pytest.mark.parametrize('memory_limit', [64 * 1024 * 1024, 1024])
+def test_matches_dict_fromkeys(tmp_path, memory_limit):
+    values, batches = values_in_batches(30000, 700)
+    output_path = str(tmp_path / 'emails.csv')
+    with app.OrderedDeduplicator(output_path, 'email', memory_limit, partitions=8) as deduplicator:
+        for batch in batches:
+            deduplicator.add(batch)
+        spilled = deduplicator._spill_dir is not None
+        unique = deduplicator.finish()
+
+    expected = list(dict.fromkeys(values))
+    assert spilled == (memory_limit == 1024)
+    assert unique == len(expected)
+    assert deduplicator.total == len(values)
+    assert read_column(output_path) == expected
+
+def test_spill_files_removed(tmp_path):
+    _, batches = values_in_batches(3000, 100)
+    deduplicator = app.OrderedDeduplicator(str(tmp_path / 'emails.csv'), 'email', 1024, partitions=4)
+    for batch in batches:
+        deduplicator.add(batch)
+    spill_dir = deduplicator._spill_dir
+    assert os.path.isdir(spill_dir)
+    deduplicator.close()
+    assert not os.path.exists(spill_dir)
+
+@pytest.mark.parametrize('memory_limit', [64 * 1024 * 1024, 1024])
+def test_hash_collisions_do_not_drop_values(tmp_path, monkeypatch, memory_limit):
+    # Todos los valores con el mismo hash() de Python: solo cuentan la clave de 128 bits y los valores completos
+    monkeypatch.setattr(app, 'hash', lambda value: 0, raising=False)
+    values, batches = values_in_batches(3000, 100)
+    output_path = str(tmp_path / 'emails.csv')
+    with app.OrderedDeduplicator(output_path, 'email', memory_limit, partitions=4) as deduplicator:
+        for batch in batches:
+            deduplicator.add(batch)
+        deduplicator.finish()
+    assert read_column(output_path) == list(dict.fromkeys(values))
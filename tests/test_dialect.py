@@ -0,0 +1,21 @@
+'''Detección de encoding y separador por muestreo de bloques.'''
+
+import pytest
+
+import app
+from conftest import write_clientes_base
+
+@pytest.mark.parametrize('sample_blocks', [1, 2, 16])
+@pytest.mark.parametrize('separator', [';', ','])
+def test_sampled_blocks(tmp_path, sample_blocks, separator):
+    app.app.config['SNIFF_SAMPLE_BLOCKS'] = sample_blocks
+    app.app.config['SNIFF_BLOCK_SIZE'] = 1024
+    path = write_clientes_base(str(tmp_path / f'base_{sample_blocks}.csv'), 400, separator)
+    assert app.get_csv_dialect(path) == ('utf-8', separator)
+
+def test_latin1_far_from_the_head(tmp_path):
+    app.app.config['SNIFF_BLOCK_SIZE'] = 1024
+    path = tmp_path / 'latin1.csv'
+    lines = ['email;NOMBRE'] + [f'<{i}>c{i}@correo.com;nombre {i}' for i in range(2000)] + ['<x>x@correo.com;Muñoz']
+    path.write_bytes(('\n'.join(lines) + '\n').encode('latin-1'))
+    assert app.get_csv_dialect(str(path)) == ('latin-1', ';')
@@ -0,0 +1,110 @@
+'''Cola de tareas: estados de `JobStore` y ejecución de `JobQueue`.'''
+
+import json
+import sqlite3
+import threading
+import time
+
+import app
+
+def wait_status(task_id, timeout=10):
+    deadline = time.monotonic() + timeout
+    task = app.job_store.get(task_id)
+    while task['status'] == 'processing' and time.monotonic() < deadline:
+        time.sleep(0.01)
+        task = app.job_store.get(task_id)
+    return task
+
+def test_status_transitions(tmp_path):
+    store = app.JobStore(str(tmp_path / 'estados.db'), ttl_seconds=3600)
+    task_id = store.create('clean')
+    assert store.get(task_id) == {'status': 'processing', 'progress': 0}
+
+    store.update(task_id, progress=40, processed_rows=10)
+    assert store.get(task_id) == {'status': 'processing', 'progress': 40, 'processed_rows': 10}
+
+    store.update(task_id, status='complete', result='/downloads/x.csv')
+    assert store.get(task_id)['status'] == 'complete'
+    assert store.get('no-existe') is None
+
+def test_state_survives_a_new_store(tmp_path):
+    path = str(tmp_path / 'estados.db')
+    task_id = app.JobStore(path, ttl_seconds=3600).create('crm')
+    app.JobStore(path, ttl_seconds=3600).update(task_id, status='error', error='falló')
+    assert app.JobStore(path, ttl_seconds=3600).get(task_id) == {'status': 'error', 'progress': 0, 'error': 'falló'}
+
+def test_finished_tasks_expire(tmp_path):
+    store = app.JobStore(str(tmp_path / 'estados.db'), ttl_seconds=0)
+    finished = store.create('clean')
+    store.update(finished, status='complete')
+    running = store.create('clean')
+    time.sleep(0.01)
+    store.evict_expired()
+    assert store.get(finished) is None
+    assert store.get(running)['status'] == 'processing'
+
+def test_queue_marks_unhandled_exceptions_as_error():
+    def fail(task_id):
+        raise RuntimeError('sin disco')
+
+    task = wait_status(app.start_task('clean', fail))
+    assert task['status'] == 'error'
+    assert 'sin disco' in task['error']
+
+def test_queue_respects_type_limits():
+    queue = app.JobQueue(workers=3, type_limits={'clean': 1})
+    running, peak, lock = [0], [0], threading.Lock()
+
+    def work(task_id):
+        with lock:
+            running[0] += 1
+            peak[0] = max(peak[0], running[0])
+        time.sleep(0.05)
+        with lock:
+            running[0] -= 1
+        app.update_task(task_id, status='complete')
+
+    task_ids = [app.job_store.create('clean') for _ in range(4)]
+    for task_id in task_ids:
+        queue.submit(task_id, 'clean', work)
+    assert all(wait_status(task_id)['status'] == 'complete' for task_id in task_ids)
+    assert peak[0] == 1
+
+def test_tasks_of_a_dead_process_become_errors(tmp_path):
+    path = str(tmp_path / 'estados.db')
+    previous = app.JobStore(path, ttl_seconds=3600, heartbeat_seconds=60)
+    task_id = previous.create('clean')
+    previous.update(task_id, progress=30)
+
+    current = app.JobStore(path, ttl_seconds=3600, heartbeat_seconds=60)
+    assert current.get(task_id)['status'] == 'processing'
+
+    # El proceso anterior deja de latir (se reinició el servidor)
+    with sqlite3.connect(path) as connection:
+        connection.execute('UPDATE job_owners SET heartbeat_at = 0')
+    task = current.get(task_id)
+    assert task == {'status': 'error', 'progress': 30, 'error': app.JobStore.ORPHANED_ERROR}
+
+    # Ya terminada, la tarea expira como cualquier otra
+    current.ttl_seconds = 0
+    time.sleep(0.01)
+    current.evict_expired()
+    assert current.get(task_id) is None
+
+def test_unowned_tasks_from_an_older_database_are_recovered(tmp_path):
+    path = str(tmp_path / 'estados.db')
+    with sqlite3.connect(path) as connection:
+        connection.execute('CREATE TABLE jobs (task_id TEXT PRIMARY KEY, job_type TEXT NOT NULL, '
+                           'state TEXT NOT NULL, created_at REAL NOT NULL, finished_at REAL)')
+        connection.execute('INSERT INTO jobs VALUES (?, ?, ?, ?, NULL)',
+                           ('vieja', 'crm', json.dumps({'status': 'processing', 'progress': 80}), time.time()))
+    store = app.JobStore(path, ttl_seconds=3600)
+    assert store.get('vieja')['status'] == 'error'
+    assert store.get(store.create('crm'))['status'] == 'processing'
+
+def test_live_process_keeps_its_tasks(tmp_path):
+    store = app.JobStore(str(tmp_path / 'estados.db'), ttl_seconds=3600, heartbeat_seconds=0.05)
+    task_id = store.create('multi_export')
+    time.sleep(0.3)
+    store.evict_expired()
+    assert store.get(task_id)['status'] == 'processing'
@@ -0,0 +1,80 @@
+'''Exportación múltiple: archivos del ZIP, su orden y su contenido iguales a los del recorrido original.'''
+
+import io
+import os
+import zipfile
+
+import pandas as pd
+import pytest
+
+import app
+from conftest import run_task
+
+def legacy_multi_export(filepath, selected_categories_and_items):
+    '''Implementación original (fila por fila), con la limpieza final de cada archivo: [(nombre, contenido)].'''
+    known = app.load_known_entities()
+    df = pd.read_csv(filepath, sep=';')
+    data_for_csv = {}
+    for _, row in df.iterrows():
+        email = row['email']
+        if pd.isna(email):
+            continue
+        email = app.clean_email(email)
+        for category, column, prefix, _ in app.MULTI_EXPORT_CATEGORIES:
+            if category in selected_categories_and_items and pd.notna(row.get(column)):
+                for item in str(row[column]).split(','):
+                    item = item.strip()
+                    if item in known[category] and item in selected_categories_and_items[category]:
+                        data_for_csv.setdefault(f"{prefix}_{item}", []).append(email)
+
+    members = []
+    for name, emails in data_for_csv.items():
+        emails = list(dict.fromkeys(email for email in emails if '@' in str(email)))
+        if emails:
+            output = io.StringIO()
+            pd.DataFrame(emails, columns=['email']).to_csv(output, index=False)
+            members.append((f"{name}.csv", output.getvalue().encode('utf-8')))
+    return members
+
+def zip_members(path):
+    with zipfile.ZipFile(path) as zf:
+        return [(info.filename, zf.read(info.filename)) for info in zf.infolist()]
+
+def export(filepath, selected):
+    output_path = os.path.join(app.app.config['DOWNLOAD_FOLDER'], 'exportacion.zip')
+    task = run_task('multi_export', app.multi_export_process_task, filepath, selected, output_path)
+    assert task['status'] == 'complete', task.get('error')
+    return zip_members(output_path)
+
+@pytest.fixture
+def selected():
+    return {category: sorted(items) for category, items in app.load_known_entities().items()}
+
+@pytest.mark.parametrize('use_index', [False, True])
+def test_zip_matches_legacy(clientes_base, selected, use_index):
+    app.app.config['MULTI_EXPORT_INDEX'] = use_index
+    scan = run_task('multi_export_scan', app.multi_export_initial_process_task, clientes_base)
+    assert scan['status'] == 'complete', scan.get('error')
+    assert os.path.isdir(app.get_entity_index_path(clientes_base)) == use_index
+
+    members = export(clientes_base, selected)
+    assert [name for name, _ in members] == [name for name, _ in legacy_multi_export(clientes_base, selected)]
+    assert members == legacy_multi_export(clientes_base, selected)
+
+def test_partial_selection(clientes_base):
+    selected = {'bancos': ['MACRO', 'BBVA'], 'partners': ['YPF']}
+    assert export(clientes_base, selected) == legacy_multi_export(clientes_base, selected)
+
+def test_scan_excludes_generic_entities(clientes_base):
+    scan = run_task('multi_export_scan', app.multi_export_initial_process_task, clientes_base)
+    unique_data = scan['result']['unique_data']
+    assert 'OTROS_BANCOS' not in unique_data['bancos'] and 'OTRAS_TARJETAS' not in unique_data['tarjetas']
+    assert unique_data['cobrands'] == ['AMEX', 'BNA']
+
+def test_missing_column_is_an_error(tmp_path):
+    path = tmp_path / 'sin_bancos.csv'
+    path.write_text('email;NOMBRE\n<1>a@b.com;uno\n', encoding='utf-8')
+    output_path = os.path.join(app.app.config['DOWNLOAD_FOLDER'], 'exportacion.zip')
+    task = run_task('multi_export', app.multi_export_process_task, app.cache_local_file(str(path)), {'bancos': ['BBVA']}, output_path)
+    assert task['status'] == 'error'
+    assert 'EMIS_BANCOS' in task['error']
@@ -0,0 +1,63 @@
+'''Índice de filas: las tareas no recorren el archivo para contar filas y su cantidad no pisa la que parsea pandas.'''
+
+import os
+
+import app
+from conftest import run_task
+
+def offsets_path(filepath):
+    return os.path.join(os.path.dirname(filepath), app.UPLOAD_ROW_OFFSETS_FILE)
+
+def test_clean_does_not_precount_rows(clientes_base, monkeypatch):
+    progress = []
+    update_task = app.update_task
+    monkeypatch.setattr(app, 'update_task', lambda task_id, **fields: (progress.append(fields), update_task(task_id, **fields)))
+    output_path = os.path.join(app.app.config['DOWNLOAD_FOLDER'], 'limpio.csv')
+    task = run_task('clean', app.process_csv_task, clientes_base, ['email', 'docnum'], True, output_path)
+
+    assert task['status'] == 'complete'
+    assert not os.path.exists(offsets_path(clientes_base))
+    assert all(fields['total_rows'] is None for fields in progress if 'total_rows' in fields)
+    # La cantidad confirmada por la lectura completa queda para las siguientes tareas
+    assert app.get_upload_metadata(clientes_base)['row_count'] == 400
+    assert app.count_csv_rows(clientes_base) == 400
+
+def test_existing_index_gives_the_total(clientes_base):
+    assert app.count_csv_rows(clientes_base) is None
+    assert app.get_row_offsets(clientes_base)[1] == 400
+    assert 'row_count' not in app.get_upload_metadata(clientes_base)
+    assert app.count_csv_rows(clientes_base) == 400
+
+def test_index_that_disagrees_with_pandas_is_not_used(tmp_path):
+    # Las comillas en medio de un campo son literales para pandas, pero el índice las toma como
+    # apertura y cierre: el salto de línea entre ellas no cuenta como fin de registro
+    path = tmp_path / 'comillas.csv'
+    path.write_text('email;NOMBRE\n<1>a@b.com;pe"pe\n<2>c@d.com;lu"is\n<3>e@f.com;ana\n', encoding='utf-8')
+    filepath = app.cache_local_file(str(path))
+    assert app.get_row_offsets(filepath)[1] == 2
+    assert 'row_count' not in app.get_upload_metadata(filepath)
+
+    output_path = os.path.join(app.app.config['DOWNLOAD_FOLDER'], 'limpio.csv')
+    task = run_task('clean', app.process_csv_task, filepath, ['email', 'NOMBRE'], False, output_path)
+    assert task['processed_rows'] == 3
+    assert app.count_csv_rows(filepath) == 3
+    assert app.get_row_offsets(filepath) is None
+    assert app.split_csv_byte_ranges(filepath, 2) is None
+
+def test_empty_ranges_at_the_boundaries(tmp_path):
+    path = tmp_path / 'base.csv'
+    path.write_bytes(b'email;NOMBRE\na@b.com;ana\nc@d.com;"lu\nis"\ne@f.com;eva')
+    size = path.stat().st_size
+    with app.CsvRecordReader(str(path)) as reader:
+        second = reader.skip_records(13, size, 1)
+        assert path.read_bytes()[second:].startswith(b'c@d.com')
+        # Rango vacío en medio del archivo y al final
+        assert reader.skip_records(second, second, 2) == second
+        assert reader.skip_records(size, size, 1) == size
+        assert reader.scan_row_offsets(1)[1] == 3
+
+    empty = tmp_path / 'vacio.csv'
+    empty.write_bytes(b'')
+    with app.CsvRecordReader(str(empty)) as reader:
+        assert reader.skip_records(0, 0, 1) == 0
+        assert reader.scan_row_offsets(1)[1] == 0
@@ -0,0 +1,83 @@
+'''Subida por partes: el archivo se rearma en la caché igual al original, también mientras se escanea.'''
+
+import hashlib
+import io
+import os
+import threading
+import time
+
+import pytest
+
+import app
+from conftest import write_clientes_base
+
+@pytest.fixture
+def client():
+    return app.app.test_client()
+
+@pytest.fixture
+def data(tmp_path):
+    with open(write_clientes_base(str(tmp_path / 'base.csv'), 400), 'rb') as f:
+        return f.read()
+
+def send_parts(client, data, upload_id, offset, part_size):
+    response = None
+    while offset < len(data):
+        response = client.post('/api/upload-part', data={
+            'upload_id': upload_id, 'offset': str(offset), 'part': (io.BytesIO(data[offset:offset + part_size]), 'blob'),
+        }).get_json()
+        offset = response['received']
+    return response
+
+def wait_task(task_id):
+    deadline = time.monotonic() + 30
+    while time.monotonic() < deadline:
+        task = app.job_store.get(task_id)
+        if task['status'] != 'processing':
+            return task
+        time.sleep(0.01)
+    raise TimeoutError(task_id)
+
+def test_parts_are_reassembled(client, data):
+    app.app.config['UPLOAD_PART_SIZE'] = 1000
+    response = client.post('/api/get-columns', data={
+        'csv_file': (io.BytesIO(data[:500]), 'base.csv'), 'total_size': str(len(data)),
+    }).get_json()
+    assert response['columns'][0] == 'email' and response['filepath'] is None
+    assert response['received'] == 500
+
+    final = send_parts(client, data, response['upload_id'], response['received'], 1000)
+    filepath = final['filepath']
+    with open(filepath, 'rb') as f:
+        assert f.read() == data
+    assert os.path.basename(os.path.dirname(filepath)) == hashlib.sha256(data).hexdigest()
+    assert not any(name.startswith(app.UPLOAD_SESSION_PREFIX) for name in os.listdir(app.app.config['UPLOAD_FOLDER']))
+
+def test_out_of_order_part_is_rejected(client, data):
+    response = client.post('/api/get-columns', data={
+        'csv_file': (io.BytesIO(data[:500]), 'base.csv'), 'total_size': str(len(data)),
+    }).get_json()
+    conflict = client.post('/api/upload-part', data={
+        'upload_id': response['upload_id'], 'offset': '900', 'part': (io.BytesIO(data[900:1000]), 'blob'),
+    })
+    assert conflict.status_code == 409
+    assert conflict.get_json()['received'] == 500
+
+def test_scan_while_uploading(client, data, tmp_path):
+    app.app.config['UPLOAD_PART_SIZE'] = 2000
+    whole = app.cache_local_file(write_clientes_base(str(tmp_path / 'completo.csv'), 400))
+    expected = app.job_store.create('multi_export_scan')
+    app.multi_export_initial_process_task(expected, whole)
+
+    response = client.post('/api/multi-export-initial-process', data={
+        'csv_file': (io.BytesIO(data[:500]), 'base.csv'), 'total_size': str(len(data)),
+    }).get_json()
+    uploader = threading.Thread(target=send_parts, args=(client, data, response['upload_id'], response['received'], 2000))
+    uploader.start()
+    task = wait_task(response['task_id'])
+    uploader.join()
+
+    assert task['status'] == 'complete', task.get('error')
+    assert task['result']['unique_data'] == app.job_store.get(expected)['result']['unique_data']
+    with open(task['result']['filepath'], 'rb') as f:
+        assert f.read() == data